@@ -35,8 +35,12 @@ import os
 import sys
 import inspect
 
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtGui import QIcon
+from qgis.PyQt.QtWidgets import QAction
 from qgis.core import QgsProcessingAlgorithm, QgsApplication
 from .Surface_Water_Storage_provider import SurfaceWaterStorageProvider
+from .algorithms.algorithmConfig import clearCaches
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
 
@@ -46,8 +50,13 @@ if cmd_folder not in sys.path:
 
 class SurfaceWaterStoragePlugin(object):
 
-    def __init__(self):
+    MENU = '&Surface Water Storage'
+
+    def __init__(self, iface=None):
+        self.iface = iface
         self.provider = None
+        self.stageAction = None
+        self.stageDock = None
 
     def initProcessing(self):
         """Init Processing provider for QGIS >= 3.8."""
@@ -57,5 +66,35 @@ class SurfaceWaterStoragePlugin(object):
     def initGui(self):
         self.initProcessing()
 
+        if self.iface is None:
+            return
+        self.stageAction = QAction(QIcon(os.path.join(cmd_folder, 'icon.png')),
+                                   'Stage slider',
+                                   self.iface.mainWindow())
+        self.stageAction.setCheckable(True)
+        self.stageAction.toggled.connect(self.showStageDock)
+        self.iface.addPluginToMenu(self.MENU, self.stageAction)
+        self.iface.addToolBarIcon(self.stageAction)
+
+    def showStageDock(self, checked):
+        """Shows or hides the stage slider dock, creating it on first use."""
+        if self.stageDock is None:
+            from .stage_slider_dock import StageSliderDockWidget
+            self.stageDock = StageSliderDockWidget(self.iface, self.iface.mainWindow())
+            self.stageDock.visibilityChanged.connect(self.stageAction.setChecked)
+            self.iface.addDockWidget(Qt.RightDockWidgetArea, self.stageDock)
+        self.stageDock.setVisible(checked)
+
     def unload(self):
         QgsApplication.processingRegistry().removeProvider(self.provider)
+
+        if self.stageDock is not None:
+            self.stageDock.removeCanvasItem()
+            self.iface.removeDockWidget(self.stageDock)
+            self.stageDock.deleteLater()
+            self.stageDock = None
+        if self.stageAction is not None:
+            self.iface.removePluginMenu(self.MENU, self.stageAction)
+            self.iface.removeToolBarIcon(self.stageAction)
+            self.stageAction = None
+        clearCaches()
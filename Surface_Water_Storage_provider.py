@@ -34,8 +34,15 @@ __revision__ = '$Format:%H$'
 import os
 from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
+from processing.core.ProcessingConfig import ProcessingConfig
+from .algorithms.algorithmConfig import (addProcessingSettings,
+                                         clearCaches,
+                                         removeProcessingSettings)
 from .create_area_volume_elevation_graph_tool import createAreaVolumeElevationGraphAlgorithm
+from .create_depression_inventory_tool import createDepressionInventoryAlgorithm
 from .create_inundation_area_tool import createInundationAreaAlgorithm
+from .create_report_tool import createReportAlgorithm
+from .query_curve_store_tool import queryCurveStoreAlgorithm
 
 
 
@@ -47,12 +54,23 @@ class SurfaceWaterStorageProvider(QgsProcessingProvider):
         """
         QgsProcessingProvider.__init__(self)
 
+    def load(self):
+        """
+        Loads the provider, registering its settings in the
+        Processing options.
+        """
+        ProcessingConfig.settingIcons[self.name()] = self.icon()
+        addProcessingSettings(self.name())
+        self.refreshAlgorithms()
+        return True
+
     def unload(self):
         """
         Unloads the provider. Any tear-down steps required by the provider
         should be implemented here.
         """
-        pass
+        removeProcessingSettings()
+        clearCaches()
 
     def loadAlgorithms(self):
         """
@@ -60,6 +78,9 @@ class SurfaceWaterStorageProvider(QgsProcessingProvider):
         """
         self.addAlgorithm(createAreaVolumeElevationGraphAlgorithm())
         self.addAlgorithm(createInundationAreaAlgorithm())
+        self.addAlgorithm(queryCurveStoreAlgorithm())
+        self.addAlgorithm(createDepressionInventoryAlgorithm())
+        self.addAlgorithm(createReportAlgorithm())
         # add additional algorithms here
         # self.addAlgorithm(MyOtherAlgorithm())
 
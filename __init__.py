@@ -37,4 +37,4 @@ def classFactory(iface):  # pylint: disable=invalid-name
     """
     #
     from .Surface_Water_Storage import SurfaceWaterStoragePlugin
-    return SurfaceWaterStoragePlugin()
+    return SurfaceWaterStoragePlugin(iface)
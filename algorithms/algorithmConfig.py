@@ -0,0 +1,90 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from processing.core.ProcessingConfig import ProcessingConfig, Setting
+from ..core.demWindow import (DEFAULT_CACHE_BUDGET_MB,
+                              clearDEMWindowCache,
+                              setDEMWindowCacheBudget)
+from ..core.fill import clearFilledWindows
+from ..core.hypsometry import clearBaseHistograms
+from ..core.mask import clearMaskCache, setMaskCacheFolder
+from ..core.preview import clearPreviewFiles
+from ..core.zone import clearZoneWindows
+
+DEM_CACHE_BUDGET_SETTING = 'SWS_DEM_CACHE_BUDGET_MB'
+MASK_CACHE_FOLDER_SETTING = 'SWS_MASK_CACHE_FOLDER'
+
+def addProcessingSettings (providerName):
+    '''
+    registers the plugin settings in the Processing options
+    '''
+    ProcessingConfig.addSetting(Setting(providerName,
+                                        DEM_CACHE_BUDGET_SETTING,
+                                        'DEM window cache budget (MB)',
+                                        DEFAULT_CACHE_BUDGET_MB,
+                                        valuetype=Setting.INT))
+    ProcessingConfig.addSetting(Setting(providerName,
+                                        MASK_CACHE_FOLDER_SETTING,
+                                        'Area mask cache folder',
+                                        '',
+                                        valuetype=Setting.FOLDER))
+    ProcessingConfig.readSettings()
+def removeProcessingSettings ():
+    '''
+    removes the plugin settings from the Processing options
+    '''
+    ProcessingConfig.removeSetting(DEM_CACHE_BUDGET_SETTING)
+    ProcessingConfig.removeSetting(MASK_CACHE_FOLDER_SETTING)
+def clearCaches ():
+    '''
+    removes the cached DEM windows, masks, zone windows and histograms
+    from memory and the filled windows and previews from the GDAL memory
+    file system and the temporary folder
+    '''
+    clearDEMWindowCache()
+    clearMaskCache()
+    clearZoneWindows()
+    clearBaseHistograms()
+    clearFilledWindows()
+    clearPreviewFiles()
+def applyProcessingSettings (maxMemoryMB=0):
+    '''
+    configures the caches with the values of the Processing options,
+    keeping the DEM window cache within the memory budget of the run
+    '''
+    cacheBudget = ProcessingConfig.getSetting(DEM_CACHE_BUDGET_SETTING)
+    if cacheBudget is None:
+        cacheBudget = DEFAULT_CACHE_BUDGET_MB
+    if maxMemoryMB > 0:
+        cacheBudget = min(int(cacheBudget), maxMemoryMB)
+    setDEMWindowCacheBudget(cacheBudget)
+
+    setMaskCacheFolder(ProcessingConfig.getSetting(MASK_CACHE_FOLDER_SETTING))
@@ -0,0 +1,112 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from qgis.core import (QgsCoordinateTransform,
+                       QgsGeometry,
+                       QgsProject,
+                       QgsProviderRegistry,
+                       QgsRasterLayer,
+                       QgsVectorLayer)
+from ..core.demWindow import DEMSource
+from ..core.projection import projectDEMSource
+from ..core.tileIndex import resolveTileMosaic, scanTileDirectory
+
+def getLayersDEMSource (demLayer, areaLayer, feedback=None):
+    '''
+    returns the DEM source of the feature of the area layer, with the
+    geometry transformed to the CRS of the DEM layer and the DEM
+    projected on the fly when its CRS is geographic
+    '''
+    feature = next(areaLayer.getFeatures(), None)
+    geometry = feature.geometry()
+    if areaLayer.crs() != demLayer.crs():
+        geometry.transform(QgsCoordinateTransform(areaLayer.crs(),
+                                                  demLayer.crs(),
+                                                  QgsProject.instance()))
+
+    return projectDEMSource(DEMSource(demLayer.source(),
+                                      1,
+                                      geometry.asWkt()),
+                            feedback)
+def getZoneDEMSource (demLayer, zoneLayer, zoneValue=None, feedback=None):
+    '''
+    returns the DEM source of the zone of the zone raster layer,
+    or of the cells other than 0 and NODATA of a mask raster layer,
+    with the DEM projected on the fly when its CRS is geographic
+    '''
+    return projectDEMSource(DEMSource(demLayer.source(),
+                                      1,
+                                      None,
+                                      zoneLayer.source(),
+                                      zoneValue),
+                            feedback)
+def getExtentDEMSource (demLayer, feedback=None):
+    '''
+    returns the DEM source of the whole extent of the DEM layer, with
+    the DEM projected on the fly when its CRS is geographic
+    '''
+    return projectDEMSource(DEMSource(demLayer.source(),
+                                      1,
+                                      demLayer.extent().asWktPolygon()),
+                            feedback)
+def getTileIndexDEMLayer (tileIndexLayer, tileDirectory, locationField, areaLayer, zoneLayer, feedback=None):
+    '''
+    returns the DEM layer of the virtual mosaic of the tiles that
+    intersect the area, found in the tile index layer or in the
+    cached tile index of the tile directory
+    '''
+    layerName = None
+    if tileIndexLayer is None:
+        indexPath = scanTileDirectory(tileDirectory, feedback)
+        tileIndexLayer = QgsVectorLayer(indexPath, 'tiles', 'ogr')
+    else:
+        sourceParts = QgsProviderRegistry.instance().decodeUri('ogr', tileIndexLayer.source())
+        indexPath = sourceParts.get('path') or tileIndexLayer.source()
+        layerName = sourceParts.get('layerName')
+
+    if zoneLayer is not None:
+        geometry = QgsGeometry.fromRect(zoneLayer.extent())
+        areaCrs = zoneLayer.crs()
+    else:
+        geometry = next(areaLayer.getFeatures()).geometry()
+        areaCrs = areaLayer.crs()
+    if areaCrs != tileIndexLayer.crs():
+        geometry.transform(QgsCoordinateTransform(areaCrs,
+                                                  tileIndexLayer.crs(),
+                                                  QgsProject.instance()))
+
+    mosaicPath = resolveTileMosaic(indexPath,
+                                   geometry.asWkt(),
+                                   locationField,
+                                   layerName,
+                                   feedback)
+
+    return QgsRasterLayer(mosaicPath, 'DEM tiles', 'gdal')
@@ -0,0 +1,99 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation area by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsFeature,
+                       QgsField,
+                       QgsFields,
+                       QgsGeometry)
+from ..core.depressions import (DEPRESSION_FIELDS,
+                                computeDepressionInventory,
+                                removeDepressionLabels,
+                                saveDepressionCurves,
+                                vectorizeDepressions)
+from .algorithmSink import writeFeatures
+def executePlugin (demSource,plan,step,minDepth,sink,curvesPath=None,feedback=None):
+    '''
+    uses input parameters to execute plugin functions, finding the
+    depressions of the DEM window, saving their curves when a path is
+    given and writing their features to the sink as they are vectorized,
+    returning the depressions and the number of written features, or
+    None for both when the user cancels
+    '''
+    inventory = computeDepressionInventory(demSource,
+                                           plan,
+                                           step,
+                                           minDepth,
+                                           feedback)
+    if inventory is None:
+        return None, None
+    depressions, labelPath = inventory
+    try:
+        if curvesPath:
+            saveDepressionCurves(curvesPath, depressions)
+        featureCount = writeFeatures(sink,
+                                     generateFeatures(depressions,
+                                                      vectorizeDepressions(labelPath, plan),
+                                                      createFields()),
+                                     len(depressions),
+                                     feedback)
+    finally:
+        removeDepressionLabels(labelPath)
+
+    return depressions, featureCount
+def createFields ():
+    '''
+    creates the fields of the depressions with the spill elevation,
+    maximum depth, area and maximum storage of each depression
+    '''
+    fields = QgsFields()
+    fields.append(QgsField('Depression', QVariant.Int))
+    for fieldName in DEPRESSION_FIELDS:
+        fields.append(QgsField(fieldName, QVariant.Double, len=10, prec=2))
+
+    return fields
+def generateFeatures (depressions, geometries, fields):
+    '''
+    generates the features of the depressions from their vectorized
+    geometries, streamed with their ids, with their statistics in the
+    attributes
+    '''
+    for depressionId, geometryWkb in geometries:
+        depression = depressions[depressionId - 1]
+        geometry = QgsGeometry()
+        geometry.fromWkb(geometryWkb)
+        feature = QgsFeature(fields)
+        feature.setGeometry(geometry)
+        feature.setAttributes([depression.depressionId,
+                               depression.spillElevation,
+                               depression.maxDepth,
+                               depression.area,
+                               depression.volume])
+        yield feature
@@ -29,68 +29,119 @@ __copyright__ = '(C) 2024 by João Vitor Pimenta'
 
 __revision__ = '$Format:%H$'
 
-import processing
-from scipy.integrate import cumulative_trapezoid
-from numpy import loadtxt, append, column_stack
-from plotly.graph_objects import Scatter
+import os
+from plotly.graph_objects import Scatter, Scattergl
+from plotly.offline import get_plotlyjs
 from plotly.subplots import make_subplots
-from qgis.core import QgsProcessingException
-from ..exceptions.processingExceptions import verifyNumberOfPointsInCurve
+from ..core.curve import computeAreaHeightVolume
+from ..core.decimation import decimateCurve
+from ..core.epochs import computeEpochCurves
+from ..core.preview import mapPreviewLevels
+from ..core.storageChange import computeStorageChange
+from ..core.uncertainty import computeUncertaintyBands
 
-def executePlugin (dem,area,step):
+MAX_GRAPH_POINTS = 2000
+WEBGL_POINTS = 1000
+GRAPH_FORMATS = ('html', 'shared', 'json')
+PLOTLY_BUNDLE = 'plotly.min.js'
+
+def executePlugin (demSource,plan,levels,step,feedback=None,maxPoints=MAX_GRAPH_POINTS):
     '''
-    uses input parameters to execute plugin functions
+    uses input parameters to execute plugin functions, computing the curves
+    of each preview level and keeping the curves of the finest one
     '''
-    hypsometricCurve = generateHypsometricCurve(dem,area,step)
-    verifyNumberOfPointsInCurve(hypsometricCurve)
-    areaHeightVolumeCSV = calculateAreaHeightVolume(hypsometricCurve)
-    graph = createGraph(areaHeightVolumeCSV)
+    for level, areaHeightVolumeCSV in mapPreviewLevels(
+            lambda levelSource, levelPlan: computeAreaHeightVolume(levelSource,
+                                                                   levelPlan,
+                                                                   step,
+                                                                   feedback),
+            demSource,
+            plan,
+            levels,
+            feedback):
+        if feedback is not None and level.factor > 1:
+            feedback.pushInfo('Preview at 1/{0} resolution: maximum area of {1:.2f} m², '
+                              'maximum volume of {2:.2f} m³'.format(level.factor,
+                                                                    areaHeightVolumeCSV[-1, 0],
+                                                                    areaHeightVolumeCSV[-1, 2]))
+    graph = createGraph(areaHeightVolumeCSV, maxPoints=maxPoints)
 
     return areaHeightVolumeCSV, graph
-def generateHypsometricCurve (dem,area,step):
+def executeUncertainty (levels,AHV,step,rmse,correlationLength,realizations,seed=None,feedback=None,maxPoints=MAX_GRAPH_POINTS,maxMemoryMB=0):
     '''
-    generates hypsometric curve data
+    uses input parameters to execute plugin functions, computing the
+    percentile bands of the curves of the finest preview level under the
+    DEM vertical error and graphing them with the curves, returning None
+    for both when the user cancels
     '''
-    params = {
-            'INPUT_DEM':dem,
-            'BOUNDARY_LAYER':area,
-            'STEP':step,
-            'USE_PERCENTAGE':False,
-            'OUTPUT_DIRECTORY':'TEMPORARY_OUTPUT'
-    }
-
-    hypsometricCurve = processing.run(
-                                        "qgis:hypsometriccurves",
-                                        params
-                                        )['OUTPUT_DIRECTORY']
-    maskName = area.sourceName()
-    features = area.getFeatures()
-    feature = next(features, None)
-    featureID = feature.id()
-    path = hypsometricCurve+'/histogram_'+maskName+'_'+str(featureID)+'.csv'
+    level = levels[-1]
+    bands = computeUncertaintyBands(level.demSource,
+                                    level.plan,
+                                    AHV,
+                                    step,
+                                    rmse,
+                                    correlationLength,
+                                    realizations,
+                                    seed,
+                                    feedback,
+                                    maxMemoryMB)
+    if bands is None:
+        return None, None
+    graph = createGraph(AHV, bands, maxPoints)
 
-    return path
-def calculateAreaHeightVolume (areaHeightCurve):
+    return bands, graph
+def createCurveTrace (xValues, yValues, maxPoints, **traceOptions):
     '''
-    integrates the hypsometric curve, generating elevation-area-volume data
+    creates the line trace of the curve, decimated to maxPoints points
+    (0 to keep all of them) and drawn with WebGL when it is long
     '''
-    data = loadtxt(areaHeightCurve, delimiter=',',skiprows=1)
-
-    verifyNumberOfPointsInCurve(data)
-
-    xd = data[:, 0].tolist()
-    yd = data[:, 1].tolist()
+    if maxPoints:
+        keptPoints = decimateCurve(xValues, yValues, maxPoints)
+        xValues, yValues = xValues[keptPoints], yValues[keptPoints]
+    traceType = Scattergl if len(xValues) > WEBGL_POINTS else Scatter
 
-    integration = cumulative_trapezoid(xd,yd)
-    integrationComplet = append(integration,0)
-    dataWithIntegration = column_stack((data,integrationComplet))
-    dataWoLastRow = dataWithIntegration[:-1]
-
-    return dataWoLastRow
-def createGraph(npAHVData):
+    return traceType(x=xValues,
+                     y=yValues,
+                     mode='lines',
+                     **traceOptions)
+def addBandTraces (fig, values, elevations, bands, name, secondaryY, maxPoints=MAX_GRAPH_POINTS):
+    '''
+    adds the band between the lowest and the highest percentiles
+    of the values and the line of the median to the graph
+    '''
+    fig.add_trace(createCurveTrace(values[0],
+                                   elevations,
+                                   maxPoints,
+                                   line=dict(width=0),
+                                   showlegend=False,
+                                   name='{0} P{1}'.format(name, bands.percentiles[0])
+                                   ),
+                                   secondary_y=secondaryY
+                                   )
+    fig.add_trace(createCurveTrace(values[-1],
+                                   elevations,
+                                   maxPoints,
+                                   line=dict(width=0),
+                                   fill='tonextx',
+                                   name='{0} P{1}-P{2}'.format(name,
+                                                               bands.percentiles[0],
+                                                               bands.percentiles[-1])
+                                   ),
+                                   secondary_y=secondaryY
+                                   )
+    fig.add_trace(createCurveTrace(values[len(values) // 2],
+                                   elevations,
+                                   maxPoints,
+                                   line=dict(dash='dash'),
+                                   name='{0} P{1}'.format(name, bands.percentiles[len(values) // 2])
+                                   ),
+                                   secondary_y=secondaryY
+                                   )
+def createGraph(npAHVData, bands=None, maxPoints=MAX_GRAPH_POINTS):
     '''
     create a graph with area-height-volume data,
-    generating the elevation-area and elevation-volume curves
+    generating the elevation-area and elevation-volume curves,
+    with their percentile bands when given
     '''
     areas = npAHVData[:,0]
     elevations = npAHVData[:,1]
@@ -98,23 +149,28 @@ def createGraph(npAHVData):
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
 
-    fig.add_trace(Scatter(
-                            x=volumes,
-                            y=elevations,
-                            mode='lines',
+    fig.add_trace(createCurveTrace(
+                            volumes,
+                            elevations,
+                            maxPoints,
                             name='Volume - Elevation'
                             ),
                             secondary_y=False
                             )
-    fig.add_trace(Scatter(x=areas,
-                            y=elevations,
-                            mode='lines',
+    fig.add_trace(createCurveTrace(areas,
+                            elevations,
+                            maxPoints,
                             name='Area - Elevation'
                             ),
                             secondary_y=True
                             )
 
     fig.data[1].update(xaxis='x2')
+    if bands is not None:
+        addBandTraces(fig, bands.volumes, elevations, bands, 'Volume', False, maxPoints)
+        addBandTraces(fig, bands.areas, elevations, bands, 'Area', True, maxPoints)
+        for trace in fig.data[5:]:
+            trace.update(xaxis='x2')
     fig.update_layout(
         title='Area x Volume x Elevation',
         xaxis=dict(title='Volume (m³)'),
@@ -132,3 +188,171 @@ def createGraph(npAHVData):
                         )
 
     return fig
+def executeStorageChange (demSource,secondSource,plan,step,differencePath=None,feedback=None,maxPoints=MAX_GRAPH_POINTS):
+    '''
+    uses input parameters to execute plugin functions, computing the
+    curves of both DEMs on common bins and the capacity loss,
+    returning None for both when the user cancels
+    '''
+    storageChange = computeStorageChange(demSource,
+                                         secondSource,
+                                         plan,
+                                         step,
+                                         differencePath,
+                                         feedback)
+    if storageChange is None:
+        return None, None
+    if feedback is not None:
+        feedback.pushInfo('Capacity loss of {0:.2f} m³ at the elevation of '
+                          '{1:.2f} m'.format(storageChange[-1, 5], storageChange[-1, 0]))
+    graph = createStorageChangeGraph(storageChange, maxPoints)
+
+    return storageChange, graph
+def createStorageChangeGraph(storageChange, maxPoints=MAX_GRAPH_POINTS):
+    '''
+    create a graph with the storage change data, generating the
+    elevation-area and elevation-volume curves of both DEMs
+    and the elevation-capacity loss curve
+    '''
+    elevations = storageChange[:,0]
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    for column, name in ((2, 'Volume - Elevation'),
+                         (4, 'Second volume - Elevation'),
+                         (5, 'Capacity loss - Elevation')):
+        fig.add_trace(createCurveTrace(
+                                storageChange[:,column],
+                                elevations,
+                                maxPoints,
+                                name=name
+                                ),
+                                secondary_y=False
+                                )
+    for column, name in ((1, 'Area - Elevation'),
+                         (3, 'Second area - Elevation')):
+        fig.add_trace(createCurveTrace(
+                                storageChange[:,column],
+                                elevations,
+                                maxPoints,
+                                name=name
+                                ),
+                                secondary_y=True
+                                )
+
+    fig.data[3].update(xaxis='x2')
+    fig.data[4].update(xaxis='x2')
+    fig.update_layout(
+        title='Storage change: Area x Volume x Elevation',
+        xaxis=dict(title='Volume (m³)'),
+        yaxis=dict(title='Elevation (m)'),
+        xaxis2=dict(title='Area (m²)',
+                    overlaying='x',
+                    side='top',
+                    autorange='reversed'),
+        yaxis2=dict(
+                    title='Elevation (m)',
+                    overlaying='y',
+                    side='right',
+                    position=1
+                    )
+                        )
+
+    return fig
+def executeEpochs (demSource,plan,epochSources,epochNames,step,feedback=None,maxPoints=MAX_GRAPH_POINTS):
+    '''
+    uses input parameters to execute plugin functions, computing the
+    curves of the epochs on common bins and graphing them overlaid,
+    returning None for both when the user cancels
+    '''
+    epochCurves = computeEpochCurves(demSource,
+                                     plan,
+                                     epochSources,
+                                     step,
+                                     feedback)
+    if epochCurves is None:
+        return None, None
+    if feedback is not None:
+        for epochName, epochCurve in zip(epochNames, epochCurves):
+            feedback.pushInfo('Epoch {0}: maximum area of {1:.2f} m², maximum volume '
+                              'of {2:.2f} m³'.format(epochName, epochCurve[-1, 0], epochCurve[-1, 2]))
+    graph = createEpochGraph(epochCurves, epochNames, maxPoints)
+
+    return epochCurves, graph
+def createEpochGraph(epochCurves, epochNames, maxPoints=MAX_GRAPH_POINTS):
+    '''
+    create a graph with the area-height-volume data of the epochs,
+    overlaying their elevation-area and elevation-volume curves
+    '''
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    for epochCurve, epochName in zip(epochCurves, epochNames):
+        fig.add_trace(createCurveTrace(
+                                epochCurve[:,2],
+                                epochCurve[:,1],
+                                maxPoints,
+                                name='Volume - Elevation ' + epochName,
+                                legendgroup='volume'
+                                ),
+                                secondary_y=False
+                                )
+    for epochCurve, epochName in zip(epochCurves, epochNames):
+        fig.add_trace(createCurveTrace(
+                                epochCurve[:,0],
+                                epochCurve[:,1],
+                                maxPoints,
+                                line=dict(dash='dot'),
+                                name='Area - Elevation ' + epochName,
+                                legendgroup='area'
+                                ),
+                                secondary_y=True
+                                )
+
+    for trace in fig.data[len(epochCurves):]:
+        trace.update(xaxis='x2')
+    fig.update_layout(
+        title='Area x Volume x Elevation of the epochs',
+        xaxis=dict(title='Volume (m³)'),
+        yaxis=dict(title='Elevation (m)'),
+        xaxis2=dict(title='Area (m²)',
+                    overlaying='x',
+                    side='top',
+                    autorange='reversed'),
+        yaxis2=dict(
+                    title='Elevation (m)',
+                    overlaying='y',
+                    side='right',
+                    position=1
+                    )
+                        )
+
+    return fig
+def writePlotlyBundle (bundleFolder):
+    '''
+    writes the plotly.js library once in the folder, to be shared by
+    the graphs written in the shared format, returning its path
+    '''
+    bundlePath = os.path.join(bundleFolder, PLOTLY_BUNDLE)
+    if not os.path.exists(bundlePath):
+        temporaryPath = bundlePath + '.' + str(os.getpid())
+        with open(temporaryPath, 'w', encoding='utf-8') as bundleFile:
+            bundleFile.write(get_plotlyjs())
+        os.replace(temporaryPath, bundlePath)
+
+    return bundlePath
+def writeGraph (graph, graphPath, graphFormat='html', bundleFolder=None):
+    '''
+    writes the graph as an HTML file with plotly.js embedded (html), as an
+    HTML file that loads the plotly.js shared by the graphs of the bundle
+    folder, the folder of the graph by default (shared), or as the JSON
+    of the figure, to be rendered by any Plotly client (json)
+    '''
+    if graphFormat == 'json':
+        graph.write_json(graphPath)
+    elif graphFormat == 'shared':
+        graphFolder = os.path.dirname(os.path.abspath(graphPath))
+        bundlePath = writePlotlyBundle(bundleFolder or graphFolder)
+        graph.write_html(graphPath,
+                         include_plotlyjs=os.path.relpath(bundlePath, graphFolder).replace(os.sep, '/'))
+    else:
+        graph.write_html(graphPath)
@@ -28,248 +28,139 @@ __copyright__ = '(C) 2024 by João Vitor Pimenta'
 # This will get replaced with a git SHA1 when you do a git archive
 
 __revision__ = '$Format:%H$'
-
 from qgis.PyQt.QtCore import QVariant
-from qgis.core import (QgsProcessingException,
-                       QgsRasterLayer,
-                       QgsVectorLayer,
-                       QgsField)
-import processing
-from numpy import loadtxt, append, column_stack
-from scipy.integrate import cumulative_trapezoid
-from scipy.interpolate import interp1d
-from ..exceptions.processingExceptions import (verifyIfAreaValueIsInTheCurve,
-                                               verifyIfElevationValueIsInTheCurve,
-                                               verifyIfHeightValueIsInTheCurve,
-                                               verifyIfVolumeValueIsInTheCurve,
-                                               verifyNumberOfPointsInCurve)
-def executePlugin (dem,area,selectedParameter,parameterValue,spacing):
-    '''
-    uses input parameters to execute plugin functions
-    '''
-    hypsometricCurve = generateHypsometricCurves(dem,area,spacing)
-    AHV = calculateAreaHeightVolume(hypsometricCurve)
-    waterElevation, waterHeight, waterArea, waterVolume = findParameter(AHV,
-                                                    selectedParameter,
-                                                    parameterValue,
-                                                    spacing)
-    inundAreaClipped = clipInundationArea(dem,area)
-    inundAreaReclassified = reclassifyInundationArea(inundAreaClipped,
-                                                    waterElevation)
-    inundAreaVectorized = vectorizeInundationArea(inundAreaReclassified)
-    inundAreaDissolved = dissolveInundationArea(inundAreaVectorized)
-    inundAreaWAttributes = addAttributes(inundAreaDissolved,
-                                            waterElevation,
-                                            waterHeight,
-                                            waterArea,
-                                            waterVolume)
-
-    return inundAreaWAttributes
-def generateHypsometricCurves (dem,area,step):
-    '''
-    generates hypsometric curve data
-    '''
-    params = {
-            'INPUT_DEM':dem,
-            'BOUNDARY_LAYER':area,
-            'STEP':step,
-            'USE_PERCENTAGE':False,
-            'OUTPUT_DIRECTORY':'TEMPORARY_OUTPUT'
-    }
-    hypsometricCurve = processing.run(
-                                      "qgis:hypsometriccurves",
-                                      params
-                                      )['OUTPUT_DIRECTORY']
-    maskName = area.sourceName()
-    features = area.getFeatures()
-    feature = next(features, None)
-    featureID = feature.id()
-    path = hypsometricCurve+'/histogram_'+maskName+'_'+str(featureID)+'.csv'
-
-    return path
-def calculateAreaHeightVolume (areaHeightCurve):
-    '''
-    integrates the hypsometric curve, generating elevation-area-volume data
-    '''
-    data = loadtxt(areaHeightCurve, delimiter=',',skiprows=1)
-
-    verifyNumberOfPointsInCurve(data)
-
-    xd = data[:, 0].tolist()
-    yd = data[:, 1].tolist()
-
-    integration = cumulative_trapezoid(xd,yd)
-    integrationComplet = append(integration,0)
-    data_with_integration = column_stack((data,integrationComplet))
-    dataWoLastRow = data_with_integration[:-1]
-
-    return dataWoLastRow
-def findParameter (dataAHV,parameter,parameterValue,verticalSpacing):
-    '''
-    from the elevation-area-volume data, interpolates the parameter value
-    provided by the user in the curves and finds the equivalent elevation
-    '''
-    volumes = dataAHV[:, 2]
-    elevations = dataAHV[:, 1]
-    areas = dataAHV[:, 0]
-
-    HEIGHT_PARAMETER = 'HEIGHT (m)'
-    ELEVATION_PARAMETER = 'ELEVATION (m)'
-    AREA_PARAMETER = 'AREA (m2)'
-    VOLUME_PARAMETER = 'VOLUME (m3)'
-
-    if parameter == HEIGHT_PARAMETER:
-
-        verifyIfHeightValueIsInTheCurve(parameterValue,elevations,verticalSpacing)
-
-        heightAreaInterpolation = interp1d(elevations, areas, kind='linear')
-        heightVolInterpolation = interp1d(elevations, volumes, kind='linear')
-
-        waterElevation = float(parameterValue+elevations[0]-1)
-        waterHeight = float(parameterValue)
-        waterArea = float(heightAreaInterpolation(parameterValue+elevations[0]-1))
-        waterVolume = float(heightVolInterpolation(parameterValue+elevations[0]-1))
-        return waterElevation, waterHeight, waterArea, waterVolume
-
-    if parameter == ELEVATION_PARAMETER:
-
-        verifyIfElevationValueIsInTheCurve(parameterValue,elevations)
-
-        heightAreaInterpolation = interp1d(elevations, areas, kind='linear')
-        heightVolInterpolation = interp1d(elevations, volumes, kind='linear')
-
-        waterElevation = float(parameterValue)
-        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
-        waterArea = float(heightAreaInterpolation(parameterValue))
-        waterVolume = float(heightVolInterpolation(parameterValue))
-
-        return waterElevation, waterHeight, waterArea, waterVolume
-
-    if parameter == AREA_PARAMETER:
-
-        verifyIfAreaValueIsInTheCurve(parameterValue,areas)
-
-        areaVolInterpolation = interp1d(areas, volumes, kind='linear')
-        areaHeightInterpolation = interp1d(areas, elevations, kind='linear')
-
-        waterElevation = float(areaHeightInterpolation(parameterValue))
-        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
-        waterArea = float(parameterValue)
-        waterVolume = float(areaVolInterpolation(parameterValue))
-        return waterElevation, waterHeight, waterArea, waterVolume
-
-    if parameter == VOLUME_PARAMETER:
-
-        verifyIfVolumeValueIsInTheCurve(parameterValue,volumes)
-
-        volAreaInterpolation = interp1d(volumes, areas, kind='linear')
-        volHeightInterpolation = interp1d(volumes, elevations, kind='linear')
-
-        waterElevation = float(volHeightInterpolation(parameterValue))
-        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
-        waterArea = float(volAreaInterpolation(parameterValue))
-        waterVolume = float(parameterValue)
-
-        return waterElevation, waterHeight, waterArea, waterVolume
-def clipInundationArea (dem, mask):
-    '''
-    clip the raster with the vector layer
-    '''
-    params = {
-            'INPUT':dem,
-            'MASK':mask,
-            'NODATA':-99999,
-            'CROP_TO_CUTLINE':False,
-            'OUTPUT':'TEMPORARY_OUTPUT'
-            }
-    clip = processing.run(
-                        "gdal:cliprasterbymasklayer",
-                        params
-    )['OUTPUT']
-    demClipped = QgsRasterLayer(clip)
-
-    return demClipped
-def reclassifyInundationArea (demClipped,waterElev):
-    '''
-    reclassifies the raster based on the elevation obtained
-    from the interpolation of the given parameter
-    '''
-    params = {
-            'INPUT_RASTER':demClipped,
-            'RASTER_BAND':1,
-            'TABLE':['0',waterElev,'1',waterElev,'40000','0'],
-            'NO_DATA':-9999,
-            'RANGE_BOUNDARIES':0,
-            'NODATA_FOR_MISSING':False,
-            'DATA_TYPE':6,
-            'OUTPUT':'TEMPORARY_OUTPUT'}
-    reclassifing = processing.run(
-                                    "native:reclassifybytable",
-                                    params
-    )['OUTPUT']
-    demReclassified = QgsRasterLayer(reclassifing)
-
-    return demReclassified
-def vectorizeInundationArea (demReclassified):
-    '''
-    vectorizes the reclassified raster
-    '''
-    params = {
-            'INPUT':demReclassified,
-            'OUTPUT':'TEMPORARY_OUTPUT'
-            }
-
-    vectorization = processing.run(
-                                    "gdal:polygonize",
-                                    params
-    )['OUTPUT']
-
-    demVectorized = QgsVectorLayer(vectorization)
-
-    return demVectorized
-def dissolveInundationArea (vectorizedInundationArea):
-    '''
-    dissolves the flooded area features
-    '''
-    pr = vectorizedInundationArea.dataProvider()
-    pr.setSubsetString("\"DN\" = 1")
-
-    params = {
-            'INPUT': vectorizedInundationArea,
-            'FIELD':['DN'],
-            'SEPARATE_DISJOINT':False,
-            'OUTPUT':'memory:inundationArea'
-            }
-    inundationAreaDissolved = processing.run("native:dissolve",params)['OUTPUT']
-
-    return inundationAreaDissolved
-def addAttributes (inundArea, waterElev, waterHeight, waterArea, waterVolume):
-    '''
-    adds elevation-area-volume curve data to the flooded area attribute table
-    '''
-    elevField = QgsField('Elevation (m)', QVariant.Double,len=10, prec=2)
-    heightField = QgsField('Height (m)', QVariant.Double, len=10, prec=2)
-    areaField = QgsField('Area (m2)', QVariant.Double, len=10, prec=2)
-    volumeField = QgsField('Volume (m3)', QVariant.Double, len=10, prec=2)
-    inundationAreaPr = inundArea.dataProvider()
-    inundationAreaPr.addAttributes([elevField,
-                                    heightField,
-                                    areaField,
-                                    volumeField])
-    inundArea.updateFields()
-    inundArea.startEditing()
-    elevationFieldID = inundArea.fields().indexOf('Elevation (m)')
-    heightFieldID = inundArea.fields().indexOf('Height (m)')
-    areaFieldID = inundArea.fields().indexOf('Area (m2)')
-    volumeFieldID = inundArea.fields().indexOf('Volume (m3)')
-    for features in inundArea.getFeatures():
-        features.setAttribute(elevationFieldID, waterElev)
-        features.setAttribute(heightFieldID, waterHeight)
-        features.setAttribute(areaFieldID, waterArea)
-        features.setAttribute(volumeFieldID, waterVolume)
-        inundArea.updateFeature(features)
-
-    inundArea.deleteAttribute(inundArea.fields().indexOf('DN'))
-    inundArea.commitChanges()
-
-    return inundArea
+from qgis.core import (QgsCoordinateReferenceSystem,
+                       QgsFeature,
+                       QgsField,
+                       QgsFields,
+                       QgsGeometry)
+from ..core.inundation import (computeInundationArea,
+                               computeInundationMask,
+                               computeInundationScenarios)
+from ..core.preview import mapPreviewLevels
+from .algorithmSink import FeatureOutput
+def executePlugin (demSource,plan,levels,selectedParameter,parameterValue,spacing,feedback=None,depthPath=None):
+    '''
+    uses input parameters to execute plugin functions, computing the
+    inundation area (and the water depth raster, when a path is given)
+    of each preview level and keeping the finest one
+    '''
+    for level, inundationArea in mapPreviewLevels(
+            lambda levelSource, levelPlan: computeInundationArea(levelSource,
+                                                                 levelPlan,
+                                                                 selectedParameter,
+                                                                 parameterValue,
+                                                                 spacing,
+                                                                 feedback,
+                                                                 depthPath),
+            demSource,
+            plan,
+            levels,
+            feedback):
+        if feedback is not None and level.factor > 1:
+            feedback.pushInfo('Preview at 1/{0} resolution: water elevation of {1:.2f} m, '
+                              'area of {2:.2f} m², volume of {3:.2f} m³'.format(level.factor,
+                                                                                inundationArea.elevation,
+                                                                                inundationArea.area,
+                                                                                inundationArea.volume))
+    return createFeatureOutput([inundationArea],plan.projection)
+def executeMask (demSource,plan,levels,selectedParameter,parameterValue,spacing,maskPath,maskBits,feedback=None,depthPath=None):
+    '''
+    uses input parameters to execute plugin functions, writing only the
+    mask raster of the inundation area of each preview level
+    '''
+    for level, inundationArea in mapPreviewLevels(
+            lambda levelSource, levelPlan: computeInundationMask(levelSource,
+                                                                 levelPlan,
+                                                                 selectedParameter,
+                                                                 parameterValue,
+                                                                 spacing,
+                                                                 maskPath,
+                                                                 maskBits,
+                                                                 feedback,
+                                                                 depthPath),
+            demSource,
+            plan,
+            levels,
+            feedback):
+        if feedback is not None:
+            feedback.pushInfo('{0}water elevation of {1:.2f} m, height of {2:.2f} m, '
+                              'area of {3:.2f} m², volume of {4:.2f} m³'.format(
+                                  'Preview at 1/{0} resolution: '.format(level.factor)
+                                  if level.factor > 1 else '',
+                                  inundationArea.elevation,
+                                  inundationArea.height,
+                                  inundationArea.area,
+                                  inundationArea.volume))
+
+    return inundationArea
+def executeScenarios (demSource,plan,levels,selectedParameter,scenarios,spacing,feedback=None):
+    '''
+    uses input parameters to execute plugin functions for each scenario
+    (id, parameter value), computing the curve and the DEM window once
+    '''
+    scenarioIds = [scenarioId for scenarioId, _ in scenarios]
+    parameterValues = [parameterValue for _, parameterValue in scenarios]
+    for level, inundationAreas in mapPreviewLevels(
+            lambda levelSource, levelPlan: computeInundationScenarios(levelSource,
+                                                                      levelPlan,
+                                                                      selectedParameter,
+                                                                      parameterValues,
+                                                                      spacing,
+                                                                      feedback),
+            demSource,
+            plan,
+            levels,
+            feedback):
+        if feedback is not None and level.factor > 1:
+            feedback.pushInfo('Preview at 1/{0} resolution: {1} scenarios, water elevations '
+                              'from {2:.2f} m to {3:.2f} m'.format(level.factor,
+                                                                   len(inundationAreas),
+                                                                   min(area.elevation for area in inundationAreas),
+                                                                   max(area.elevation for area in inundationAreas)))
+    return createFeatureOutput(inundationAreas,plan.projection,scenarioIds)
+def createFields (scenarioIds=None):
+    '''
+    creates the fields of the inundation area with the elevation-area-volume
+    curve data, and the scenario id when given
+    '''
+    fields = QgsFields()
+    if scenarioIds is not None:
+        fields.append(QgsField('Scenario', QVariant.String))
+    fields.append(QgsField('Elevation (m)', QVariant.Double,len=10, prec=2))
+    fields.append(QgsField('Height (m)', QVariant.Double, len=10, prec=2))
+    fields.append(QgsField('Area (m2)', QVariant.Double, len=10, prec=2))
+    fields.append(QgsField('Volume (m3)', QVariant.Double, len=10, prec=2))
+
+    return fields
+def generateFeatures (inundationAreas, fields, scenarioIds=None):
+    '''
+    generates the features of the inundation areas that are not empty,
+    with the curve data and the scenario id of each one in the attributes
+    '''
+    for index, inundationArea in enumerate(inundationAreas):
+        geometry = QgsGeometry()
+        geometry.fromWkb(inundationArea.geometryWkb)
+        if geometry.isEmpty():
+            continue
+        attributes = [inundationArea.elevation,
+                      inundationArea.height,
+                      inundationArea.area,
+                      inundationArea.volume]
+        if scenarioIds is not None:
+            attributes.insert(0, scenarioIds[index])
+        feature = QgsFeature(fields)
+        feature.setGeometry(geometry)
+        feature.setAttributes(attributes)
+        yield feature
+def createFeatureOutput (inundationAreas, projection, scenarioIds=None):
+    '''
+    creates the output of the inundation areas, their features streamed
+    to the sink from the vectorized geometries, without a memory layer
+    '''
+    fields = createFields(scenarioIds)
+
+    return FeatureOutput(fields,
+                         QgsCoordinateReferenceSystem.fromWkt(projection),
+                         generateFeatures(inundationAreas, fields, scenarioIds),
+                         len(inundationAreas))
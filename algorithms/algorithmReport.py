@@ -0,0 +1,66 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation area by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+import os
+from ..core.report import (readCurveFolderReservoirs,
+                           readCurveStoreReservoirs,
+                           renderReport)
+from .algorithmGraph import writePlotlyBundle
+
+REPORT_PROGRESS_INTERVAL = 100
+
+def executePlugin (curveStorePath,curveFolder,reportPath,title,feedback=None):
+    '''
+    uses input parameters to execute plugin functions, reading the curves
+    of the reservoirs of the curve store or of the folder of curve CSV
+    files and rendering the report, with the plotly.js shared in its
+    folder, returning the number of reservoirs
+    '''
+    if curveStorePath:
+        reservoirs = readCurveStoreReservoirs(curveStorePath)
+    else:
+        reservoirs = readCurveFolderReservoirs(curveFolder)
+
+    summaries = []
+    for reservoir in reservoirs:
+        if feedback is not None and feedback.isCanceled():
+            break
+        summaries.append(reservoir)
+        if feedback is not None and len(summaries) % REPORT_PROGRESS_INTERVAL == 0:
+            feedback.pushInfo(str(len(summaries)) + ' reservoirs read')
+
+    reportFolder = os.path.dirname(os.path.abspath(reportPath))
+    bundlePath = writePlotlyBundle(reportFolder)
+    renderReport(reportPath,
+                 summaries,
+                 os.path.relpath(bundlePath, reportFolder).replace(os.sep, '/'),
+                 title)
+
+    return len(summaries)
@@ -0,0 +1,60 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation area by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+from collections import namedtuple
+from itertools import islice
+from qgis.core import QgsFeatureSink
+
+SINK_BATCH_SIZE = 1000
+
+FeatureOutput = namedtuple('FeatureOutput', ['fields',
+                                             'crs',
+                                             'features',
+                                             'featureCount'])
+
+def writeFeatures (sink, features, featureCount, feedback):
+    '''
+    writes the features streamed from the generator to the sink in
+    batches, updating the progress once per batch and stopping when
+    the algorithm is canceled, returning the number of written features
+    '''
+    total = 100.0 / featureCount if featureCount else 0
+    features = iter(features)
+    written = 0
+
+    while not feedback.isCanceled():
+        batch = list(islice(features, SINK_BATCH_SIZE))
+        if not batch:
+            break
+        sink.addFeatures(batch, QgsFeatureSink.FastInsert)
+        written += len(batch)
+        feedback.setProgress(int(written * total))
+
+    return written
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation 
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-11-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .algorithms.algorithmGraph import (GRAPH_FORMATS,
+                                        MAX_GRAPH_POINTS,
+                                        createGraph,
+                                        writeGraph,
+                                        writePlotlyBundle)
+from .core.coreExceptions import verifyVerticalSpacingInput
+from .core.curve import (AREA_PARAMETER,
+                         ELEVATION_PARAMETER,
+                         HEIGHT_PARAMETER,
+                         VOLUME_PARAMETER,
+                         computeAreaHeightVolume,
+                         saveAreaHeightVolumeData)
+from .core.demWindow import (DEFAULT_CACHE_BUDGET_MB,
+                             DEMSource,
+                             readAreaGeometryWkt,
+                             setDEMWindowCacheBudget)
+from .core.inundation import computeInundationArea, writeInundationArea
+from .core.journal import (JOURNAL_FILE,
+                           calculateJobFingerprint,
+                           clearJournal,
+                           openJournal,
+                           readJournalSummary,
+                           recordJob)
+from .core.plan import planExecution
+
+PARAMETERS = {
+    'height': HEIGHT_PARAMETER,
+    'elevation': ELEVATION_PARAMETER,
+    'area': AREA_PARAMETER,
+    'volume': VOLUME_PARAMETER
+}
+
+SUMMARY_FIELDS = ['id',
+                  'status',
+                  'seconds',
+                  'min_elevation',
+                  'max_elevation',
+                  'max_area',
+                  'max_volume',
+                  'water_elevation',
+                  'water_height',
+                  'water_area',
+                  'water_volume',
+                  'data',
+                  'graph',
+                  'inundation_area',
+                  'reused',
+                  'error']
+
+OUTPUT_FIELDS = ['data', 'graph', 'inundation_area']
+
+JOB_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+def readManifest (manifestPath):
+    '''
+    reads the reservoirs of the manifest, a CSV file or a JSON list
+    with the id, dem, area, step and optionally the parameter and
+    value of the stage query of each reservoir; the ids name the output
+    folders and the journal entries of the jobs, so they must be unique
+    and made of letters, digits, dots, hyphens and underscores
+    '''
+    if manifestPath.lower().endswith('.json'):
+        with open(manifestPath, encoding='utf-8') as manifestFile:
+            items = json.load(manifestFile)
+    else:
+        with open(manifestPath, newline='', encoding='utf-8') as manifestFile:
+            items = list(csv.DictReader(manifestFile))
+
+    manifestFolder = os.path.dirname(os.path.abspath(manifestPath))
+    jobs = []
+    jobIds = set()
+    for index, item in enumerate(items):
+        parameter = (item.get('parameter') or '').strip().lower()
+        if parameter and parameter not in PARAMETERS:
+            raise ValueError('Unknown parameter in the manifest: ' + parameter)
+        jobId = str(item.get('id') or index + 1).strip()
+        if not JOB_ID_PATTERN.fullmatch(jobId):
+            raise ValueError('Invalid id in the manifest, use only letters, digits, '
+                             'dots, hyphens and underscores: ' + jobId)
+        if jobId.lower() in jobIds:
+            raise ValueError('Duplicate id in the manifest: ' + jobId)
+        jobIds.add(jobId.lower())
+        jobs.append({
+            'id': jobId,
+            'dem': os.path.join(manifestFolder, item['dem']),
+            'area': os.path.join(manifestFolder, item['area']),
+            'step': float(item.get('step') or 1),
+            'parameter': PARAMETERS.get(parameter),
+            'value': float(item['value']) if item.get('value') not in (None, '') else None
+        })
+
+    return jobs
+def runJob (job, outputFolder, maxMemoryMB, graphFormat='html', maxPoints=MAX_GRAPH_POINTS):
+    '''
+    calculates the curve of the reservoir and, if the job has a stage
+    query, its inundation area, returning the summary row of the job
+    '''
+    start = time.time()
+    summary = {'id': job['id'], 'status': 'ok'}
+    jobFolder = os.path.join(outputFolder, job['id'])
+    os.makedirs(jobFolder, exist_ok=True)
+
+    try:
+        setDEMWindowCacheBudget(maxMemoryMB if maxMemoryMB > 0 else DEFAULT_CACHE_BUDGET_MB)
+        verifyVerticalSpacingInput(job['step'])
+        demSource = DEMSource(job['dem'], 1, readAreaGeometryWkt(job['area']))
+        plan = planExecution(demSource, maxMemoryMB)
+
+        AHV = computeAreaHeightVolume(demSource, plan, job['step'])
+        summary['data'] = os.path.join(jobFolder, 'curve.csv')
+        summary['graph'] = os.path.join(jobFolder, 'curve.json' if graphFormat == 'json' else 'curve.html')
+        saveAreaHeightVolumeData(summary['data'], AHV)
+        writeGraph(createGraph(AHV, maxPoints=maxPoints), summary['graph'], graphFormat, outputFolder)
+
+        summary['min_elevation'] = AHV[0, 1]
+        summary['max_elevation'] = AHV[-1, 1]
+        summary['max_area'] = AHV[-1, 0]
+        summary['max_volume'] = AHV[-1, 2]
+
+        if job['parameter'] is not None and job['value'] is not None:
+            inundationArea = computeInundationArea(demSource,
+                                                   plan,
+                                                   job['parameter'],
+                                                   job['value'],
+                                                   job['step'])
+            summary['water_elevation'] = inundationArea.elevation
+            summary['water_height'] = inundationArea.height
+            summary['water_area'] = inundationArea.area
+            summary['water_volume'] = inundationArea.volume
+            summary['inundation_area'] = os.path.join(jobFolder, 'inundation_area.gpkg')
+            writeInundationArea(summary['inundation_area'],
+                                inundationArea,
+                                plan.projection)
+    except Exception as exception: # pylint: disable=broad-except
+        summary['status'] = 'failed'
+        summary['error'] = str(exception)
+
+    summary['seconds'] = round(time.time() - start, 3)
+
+    return summary
+def writeSummary (summaryPath, summaries):
+    '''
+    writes the summary table of the batch run
+    '''
+    with open(summaryPath, 'w', newline='', encoding='utf-8') as summaryFile:
+        writer = csv.DictWriter(summaryFile, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+def fingerprintJob (job, options):
+    '''
+    returns the fingerprint of the inputs of the job, or None when its
+    area cannot be read, so the job is run and its error reported
+    '''
+    try:
+        return calculateJobFingerprint(job, readAreaGeometryWkt(job['area']), options)
+    except Exception: # pylint: disable=broad-except
+        return None
+def runBatch (manifestPath, outputFolder, workers, maxMemoryMB, graphFormat='html', maxPoints=MAX_GRAPH_POINTS, resume=True):
+    '''
+    runs the jobs of the manifest in a pool of worker processes
+    and writes the summary table in the output folder, with the
+    plotly.js shared by the graphs of all the jobs in the shared format;
+    the completed jobs are recorded in the journal of the output folder,
+    and when resuming, the jobs whose DEM, area, parameters and options
+    did not change since they were completed are reused, not run again;
+    the summary table lists the jobs in the order of the manifest
+    '''
+    jobs = readManifest(manifestPath)
+    os.makedirs(outputFolder, exist_ok=True)
+    if graphFormat == 'shared':
+        writePlotlyBundle(outputFolder)
+
+    journal = openJournal(os.path.join(outputFolder, JOURNAL_FILE))
+    if not resume:
+        clearJournal(journal)
+    options = {'graphFormat': graphFormat, 'maxPoints': maxPoints}
+
+    summaries = []
+    pendingJobs = []
+    for job in jobs:
+        fingerprint = fingerprintJob(job, options)
+        summary = None
+        if fingerprint is not None:
+            summary = readJournalSummary(journal, job['id'], fingerprint, OUTPUT_FIELDS)
+        if summary is None:
+            pendingJobs.append((job, fingerprint))
+        else:
+            summary['reused'] = True
+            summaries.append(summary)
+    if summaries:
+        print('{0} reservoirs reused from the journal'.format(len(summaries)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(runJob, job, outputFolder, maxMemoryMB, graphFormat, maxPoints): fingerprint
+                   for job, fingerprint in pendingJobs}
+        for current, future in enumerate(as_completed(futures), 1):
+            summary = future.result()
+            summary['reused'] = False
+            if summary['status'] == 'ok' and futures[future] is not None:
+                recordJob(journal, summary['id'], futures[future], summary)
+            summaries.append(summary)
+            print('[{0}/{1}] {2}: {3} ({4} s)'.format(current,
+                                                      len(pendingJobs),
+                                                      summary['id'],
+                                                      summary['status'],
+                                                      summary['seconds']))
+    journal.close()
+
+    jobOrder = {job['id']: index for index, job in reversed(list(enumerate(jobs)))}
+    summaries.sort(key=lambda summary: jobOrder[summary['id']])
+    writeSummary(os.path.join(outputFolder, 'summary.csv'), summaries)
+
+    return summaries
+def main (arguments=None):
+    '''
+    command-line entry point of the batch runner
+    '''
+    parser = argparse.ArgumentParser(
+        prog='python -m Surface_Water_Storage.batch_runner',
+        description='Calculates the Area-Elevation-Volume curves and the '
+                    'inundation areas of the reservoirs listed in a manifest, '
+                    'with GDAL and NumPy only, without QGIS.'
+    )
+    parser.add_argument('manifest',
+                        help='CSV or JSON file with the columns id, dem, area, '
+                             'step, parameter (height, elevation, area or volume) '
+                             'and value')
+    parser.add_argument('output',
+                        help='folder where the outputs and summary.csv are written')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help='number of worker processes')
+    parser.add_argument('--max-memory',
+                        type=int,
+                        default=0,
+                        help='memory budget of each job in MB (0 for no limit)')
+    parser.add_argument('--graph-format',
+                        choices=GRAPH_FORMATS,
+                        default='html',
+                        help='html embeds plotly.js in each graph, shared writes it once '
+                             'in the output folder for all the graphs, json writes only '
+                             'the figure')
+    parser.add_argument('--max-points',
+                        type=int,
+                        default=MAX_GRAPH_POINTS,
+                        help='maximum points of each curve of the graphs (0 for all)')
+    parser.add_argument('--restart',
+                        action='store_true',
+                        help='clears the journal of the output folder and runs every job, '
+                             'instead of reusing the jobs completed with the same inputs')
+    args = parser.parse_args(arguments)
+
+    summaries = runBatch(args.manifest,
+                         args.output,
+                         args.workers,
+                         args.max_memory,
+                         args.graph_format,
+                         args.max_points,
+                         not args.restart)
+    failed = sum(1 for summary in summaries if summary['status'] != 'ok')
+    reused = sum(1 for summary in summaries if summary['reused'])
+    print('{0} reservoirs processed, {1} reused, {2} recomputed, {3} failed'.format(len(summaries),
+                                                                              reused,
+                                                                              len(summaries) - reused,
+                                                                              failed))
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from numpy import (append, bincount, column_stack, cumsum, diff, interp,
+                   maximum, savetxt, searchsorted)
+from .coreExceptions import (verifyIfAreaValueIsInTheCurve,
+                             verifyIfElevationValueIsInTheCurve,
+                             verifyIfHeightValueIsInTheCurve,
+                             verifyIfVolumeValueIsInTheCurve,
+                             verifyNumberOfPointsInCurve)
+from .demWindow import mapDEMWindows
+from .hypsometry import computeHypsometricCurve
+
+HEIGHT_PARAMETER = 'HEIGHT (m)'
+ELEVATION_PARAMETER = 'ELEVATION (m)'
+AREA_PARAMETER = 'AREA (m2)'
+VOLUME_PARAMETER = 'VOLUME (m3)'
+
+def computeAreaHeightVolume (demSource, plan, step, feedback=None):
+    '''
+    calculates the elevation-area-volume data of the DEM window
+    '''
+    hypsometricCurve = computeHypsometricCurve(demSource, plan, step, feedback)
+    verifyNumberOfPointsInCurve(hypsometricCurve)
+
+    dataAHV = calculateAreaHeightVolume(hypsometricCurve)
+    if demSource.reachPath is not None:
+        dataAHV[:, 2] += computeReachStorage(demSource, plan, dataAHV[:, 1], feedback)
+
+    return dataAHV
+def countReachStorage (demWindow, elevations):
+    '''
+    sums the depth between the reach elevations and the terrain of the
+    cells (the water of the depressions filled when they connect to the
+    seed point) by the first elevation above their reach elevations
+    '''
+    reached = ~demWindow.data.mask
+    reachElevations = demWindow.data.data[reached]
+    depths = maximum(reachElevations - demWindow.terrain.data[reached], 0)
+
+    return bincount(searchsorted(elevations, reachElevations, side='right'),
+                    weights=depths,
+                    minlength=len(elevations) + 1)[:len(elevations)]
+def computeReachStorage (demSource, plan, elevations, feedback=None):
+    '''
+    calculates the volume stored below the reach elevations at each
+    elevation of the curve, which the integration of the area of the
+    reach elevations does not include
+    '''
+    storage = sum(mapDEMWindows(lambda demWindow: countReachStorage(demWindow, elevations),
+                                demSource,
+                                plan,
+                                feedback))
+
+    return cumsum(storage) * plan.cellWidth * plan.cellHeight
+def calculateAreaHeightVolume (data):
+    '''
+    integrates the hypsometric curve, generating elevation-area-volume data
+    '''
+    verifyNumberOfPointsInCurve(data)
+
+    areas = data[:, 0]
+    elevations = data[:, 1]
+
+    integration = cumsum(diff(elevations) * (areas[1:] + areas[:-1]) / 2)
+    integrationComplet = append(integration,0)
+    dataWithIntegration = column_stack((data,integrationComplet))
+    dataWoLastRow = dataWithIntegration[:-1]
+
+    return dataWoLastRow
+def findParameter (dataAHV,parameter,parameterValue,verticalSpacing):
+    '''
+    from the elevation-area-volume data, interpolates the parameter value
+    provided by the user in the curves and finds the equivalent elevation
+    '''
+    volumes = dataAHV[:, 2]
+    elevations = dataAHV[:, 1]
+    areas = dataAHV[:, 0]
+
+    if parameter == HEIGHT_PARAMETER:
+
+        verifyIfHeightValueIsInTheCurve(parameterValue,elevations,verticalSpacing)
+
+        waterElevation = float(parameterValue+elevations[0]-1)
+        waterHeight = float(parameterValue)
+        waterArea = float(interp(waterElevation, elevations, areas))
+        waterVolume = float(interp(waterElevation, elevations, volumes))
+        return waterElevation, waterHeight, waterArea, waterVolume
+
+    if parameter == ELEVATION_PARAMETER:
+
+        verifyIfElevationValueIsInTheCurve(parameterValue,elevations)
+
+        waterElevation = float(parameterValue)
+        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
+        waterArea = float(interp(parameterValue, elevations, areas))
+        waterVolume = float(interp(parameterValue, elevations, volumes))
+
+        return waterElevation, waterHeight, waterArea, waterVolume
+
+    if parameter == AREA_PARAMETER:
+
+        verifyIfAreaValueIsInTheCurve(parameterValue,areas)
+
+        waterElevation = float(interp(parameterValue, areas, elevations))
+        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
+        waterArea = float(parameterValue)
+        waterVolume = float(interp(parameterValue, areas, volumes))
+        return waterElevation, waterHeight, waterArea, waterVolume
+
+    if parameter == VOLUME_PARAMETER:
+
+        verifyIfVolumeValueIsInTheCurve(parameterValue,volumes)
+
+        waterElevation = float(interp(parameterValue, volumes, elevations))
+        waterHeight = float(waterElevation - elevations[0] + verticalSpacing)
+        waterArea = float(interp(parameterValue, volumes, areas))
+        waterVolume = float(parameterValue)
+
+        return waterElevation, waterHeight, waterArea, waterVolume
+def saveAreaHeightVolumeData (path, npAHVData):
+    '''
+    saves the area-height-volume data in a CSV file
+    '''
+    savetxt(
+            path,
+            npAHVData,
+            delimiter=',',
+            header='Area (m²),Elevation (m),Volume (m³)',
+            comments='',
+            fmt='%s'
+            )
@@ -0,0 +1,252 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+from numpy import array
+from osgeo import ogr, osr
+from .coreExceptions import StorageError
+from .curve import findParameter
+
+RESERVOIRS_LAYER = 'reservoirs'
+CURVES_LAYER = 'curves'
+FILLED_DEM_SUFFIX = ' (sinks filled)'
+
+def calculateDEMKey (demPath, filled=False):
+    '''
+    returns the DEM of the curve in the store, marking the curves computed
+    on the sink-filled DEM, so they do not replace the curves of the DEM
+    '''
+    return demPath + FILLED_DEM_SUFFIX if filled else demPath
+def quoteSQLValue (value):
+    '''
+    quotes a text value for the SQL statements of the store
+    '''
+    return "'" + str(value).replace("'", "''") + "'"
+def openCurveStore (path, projection=None):
+    '''
+    opens the curve store, a GeoPackage with the reservoirs polygons
+    (indexed by the GeoPackage R-tree) and the curves table, creating
+    it with the projection if it does not exist
+    '''
+    if os.path.exists(path):
+        storeDS = ogr.Open(path, 1)
+        if storeDS is None or storeDS.GetLayerByName(RESERVOIRS_LAYER) is None:
+            raise StorageError('The file is not a curve store: ' + path)
+        return storeDS
+
+    if projection is None:
+        raise StorageError('The curve store does not exist: ' + path)
+
+    spatialReference = osr.SpatialReference()
+    spatialReference.ImportFromWkt(projection)
+    storeDS = ogr.GetDriverByName('GPKG').CreateDataSource(path)
+    if storeDS is None:
+        raise StorageError('The curve store could not be created: ' + path)
+
+    reservoirsLayer = storeDS.CreateLayer(RESERVOIRS_LAYER,
+                                          spatialReference,
+                                          ogr.wkbMultiPolygon,
+                                          ['SPATIAL_INDEX=YES'])
+    reservoirsLayer.CreateField(ogr.FieldDefn('reservoir_id', ogr.OFTString))
+
+    curvesLayer = storeDS.CreateLayer(CURVES_LAYER, None, ogr.wkbNone)
+    curvesLayer.CreateField(ogr.FieldDefn('reservoir_id', ogr.OFTString))
+    curvesLayer.CreateField(ogr.FieldDefn('dem', ogr.OFTString))
+    for fieldName in ['step', 'area', 'elevation', 'volume']:
+        curvesLayer.CreateField(ogr.FieldDefn(fieldName, ogr.OFTReal))
+
+    storeDS.ExecuteSQL('CREATE UNIQUE INDEX reservoirs_id_idx '
+                       'ON reservoirs (reservoir_id)')
+    storeDS.ExecuteSQL('CREATE INDEX curves_key_idx '
+                       'ON curves (reservoir_id, dem, step)')
+
+    return storeDS
+def readCurveStoreProjection (path):
+    '''
+    returns the projection (WKT) of the reservoirs of the curve store
+    '''
+    storeDS = openCurveStore(path)
+    spatialReference = storeDS.GetLayerByName(RESERVOIRS_LAYER).GetSpatialRef()
+
+    return spatialReference.ExportToWkt() if spatialReference is not None else ''
+def upsertCurve (path, reservoirId, dem, step, geometryWkt, projection, npAHVData):
+    '''
+    inserts or replaces the reservoir polygon and its curve
+    for the DEM and step in the curve store
+    '''
+    storeDS = openCurveStore(path, projection)
+    reservoirsLayer = storeDS.GetLayerByName(RESERVOIRS_LAYER)
+    curvesLayer = storeDS.GetLayerByName(CURVES_LAYER)
+
+    geometry = ogr.ForceToMultiPolygon(ogr.CreateGeometryFromWkt(geometryWkt))
+    storeReference = reservoirsLayer.GetSpatialRef()
+    if storeReference is not None and projection:
+        sourceReference = osr.SpatialReference()
+        sourceReference.ImportFromWkt(projection)
+        sourceReference.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        storeReference.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        if not sourceReference.IsSame(storeReference):
+            geometry.Transform(osr.CoordinateTransformation(sourceReference,
+                                                            storeReference))
+
+    storeDS.StartTransaction()
+    try:
+        reservoirsLayer.SetAttributeFilter('reservoir_id = ' + quoteSQLValue(reservoirId))
+        reservoir = reservoirsLayer.GetNextFeature()
+        reservoirsLayer.SetAttributeFilter(None)
+        if reservoir is None:
+            reservoir = ogr.Feature(reservoirsLayer.GetLayerDefn())
+            reservoir.SetField('reservoir_id', reservoirId)
+            reservoir.SetGeometry(geometry)
+            reservoirsLayer.CreateFeature(reservoir)
+        else:
+            reservoir.SetGeometry(geometry)
+            reservoirsLayer.SetFeature(reservoir)
+
+        storeDS.ExecuteSQL('DELETE FROM curves WHERE reservoir_id = {0} '
+                           'AND dem = {1} AND step = {2}'.format(quoteSQLValue(reservoirId),
+                                                                 quoteSQLValue(dem),
+                                                                 float(step)))
+        curvesDefinition = curvesLayer.GetLayerDefn()
+        for area, elevation, volume in npAHVData:
+            curve = ogr.Feature(curvesDefinition)
+            curve.SetField('reservoir_id', reservoirId)
+            curve.SetField('dem', dem)
+            curve.SetField('step', float(step))
+            curve.SetField('area', float(area))
+            curve.SetField('elevation', float(elevation))
+            curve.SetField('volume', float(volume))
+            curvesLayer.CreateFeature(curve)
+    except Exception:
+        storeDS.RollbackTransaction()
+        raise
+    storeDS.CommitTransaction()
+def findReservoirsAtPoint (path, x, y):
+    '''
+    returns the ids of the reservoirs of the curve store that contain
+    the point, in the projection of the store
+    '''
+    storeDS = openCurveStore(path)
+    reservoirsLayer = storeDS.GetLayerByName(RESERVOIRS_LAYER)
+
+    point = ogr.Geometry(ogr.wkbPoint)
+    point.AddPoint_2D(x, y)
+    reservoirsLayer.SetSpatialFilterRect(x, y, x, y)
+
+    return [reservoir.GetField('reservoir_id') for reservoir in reservoirsLayer
+            if reservoir.GetGeometryRef().Contains(point)]
+def calculateCurveOrder ():
+    '''
+    returns the SQL order of the curves of a reservoir: the curves of the
+    DEM before the curves of the sink-filled DEM, the finest step first
+    '''
+    return 'substr(dem, -{0}) = {1}, step, dem'.format(len(FILLED_DEM_SUFFIX),
+                                                       quoteSQLValue(FILLED_DEM_SUFFIX))
+def readCurve (path, reservoirId, dem=None, step=None):
+    '''
+    reads the curve of the reservoir from the curve store, for the DEM
+    and step, or the curve with the finest step (of the DEM rather than
+    the sink-filled DEM) when they are not given, returning the DEM, the
+    step and the area-height-volume data
+    '''
+    storeDS = openCurveStore(path)
+
+    conditions = ['reservoir_id = ' + quoteSQLValue(reservoirId)]
+    if dem is not None:
+        conditions.append('dem = ' + quoteSQLValue(dem))
+    if step is not None:
+        conditions.append('step = ' + str(float(step)))
+    where = ' AND '.join(conditions)
+
+    keys = storeDS.ExecuteSQL('SELECT dem, step FROM curves WHERE ' + where +
+                              ' ORDER BY ' + calculateCurveOrder() + ' LIMIT 1')
+    try:
+        key = keys.GetNextFeature()
+        if key is None:
+            raise StorageError('There is no curve for the reservoir: ' + str(reservoirId))
+        dem, step = key.GetField('dem'), key.GetField('step')
+    finally:
+        storeDS.ReleaseResultSet(keys)
+
+    rows = storeDS.ExecuteSQL('SELECT area, elevation, volume FROM curves '
+                              'WHERE reservoir_id = {0} AND dem = {1} AND step = {2} '
+                              'ORDER BY elevation'.format(quoteSQLValue(reservoirId),
+                                                          quoteSQLValue(dem),
+                                                          float(step)))
+    try:
+        data = array([[row.GetField('area'),
+                       row.GetField('elevation'),
+                       row.GetField('volume')] for row in rows]).reshape(-1, 3)
+    finally:
+        storeDS.ReleaseResultSet(rows)
+
+    return dem, step, data
+def queryStage (path, reservoirId, parameter, parameterValue, dem=None, step=None):
+    '''
+    interpolates the parameter value in the stored curve of the reservoir,
+    returning the water elevation, height, area and volume
+    '''
+    _, storedStep, data = readCurve(path, reservoirId, dem, step)
+
+    return findParameter(data, parameter, parameterValue, storedStep)
+def readCurves (path):
+    '''
+    reads the curves of all the reservoirs of the curve store in one pass,
+    yielding the id, the DEM, the step, the area-height-volume data of
+    the curve with the finest step (of the DEM rather than the
+    sink-filled DEM) and the polygon of each reservoir
+    '''
+    storeDS = openCurveStore(path)
+    geometries = {reservoir.GetField('reservoir_id'): reservoir.GetGeometryRef().Clone()
+                  for reservoir in storeDS.GetLayerByName(RESERVOIRS_LAYER)
+                  if reservoir.GetGeometryRef() is not None}
+
+    rows = storeDS.ExecuteSQL('SELECT reservoir_id, dem, step, area, elevation, volume '
+                              'FROM curves ORDER BY reservoir_id, ' + calculateCurveOrder() +
+                              ', elevation')
+    curveKey, data = None, []
+    try:
+        for row in rows:
+            reservoirId = row.GetField('reservoir_id')
+            if curveKey is not None and reservoirId == curveKey[0]:
+                if (row.GetField('dem'), row.GetField('step')) != curveKey[1:]:
+                    continue
+            else:
+                if curveKey is not None:
+                    yield curveKey + (array(data).reshape(-1, 3), geometries.get(curveKey[0]))
+                curveKey, data = (reservoirId, row.GetField('dem'), row.GetField('step')), []
+            data.append([row.GetField('area'),
+                         row.GetField('elevation'),
+                         row.GetField('volume')])
+    finally:
+        storeDS.ReleaseResultSet(rows)
+    if curveKey is not None:
+        yield curveKey + (array(data).reshape(-1, 3), geometries.get(curveKey[0]))
@@ -0,0 +1,62 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+from numpy import abs as npAbs, arange, argmax, empty, floor, int64, linspace
+
+def decimateCurve (xValues, yValues, maxPoints):
+    '''
+    returns the indices of at most maxPoints points of the curve kept by
+    the largest-triangle-three-buckets decimation: the first and the last
+    points, and in each bucket of the points between them the point that
+    forms the largest triangle with the point kept in the previous bucket
+    and the mean of the next bucket, preserving the shape of the curve
+    '''
+    pointCount = len(xValues)
+    if maxPoints < 3 or pointCount <= maxPoints:
+        return arange(pointCount)
+
+    edges = floor(linspace(1, pointCount - 1, maxPoints - 1)).astype(int64)
+    indices = empty(maxPoints, dtype=int64)
+    indices[0], indices[-1] = 0, pointCount - 1
+
+    previous = 0
+    for bucket in range(maxPoints - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        nextEnd = edges[bucket + 2] if bucket + 2 < len(edges) else pointCount
+        nextX = xValues[end:nextEnd].mean()
+        nextY = yValues[end:nextEnd].mean()
+        areas = npAbs((xValues[previous] - nextX) * (yValues[start:end] - yValues[previous]) -
+                      (xValues[previous] - xValues[start:end]) * (nextY - yValues[previous]))
+        previous = start + int(argmax(areas))
+        indices[bucket + 1] = previous
+
+    return indices
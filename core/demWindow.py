@@ -0,0 +1,373 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import hashlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from math import floor, ceil
+from threading import Lock, local
+from numpy import ma, isnan, issubdtype, floating
+from osgeo import gdal, ogr
+from .coreExceptions import StorageError
+from .mask import fitsMaskCache, getGeometryMask
+from .zone import calculateZoneOffset, calculateZoneWindow, readZoneMask
+
+DEFAULT_CACHE_BUDGET_MB = 512
+
+DEMSource = namedtuple('DEMSource', ['rasterPath',
+                                     'band',
+                                     'geometryWkt',
+                                     'zonePath',
+                                     'zoneValue',
+                                     'reachPath'],
+                       defaults=(None, None, None))
+
+DEMWindow = namedtuple('DEMWindow', ['data',
+                                     'geoTransform',
+                                     'projection',
+                                     'cellWidth',
+                                     'cellHeight',
+                                     'terrain'],
+                      defaults=(None,))
+
+_demWindowCache = OrderedDict()
+_demWindowCacheLock = Lock()
+_demWindowCacheBudget = DEFAULT_CACHE_BUDGET_MB * 1024 * 1024
+
+def setDEMWindowCacheBudget (budgetMB):
+    '''
+    sets the memory budget of the DEM window cache, evicting the least
+    recently used windows that no longer fit
+    '''
+    global _demWindowCacheBudget
+    with _demWindowCacheLock:
+        _demWindowCacheBudget = max(int(budgetMB), 0) * 1024 * 1024
+        _evictDEMWindows()
+def clearDEMWindowCache ():
+    '''
+    removes all the DEM windows from the cache
+    '''
+    with _demWindowCacheLock:
+        _demWindowCache.clear()
+def geometryHash (geometryWkt):
+    '''
+    returns a stable hash of the geometry used to key the caches
+    '''
+    return hashlib.sha1(geometryWkt.encode('utf-8')).hexdigest()
+def calculateAreaHash (demSource):
+    '''
+    returns a stable hash of the area of the DEM source, its geometry
+    or its zone raster, zone value and version, and of the reach
+    elevations of its seed point
+    '''
+    if demSource.zonePath is None:
+        areaHash = geometryHash(demSource.geometryWkt)
+    else:
+        areaHash = geometryHash(repr((demSource.zonePath,
+                                      demSource.zoneValue,
+                                      sourceModifiedTime(demSource.zonePath))))
+    if demSource.reachPath is None:
+        return areaHash
+
+    return geometryHash(repr((areaHash, demSource.reachPath)))
+def sourceModifiedTime (rasterPath):
+    '''
+    returns the modification time of the raster file, or None if the
+    source is not a file on disk
+    '''
+    try:
+        return os.path.getmtime(rasterPath)
+    except OSError:
+        return None
+def calculateWindowBounds (rasterDS, geometry):
+    '''
+    calculates the pixel window (column, row, width, height)
+    of the raster that covers the geometry bounding box
+    '''
+    geoTransform = rasterDS.GetGeoTransform()
+    xMin, xMax, yMin, yMax = geometry.GetEnvelope()
+
+    startColumn = max(int(floor((xMin - geoTransform[0]) / geoTransform[1])), 0)
+    endColumn = min(int(ceil((xMax - geoTransform[0]) / geoTransform[1])),
+                    rasterDS.RasterXSize)
+    startRow = max(int(floor((yMax - geoTransform[3]) / geoTransform[5])), 0)
+    endRow = min(int(ceil((yMin - geoTransform[3]) / geoTransform[5])),
+                 rasterDS.RasterYSize)
+
+    if endColumn <= startColumn or endRow <= startRow:
+        raise StorageError(
+            "The feature don't intersects the DEM extent"
+        )
+
+    return startColumn, startRow, endColumn - startColumn, endRow - startRow
+def calculateSourceWindow (rasterDS, demSource):
+    '''
+    calculates the pixel window of the raster that covers the area
+    of the DEM source, its geometry or the cells of its zone
+    '''
+    if demSource.zonePath is not None:
+        return calculateZoneWindow(rasterDS, demSource).window
+
+    return calculateWindowBounds(rasterDS, ogr.CreateGeometryFromWkt(demSource.geometryWkt))
+def calculateWindowExtentWkt (geoTransform, width, height):
+    '''
+    returns the extent of a grid as a polygon WKT
+    '''
+    xMin, yMax = geoTransform[0], geoTransform[3]
+    xMax = xMin + width * geoTransform[1]
+    yMin = yMax + height * geoTransform[5]
+
+    return 'POLYGON (({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))'.format(xMin, yMin, xMax, yMax)
+def calculateWindowGeoTransform (geoTransform, window):
+    '''
+    calculates the geotransform of a pixel window of the raster
+    '''
+    startColumn, startRow = window[0], window[1]
+
+    return (geoTransform[0] + startColumn * geoTransform[1],
+            geoTransform[1],
+            0.0,
+            geoTransform[3] + startRow * geoTransform[5],
+            0.0,
+            geoTransform[5])
+def readAreaMask (rasterDS, demSource, window, windowGeoTransform, feedback=None):
+    '''
+    returns the mask of the area in the pixel window, read from the zone
+    raster aligned with the DEM or burned from the geometry; the
+    geometry is burned once in the window of the DEM source and the
+    tiles inside it are sliced from this mask while it fits the cache
+    '''
+    if demSource.zonePath is not None:
+        return readZoneMask(rasterDS, demSource, window)
+
+    sourceWindow = calculateSourceWindow(rasterDS, demSource)
+    columnOffset, rowOffset = window[0] - sourceWindow[0], window[1] - sourceWindow[1]
+    if (0 <= columnOffset and columnOffset + window[2] <= sourceWindow[2] and
+            0 <= rowOffset and rowOffset + window[3] <= sourceWindow[3] and
+            fitsMaskCache(sourceWindow[2], sourceWindow[3])):
+        return getGeometryMask(demSource.geometryWkt,
+                               geometryHash(demSource.geometryWkt),
+                               calculateWindowGeoTransform(rasterDS.GetGeoTransform(), sourceWindow),
+                               sourceWindow[2],
+                               sourceWindow[3],
+                               feedback,
+                               slice(rowOffset, rowOffset + window[3]),
+                               slice(columnOffset, columnOffset + window[2]))
+
+    return getGeometryMask(demSource.geometryWkt,
+                           geometryHash(demSource.geometryWkt),
+                           windowGeoTransform,
+                           window[2],
+                           window[3],
+                           feedback)
+def readDEMWindow (rasterDS, demSource, window, feedback=None):
+    '''
+    reads the DEM window, masking the cells outside the area
+    and the cells with NODATA values; with reach elevations, the
+    window holds them, masking the cells not connected to the seed
+    point, and keeps the DEM as the terrain
+    '''
+    geoTransform = rasterDS.GetGeoTransform()
+    windowGeoTransform = calculateWindowGeoTransform(geoTransform, window)
+    rasterBand = rasterDS.GetRasterBand(demSource.band)
+    noData = rasterBand.GetNoDataValue()
+
+    data = rasterBand.ReadAsArray(*window)
+    inside = readAreaMask(rasterDS, demSource, window, windowGeoTransform, feedback)
+
+    invalid = ~inside
+    if noData is not None:
+        invalid |= data == noData
+    if issubdtype(data.dtype, floating):
+        invalid |= isnan(data)
+
+    terrain = None
+    if demSource.reachPath is not None:
+        terrain = ma.MaskedArray(data, mask=invalid, shrink=False)
+        terrain.data.setflags(write=False)
+        data = readReachElevations(rasterDS, demSource.reachPath, window)
+        invalid = invalid | isnan(data)
+
+    maskedData = ma.MaskedArray(data, mask=invalid, shrink=False)
+    maskedData.data.setflags(write=False)
+    maskedData.mask.setflags(write=False)
+
+    return DEMWindow(maskedData,
+                     windowGeoTransform,
+                     rasterDS.GetProjection(),
+                     abs(geoTransform[1]),
+                     abs(geoTransform[5]),
+                     terrain)
+def readReachElevations (rasterDS, reachPath, window):
+    '''
+    reads the reach elevations in the pixel window of the DEM, the
+    raster of the DEM window of the seed point on the same grid
+    '''
+    reachDS = gdal.Open(reachPath, gdal.GA_ReadOnly)
+    if reachDS is None:
+        raise StorageError('The reach elevations could not be opened: ' + reachPath)
+    columnOffset, rowOffset = calculateZoneOffset(rasterDS, reachDS)
+    column, row, width, height = window
+
+    return reachDS.GetRasterBand(1).ReadAsArray(column - columnOffset,
+                                                row - rowOffset,
+                                                width,
+                                                height)
+def readAreaGeometryWkt (areaPath):
+    '''
+    reads the geometry of the single feature of the area file
+    '''
+    areaDS = ogr.Open(areaPath)
+    if areaDS is None:
+        raise StorageError('The area could not be opened: ' + areaPath)
+    areaLayer = areaDS.GetLayer(0)
+    if areaLayer.GetFeatureCount() > 1:
+        raise StorageError(
+            'The layer has more than one feature!'
+        )
+    feature = areaLayer.GetNextFeature()
+    if feature is None or feature.GetGeometryRef() is None:
+        raise StorageError('The area has no features: ' + areaPath)
+
+    return feature.GetGeometryRef().ExportToWkt()
+def openDEM (rasterPath):
+    '''
+    opens the DEM raster with GDAL
+    '''
+    rasterDS = gdal.Open(rasterPath, gdal.GA_ReadOnly)
+    if rasterDS is None:
+        raise StorageError('The DEM could not be opened: ' + rasterPath)
+
+    return rasterDS
+def getDEMWindow (demSource, feedback=None):
+    '''
+    returns the masked DEM window covering the geometry, reusing the
+    decoded window of previous runs when the raster was not modified
+    '''
+    rasterDS = openDEM(demSource.rasterPath)
+    window = calculateSourceWindow(rasterDS, demSource)
+    key = (demSource.rasterPath,
+           demSource.band,
+           window,
+           calculateAreaHash(demSource))
+    modifiedTime = sourceModifiedTime(demSource.rasterPath)
+
+    with _demWindowCacheLock:
+        entry = _demWindowCache.get(key)
+        if entry is not None and entry[0] == modifiedTime:
+            _demWindowCache.move_to_end(key)
+            if feedback is not None:
+                feedback.pushInfo('DEM window cache hit: ' + str(window))
+            return entry[1]
+        if entry is not None:
+            del _demWindowCache[key]
+
+    if feedback is not None:
+        feedback.pushInfo('DEM window cache miss: ' + str(window))
+    demWindow = readDEMWindow(rasterDS,
+                              demSource,
+                              window,
+                              feedback)
+
+    with _demWindowCacheLock:
+        size = demWindow.data.data.nbytes + demWindow.data.mask.nbytes
+        if demWindow.terrain is not None:
+            size += demWindow.terrain.data.nbytes
+        _demWindowCache[key] = (modifiedTime,
+                                demWindow,
+                                size)
+        _evictDEMWindows()
+
+    return demWindow
+def calculateDEMWindowKey (demSource, plan):
+    '''
+    returns the key that identifies the DEM window of the plan and
+    the version of the raster file, used by the caches of derived data
+    '''
+    return (demSource.rasterPath,
+            demSource.band,
+            tuple(plan.window),
+            calculateAreaHash(demSource),
+            sourceModifiedTime(demSource.rasterPath))
+def calculateTiles (window, tileRows):
+    '''
+    splits the pixel window in tiles of rows
+    '''
+    column, row, width, height = window
+
+    return [(column, tileRow, width, min(tileRows, row + height - tileRow))
+            for tileRow in range(row, row + height, tileRows)]
+def mapDEMWindows (function, demSource, plan, feedback=None):
+    '''
+    applies the function to the DEM window, or to each of its tiles read
+    by parallel workers when the plan does not fit it in memory,
+    yielding the results in the order of the rows
+    '''
+    if plan.inMemory:
+        yield function(getDEMWindow(demSource, feedback))
+        return
+
+    workerData = local()
+
+    def processTile (tile):
+        if not hasattr(workerData, 'rasterDS'):
+            workerData.rasterDS = openDEM(demSource.rasterPath)
+        demWindow = readDEMWindow(workerData.rasterDS,
+                                  demSource,
+                                  tile)
+        return function(demWindow)
+
+    with ThreadPoolExecutor(plan.workers) as executor:
+        yield from mapBounded(executor, processTile, calculateTiles(plan.window, plan.tileRows), plan.workers)
+def mapBounded (executor, function, items, limit):
+    '''
+    applies the function to the items in the executor, yielding the results
+    in the order of the items and keeping at most the limit of items in
+    flight, so the tiles read ahead of the consumer are bounded by the
+    workers of the plan instead of the whole window
+    '''
+    futures = deque()
+    for item in items:
+        if len(futures) >= limit:
+            yield futures.popleft().result()
+        futures.append(executor.submit(function, item))
+    while futures:
+        yield futures.popleft().result()
+def _evictDEMWindows ():
+    '''
+    removes the least recently used windows until the cache fits the budget,
+    must be called with the cache lock held
+    '''
+    cacheSize = sum(entry[2] for entry in _demWindowCache.values())
+    while _demWindowCache and cacheSize > _demWindowCacheBudget:
+        _, entry = _demWindowCache.popitem(last=False)
+        cacheSize -= entry[2]
@@ -0,0 +1,325 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import tempfile
+import uuid
+from collections import namedtuple
+from numpy import (append, arange, bincount, column_stack, concatenate, cumsum,
+                   floor, full, int32, int64, maximum, minimum, savetxt, uint32,
+                   unique, vstack, zeros)
+from osgeo import gdal, ogr
+from .demWindow import calculateTiles
+from .fill import NEIGHBOUR_PAIRS, floodWindow
+from .inundation import createIntermediatePath, createWindowRaster
+
+Depression = namedtuple('Depression', ['depressionId',
+                                       'spillElevation',
+                                       'maxDepth',
+                                       'area',
+                                       'volume',
+                                       'curve'])
+
+DEPRESSION_FIELDS = ('Spill elevation (m)',
+                     'Max depth (m)',
+                     'Area (m2)',
+                     'Max storage (m3)')
+
+def labelTileDepressions (flooded, firstLabel):
+    '''
+    labels the groups of connected flooded cells of the tile (with the
+    8 neighbours) starting at the first label, in the order of their first
+    cell: the pairs of adjacent flooded cells join the trees of their cells
+    (the larger root under the smaller) and the trees are flattened, until
+    the cells of each group share the root of its first cell; returns the
+    labels (0 for the cells not flooded) and the next free label
+    '''
+    height, width = flooded.shape
+    cells = arange(height * width, dtype=int32).reshape(height, width)
+    parents = cells.ravel().copy()
+
+    firstCells, secondCells = [], []
+    for first, second in NEIGHBOUR_PAIRS:
+        joined = flooded[first] & flooded[second]
+        firstCells.append(cells[first][joined])
+        secondCells.append(cells[second][joined])
+    firstCells, secondCells = concatenate(firstCells), concatenate(secondCells)
+
+    while True:
+        firstRoots, secondRoots = parents[firstCells], parents[secondCells]
+        apart = firstRoots != secondRoots
+        if not apart.any():
+            break
+        firstRoots, secondRoots = firstRoots[apart], secondRoots[apart]
+        minimum.at(parents, maximum(firstRoots, secondRoots), minimum(firstRoots, secondRoots))
+        grandParents = parents[parents]
+        while (grandParents != parents).any():
+            parents, grandParents = grandParents, grandParents[grandParents]
+
+    groups, groupLabels = unique(parents[cells[flooded]], return_inverse=True)
+    labels = zeros((height, width), dtype=int64)
+    labels[flooded] = firstLabel + groupLabels.ravel()
+
+    return labels, firstLabel + len(groups)
+def accumulateDepressions (labels, depths, filled, step, statistics):
+    '''
+    accumulates the spill elevation, the maximum depth and the count
+    and sum of the depths of each depth bin of the labels of the tile
+    '''
+    flooded = labels > 0
+    if not flooded.any():
+        return
+
+    floodedLabels = labels[flooded]
+    order = floodedLabels.argsort(kind='stable')
+    floodedLabels = floodedLabels[order]
+    floodedDepths = depths[flooded][order]
+    floodedLevels = filled[flooded][order]
+
+    tileLabels, starts = unique(floodedLabels, return_index=True)
+    ends = append(starts[1:], len(floodedLabels))
+    for label, start, end in zip(tileLabels.tolist(), starts.tolist(), ends.tolist()):
+        labelDepths = floodedDepths[start:end]
+        bins = floor(labelDepths / step).astype(int64)
+        statistics[label] = [float(floodedLevels[start]),
+                             float(labelDepths.max()),
+                             bincount(bins),
+                             bincount(bins, weights=labelDepths)]
+def findRoot (parents, label):
+    '''
+    returns the label that represents the group of the label,
+    compressing the path to it
+    '''
+    root = label
+    while parents.get(root, root) != root:
+        root = parents[root]
+    while label != root:
+        parents[label], label = root, parents[label]
+
+    return root
+def joinTileDepressions (parents, previousRow, firstRow):
+    '''
+    joins the labels of the flooded cells of the last row of the previous
+    tile with the labels of their neighbours in the first row of the tile
+    '''
+    for columnShift in (-1, 0, 1):
+        previousLabels = previousRow[max(columnShift, 0):len(previousRow) + min(columnShift, 0)]
+        labels = firstRow[max(-columnShift, 0):len(firstRow) + min(-columnShift, 0)]
+        joined = (previousLabels > 0) & (labels > 0)
+        for previousLabel, label in set(zip(previousLabels[joined].tolist(), labels[joined].tolist())):
+            previousRoot, root = findRoot(parents, previousLabel), findRoot(parents, label)
+            if previousRoot != root:
+                parents[max(previousRoot, root)] = min(previousRoot, root)
+def mergeDepressionStatistics (statistics, parents):
+    '''
+    merges the statistics of the labels of each depression, keyed
+    by the label that represents it
+    '''
+    merged = {}
+    for label in sorted(statistics):
+        spillElevation, maxDepth, counts, depthSums = statistics.pop(label)
+        root = findRoot(parents, label)
+        if root not in merged:
+            merged[root] = [spillElevation, maxDepth, counts, depthSums]
+            continue
+        rootStatistics = merged[root]
+        rootStatistics[1] = max(rootStatistics[1], maxDepth)
+        rootStatistics[2] = addBins(rootStatistics[2], counts)
+        rootStatistics[3] = addBins(rootStatistics[3], depthSums)
+
+    return merged
+def addBins (bins, otherBins):
+    '''
+    adds two histograms of depth bins of different lengths
+    '''
+    if len(bins) < len(otherBins):
+        bins, otherBins = otherBins, bins
+    bins = bins.copy()
+    bins[:len(otherBins)] += otherBins
+
+    return bins
+def calculateDepressionCurve (spillElevation, counts, depthSums, step, cellArea):
+    '''
+    calculates the elevation-area-volume curve of the depression from the
+    count and sum of the depths of its depth bins, at the elevations of
+    the bin edges below the spill elevation, which are exact
+    '''
+    cellsBelow = cumsum(counts[::-1])[::-1]
+    depthsBelow = cumsum(depthSums[::-1])[::-1]
+    binDepths = step * arange(len(counts))
+
+    areas = cellsBelow * cellArea
+    elevations = spillElevation - binDepths
+    volumes = (depthsBelow - binDepths * cellsBelow) * cellArea
+
+    return column_stack((areas, elevations, volumes))[::-1]
+def computeDepressionInventory (demSource, plan, step, minDepth, feedback=None):
+    '''
+    finds the closed depressions of the DEM window, the groups of connected
+    cells flooded by the priority-flood from the cells where the water
+    leaves the area, in a single pass over its tiles: the cells are
+    labeled tile by tile (and the labels joined across the tile edges)
+    while their depths are accumulated in depth bins of the step, which
+    give the elevation-area-volume curve of each depression. Returns the
+    depressions at least as deep as the minimum depth and the raster of
+    their ids, which is removed if the inventory fails, or None when the
+    user cancels
+    '''
+    cellArea = plan.cellWidth * plan.cellHeight
+    labelPath = createIntermediatePath(plan, 'depressionLabels')
+    labelDS = createWindowRaster(labelPath,
+                                 plan,
+                                 gdal.GDT_UInt32,
+                                 0,
+                                 ['COMPRESS=DEFLATE',
+                                  'TILED=YES',
+                                  'BIGTIFF=IF_SAFER'])
+    labelBand = labelDS.GetRasterBand(1)
+
+    try:
+        statistics = {}
+        parents = {}
+        nextLabel = 1
+        previousRow = None
+        for tile, elevations, valid, filled, _ in floodWindow(demSource, plan, None, feedback):
+            if feedback is not None and feedback.isCanceled():
+                break
+            depths = filled - elevations
+            flooded = valid & (depths > 0)
+            labels, nextLabel = labelTileDepressions(flooded, nextLabel)
+            accumulateDepressions(labels, depths, filled, step, statistics)
+            if previousRow is not None:
+                joinTileDepressions(parents, previousRow, labels[0])
+            previousRow = labels[-1]
+            labelBand.WriteArray(labels.astype(uint32), 0, tile[1] - plan.window[1])
+
+        if feedback is not None and feedback.isCanceled():
+            labelBand = None
+            labelDS = None
+            removeDepressionLabels(labelPath)
+            return None
+
+        merged = mergeDepressionStatistics(statistics, parents)
+        depressions = []
+        lookup = zeros(nextLabel, dtype=uint32)
+        for root, (spillElevation, maxDepth, counts, depthSums) in sorted(merged.items()):
+            if maxDepth < minDepth:
+                continue
+            curve = calculateDepressionCurve(spillElevation, counts, depthSums, step, cellArea)
+            depressions.append(Depression(len(depressions) + 1,
+                                          spillElevation,
+                                          maxDepth,
+                                          float(curve[-1, 0]),
+                                          float(curve[-1, 2]),
+                                          curve))
+            lookup[root] = len(depressions)
+        for label in range(1, nextLabel):
+            lookup[label] = lookup[findRoot(parents, label)]
+
+        for column, row, width, height in calculateTiles(plan.window, plan.tileRows):
+            labels = labelBand.ReadAsArray(0, row - plan.window[1], width, height)
+            labelBand.WriteArray(lookup[labels], 0, row - plan.window[1])
+    except BaseException:
+        labelBand = None
+        labelDS = None
+        removeDepressionLabels(labelPath)
+        raise
+    labelBand = None
+    labelDS = None
+
+    if feedback is not None:
+        feedback.pushInfo('{0} depressions found, {1} at least {2} m deep'.format(len(merged),
+                                                                                    len(depressions),
+                                                                                    minDepth))
+
+    return depressions, labelPath
+def vectorizeDepressions (labelPath, plan):
+    '''
+    vectorizes the raster of the depression ids in a temporary layer (in
+    the GDAL memory file system when the plan fits in memory or in the
+    temporary folder), yielding the id and the multipolygon of each
+    depression as WKB in the order of the ids, one depression at a time
+    '''
+    fileName = 'depressionPolygons_' + uuid.uuid4().hex + '.gpkg'
+    polygonPath = ('/vsimem/' + fileName if plan.inMemory
+                   else os.path.join(tempfile.gettempdir(), fileName))
+    polygonDS = ogr.GetDriverByName('GPKG').CreateDataSource(polygonPath)
+    try:
+        polygonLayer = polygonDS.CreateLayer('depressions', None, ogr.wkbPolygon)
+        polygonLayer.CreateField(ogr.FieldDefn('DN', ogr.OFTInteger))
+        labelDS = gdal.Open(labelPath)
+        labelBand = labelDS.GetRasterBand(1)
+        polygonDS.StartTransaction()
+        gdal.Polygonize(labelBand, labelBand.GetMaskBand(), polygonLayer, 0, ['8CONNECTED=8'])
+        polygonDS.CommitTransaction()
+        labelBand = None
+        labelDS = None
+        polygonLayer = None
+
+        polygonDS.ExecuteSQL('CREATE INDEX depressions_dn ON depressions (DN)')
+        polygons = polygonDS.ExecuteSQL('SELECT * FROM depressions ORDER BY DN')
+        try:
+            depressionId, geometry = None, None
+            for feature in polygons:
+                if feature.GetField('DN') != depressionId:
+                    if geometry is not None:
+                        yield depressionId, geometry.ExportToWkb()
+                    depressionId, geometry = feature.GetField('DN'), ogr.Geometry(ogr.wkbMultiPolygon)
+                geometry.AddGeometry(feature.GetGeometryRef())
+            if geometry is not None:
+                yield depressionId, geometry.ExportToWkb()
+        finally:
+            polygonDS.ReleaseResultSet(polygons)
+    finally:
+        polygonDS = None
+        gdal.Unlink(polygonPath)
+def removeDepressionLabels (labelPath):
+    '''
+    removes the raster of the depression ids
+    '''
+    if gdal.VSIStatL(labelPath) is not None:
+        gdal.Unlink(labelPath)
+def saveDepressionCurves (path, depressions):
+    '''
+    saves the elevation-area-volume curves of the depressions
+    in a CSV file, with the id of the depression of each row
+    '''
+    rows = [column_stack((full(len(depression.curve), depression.depressionId), depression.curve))
+            for depression in depressions]
+
+    savetxt(
+            path,
+            vstack(rows) if rows else zeros((0, 4)),
+            delimiter=',',
+            header='Depression,Area (m²),Elevation (m),Volume (m³)',
+            comments='',
+            fmt=['%d', '%s', '%s', '%s']
+            )
@@ -0,0 +1,151 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+from numpy import (arange, bincount, column_stack, cumsum, floating, floor,
+                   int64, isnan, issubdtype, zeros)
+from .curve import calculateAreaHeightVolume
+from .demWindow import (calculateTiles,
+                        calculateWindowGeoTransform,
+                        openDEM,
+                        readAreaMask)
+from .plan import MAX_WORKERS
+from .storageChange import addTileCounts, alignSecondDEM
+from .zone import calculateZoneOffset
+
+def createEpochSources (demSource, plan, epochPaths=None, bands=None):
+    '''
+    returns the DEM sources of the epochs, the bands of the DEM or the
+    DEM followed by the other DEMs on its grid (resampled on the fly
+    only if their grids differ)
+    '''
+    if bands is not None:
+        return [demSource._replace(band=band) for band in bands]
+
+    return [demSource] + [alignSecondDEM(demSource, plan, epochPath)
+                          for epochPath in epochPaths or []]
+def countEpochElevations (epochData, inside, step):
+    '''
+    counts the cells of the area of each epoch, other than its NODATA
+    cells, in the elevation bins of the step (anchored at 0, so the bins
+    of every tile and epoch are common), returning the first bin and the
+    counts with a row for each epoch
+    '''
+    binIndexes = []
+    for data, noData in epochData:
+        valid = inside.copy()
+        if noData is not None:
+            valid &= data != noData
+        if issubdtype(data.dtype, floating):
+            valid &= ~isnan(data)
+        binIndexes.append(floor(data[valid] / step).astype(int64))
+
+    nonEmpty = [indexes for indexes in binIndexes if len(indexes)]
+    if not nonEmpty:
+        return 0, zeros((len(epochData), 0), dtype=int64)
+    firstBin = int(min(indexes.min() for indexes in nonEmpty))
+    numberOfBins = int(max(indexes.max() for indexes in nonEmpty)) - firstBin + 1
+
+    counts = zeros((len(epochData), numberOfBins), dtype=int64)
+    for row, indexes in enumerate(binIndexes):
+        counts[row] = bincount(indexes - firstBin, minlength=numberOfBins)
+
+    return firstBin, counts
+def computeEpochCurves (demSource, plan, epochSources, step, feedback=None):
+    '''
+    calculates the elevation-area-volume data of each epoch on common
+    bins, reading the mask of the area once for each tile of the DEM
+    window (sliced from the mask of the window, burned once however many
+    tiles there are) and the tile of the epochs by parallel workers; the
+    tiles of the plan are divided among the epochs, so all of them read
+    at once fit the memory of a single tile; returns None when the user
+    cancels
+    '''
+    rasterDS = openDEM(demSource.rasterPath)
+    offsets = [calculateZoneOffset(rasterDS, openDEM(epochSource.rasterPath))
+               for epochSource in epochSources]
+    workerData = local()
+
+    def readEpochTile (epochIndex, tile):
+        epochSource = epochSources[epochIndex]
+        if not hasattr(workerData, 'datasets'):
+            workerData.datasets = {}
+        if epochSource.rasterPath not in workerData.datasets:
+            workerData.datasets[epochSource.rasterPath] = openDEM(epochSource.rasterPath)
+        band = workerData.datasets[epochSource.rasterPath].GetRasterBand(epochSource.band)
+        columnOffset, rowOffset = offsets[epochIndex]
+        data = band.ReadAsArray(tile[0] - columnOffset, tile[1] - rowOffset, tile[2], tile[3])
+
+        return data, band.GetNoDataValue()
+
+    workers = int(max(1, min(os.cpu_count() or 1, MAX_WORKERS, len(epochSources))))
+    tileRows = max(1, plan.tileRows // len(epochSources))
+    tiles = calculateTiles(plan.window, tileRows)
+    firstBin, counts = 0, zeros((len(epochSources), 0), dtype=int64)
+    with ThreadPoolExecutor(workers) as executor:
+        for index, tile in enumerate(tiles):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    break
+                feedback.setProgress(int(100 * index / len(tiles)))
+            inside = readAreaMask(rasterDS,
+                                  demSource,
+                                  tile,
+                                  calculateWindowGeoTransform(rasterDS.GetGeoTransform(), tile),
+                                  feedback if index == 0 else None)
+            epochData = list(executor.map(lambda epochIndex: readEpochTile(epochIndex, tile),
+                                          range(len(epochSources))))
+            firstBin, counts = addTileCounts(firstBin, counts, *countEpochElevations(epochData,
+                                                                                     inside,
+                                                                                     step))
+
+    if feedback is not None and feedback.isCanceled():
+        return None
+
+    areas = cumsum(counts, axis=1) * plan.cellWidth * plan.cellHeight
+    elevations = step * (firstBin + arange(1, counts.shape[1] + 1))
+
+    return [calculateAreaHeightVolume(column_stack((epochAreas, elevations)))
+            for epochAreas in areas]
+def saveEpochCurves (path, epochNames, epochCurves):
+    '''
+    saves the elevation-area-volume data of the epochs in a CSV file
+    in the long format, with the epoch of each row
+    '''
+    with open(path, 'w', newline='', encoding='utf-8') as epochFile:
+        writer = csv.writer(epochFile)
+        writer.writerow(['Epoch', 'Area (m²)', 'Elevation (m)', 'Volume (m³)'])
+        for epochName, epochCurve in zip(epochNames, epochCurves):
+            for area, elevation, volume in epochCurve.tolist():
+                writer.writerow([epochName, area, elevation, volume])
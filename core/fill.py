@@ -0,0 +1,660 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from numpy import (append, arange, concatenate, cumsum, empty, full, int32, int64, lexsort,
+                   ma, maximum, minimum, nextafter, ones, pad, unique, where, zeros)
+from osgeo import gdal
+from .demWindow import (DEMSource,
+                        calculateDEMWindowKey,
+                        calculateTiles,
+                        openDEM,
+                        readDEMWindow)
+from .inundation import createIntermediatePath, createWindowRaster
+from .plan import planExecution
+
+OCEAN_LABEL = 1
+MAX_FILLED_WINDOWS = 4
+FLOOD_BYTES_PER_CELL = 336
+FLOOD_GRAPH_BYTES_PER_COLUMN = 1280
+NEIGHBOUR_COLUMNS = arange(3)
+EULER_RULER_SPACING = 16
+NEIGHBOUR_PAIRS = (((slice(None), slice(0, -1)), (slice(None), slice(1, None))),
+                   ((slice(0, -1), slice(None)), (slice(1, None), slice(None))),
+                   ((slice(0, -1), slice(0, -1)), (slice(1, None), slice(1, None))),
+                   ((slice(0, -1), slice(1, None)), (slice(1, None), slice(0, -1))))
+
+_filledWindows = OrderedDict()
+_filledWindowsLock = Lock()
+
+def clearFilledWindows ():
+    '''
+    removes the filled DEM windows and reach elevations from the GDAL
+    memory file system or from the temporary folder
+    '''
+    with _filledWindowsLock:
+        while _filledWindows:
+            _, entry = _filledWindows.popitem(last=False)
+            gdal.Unlink(entry[0])
+def calculateOutlets (valid, haloTop, haloBottom):
+    '''
+    returns the valid cells where the water leaves the area, the cells on
+    the edges of the DEM window or next to an invalid cell (outside the
+    area or NODATA); the halo rows are the rows of the neighbour tiles
+    '''
+    padded = pad(valid, 1, constant_values=False)
+    if haloTop:
+        padded[0, :] = True
+    if haloBottom:
+        padded[-1, :] = True
+    padded[:, 0] = False
+    padded[:, -1] = False
+
+    interior = ones(valid.shape, dtype=bool)
+    height, width = valid.shape
+    for rowShift in (0, 1, 2):
+        for columnShift in (0, 1, 2):
+            interior &= padded[rowShift:rowShift + height, columnShift:columnShift + width]
+
+    return valid & ~interior
+def lowerRow (elevations, filled, labels, row, previous):
+    '''
+    lowers the filled elevation of the cells of the row to the level at
+    which the water reaches them from their neighbours in the previous row
+    (the highest of their elevation and the filled elevation of the
+    neighbour), with the label of that neighbour; returns whether a cell
+    was lowered
+    '''
+    previousFilled = filled[previous]
+    level = minimum(previousFilled[:-2], previousFilled[2:])
+    minimum(level, previousFilled[1:-1], out=level)
+    maximum(level, elevations[row, 1:-1], out=level)
+
+    rowFilled = filled[row, 1:-1]
+    columns = (level < rowFilled).nonzero()[0]
+    if not len(columns):
+        return False
+    neighbours = columns[:, None] + NEIGHBOUR_COLUMNS
+    sources = neighbours[arange(len(columns)), previousFilled[neighbours].argmin(axis=1)]
+    rowFilled[columns] = level[columns]
+    labels[row, columns + 1] = labels[previous, sources]
+
+    return True
+def sweepRows (elevations, filled, labels):
+    '''
+    sweeps the rows of the padded arrays downwards and upwards, lowering
+    each row from the row before it; returns whether a cell was lowered
+    '''
+    height = filled.shape[0]
+    lowered = False
+    for row in range(2, height - 1):
+        lowered = lowerRow(elevations, filled, labels, row, row - 1) or lowered
+    for row in range(height - 3, 0, -1):
+        lowered = lowerRow(elevations, filled, labels, row, row + 1) or lowered
+
+    return lowered
+def calculateIndexType (count):
+    '''
+    returns the integer type of the indexes of count items, int32 when
+    they fit it, which halves the memory of the arrays of the graphs
+    '''
+    return int32 if count < 2 ** 31 else int64
+def buildSpanningForest (nodeCount, firstNodes, secondNodes):
+    '''
+    builds the minimum spanning forest of the graph of the edges given in
+    the order of their weights, merging each tree with its lightest edge
+    to another tree in rounds (Boruvka) that at least halve the trees,
+    each tree being contracted to a node for the next round, so in
+    O(n log n); returns the edges of the forest and the tree of each node
+    '''
+    componentCount = nodeCount
+    firstComponents, secondComponents = firstNodes, secondNodes
+    edges = arange(len(firstNodes), dtype=calculateIndexType(len(firstNodes)))
+    treeEdges, contractions = [], []
+    while True:
+        apart = firstComponents != secondComponents
+        edges, firstComponents, secondComponents = (edges[apart],
+                                                    firstComponents[apart],
+                                                    secondComponents[apart])
+        if not len(edges):
+            break
+        positions = arange(len(edges), dtype=edges.dtype)
+        lightest = full(componentCount, len(edges), dtype=edges.dtype)
+        minimum.at(lightest, firstComponents, positions)
+        minimum.at(lightest, secondComponents, positions)
+
+        merged = (lightest < len(edges)).nonzero()[0]
+        chosen = lightest[merged]
+        targets = where(firstComponents[chosen] == merged,
+                        secondComponents[chosen],
+                        firstComponents[chosen])
+        parents = arange(componentCount, dtype=firstNodes.dtype)
+        parents[merged] = targets
+        mutual = (parents[targets] == merged) & (merged < targets)
+        parents[merged[mutual]] = merged[mutual]
+        treeEdges.append(edges[chosen[~mutual]])
+
+        grandParents = parents[parents]
+        while (grandParents != parents).any():
+            parents, grandParents = grandParents, grandParents[grandParents]
+        trees = parents == arange(componentCount)
+        contraction = (cumsum(trees, dtype=firstNodes.dtype) - 1)[parents]
+        contractions.append(contraction)
+        componentCount = int(trees.sum())
+        firstComponents, secondComponents = contraction[firstComponents], contraction[secondComponents]
+
+    components = arange(componentCount, dtype=firstNodes.dtype)
+    for contraction in reversed(contractions):
+        components = components[contraction]
+
+    return concatenate(treeEdges) if treeEdges else edges, components
+def rankEulerTour (firstNodes, secondNodes):
+    '''
+    returns the position of each arc (the edges of the tree from the
+    first to the second nodes, then back) in the Euler tour of the tree
+    from the root node 0, in O(n): the tour leaves each node by the arc
+    after the one it arrived by, every EULER_RULER_SPACING-th arc walks
+    the tour up to the next of these rulers, and the rulers are ranked
+    by pointer jumping
+    '''
+    treeCount = len(firstNodes)
+    arcCount = 2 * treeCount
+    arcStarts = concatenate((firstNodes, secondNodes))
+    indexType = calculateIndexType(arcCount)
+    arcOrder = arcStarts.argsort().astype(indexType)
+    sortedStarts = arcStarts[arcOrder]
+    arcs = arange(arcCount, dtype=indexType)
+    firstArcs = ones(arcCount, dtype=bool)
+    firstArcs[1:] = sortedStarts[1:] != sortedStarts[:-1]
+    lastArcs = append(firstArcs[1:], True)
+    blockStarts = maximum.accumulate(where(firstArcs, arcs, 0))
+    nextArcs = empty(arcCount, dtype=indexType)
+    nextArcs[arcOrder] = arcOrder[where(lastArcs, blockStarts, arcs + 1)]
+    successors = nextArcs[(arcs + treeCount) % arcCount]
+    successors[successors == arcOrder[0]] = -1
+
+    rulers = arcs[::EULER_RULER_SPACING].copy()
+    rulers[0] = arcOrder[0]
+    rulers = unique(rulers)
+    rulerIndexes = full(arcCount, -1, dtype=indexType)
+    rulerIndexes[rulers] = arange(len(rulers))
+    owners = rulerIndexes.copy()
+    offsets = zeros(arcCount, dtype=indexType)
+    nextRulers = full(len(rulers), -1, dtype=indexType)
+    lengths = zeros(len(rulers), dtype=indexType)
+
+    walkers, current, step = arange(len(rulers), dtype=indexType), rulers, 0
+    while len(walkers):
+        step += 1
+        current = successors[current]
+        ended = current < 0
+        stopped = ended.copy()
+        stopped[~ended] = rulerIndexes[current[~ended]] >= 0
+        nextRulers[walkers[stopped]] = where(ended[stopped], -1, rulerIndexes[current[stopped]])
+        lengths[walkers[stopped]] = step
+        walkers, current = walkers[~stopped], current[~stopped]
+        owners[current] = walkers
+        offsets[current] = step
+
+    distances = lengths.copy()
+    distances[nextRulers < 0] = 0
+    jumped = where(nextRulers < 0, -1, nextRulers)
+    while (jumped >= 0).any():
+        following = jumped >= 0
+        distances[following] += distances[jumped[following]]
+        jumped[following] = jumped[jumped[following]]
+    rulerPositions = distances[rulerIndexes[arcOrder[0]]] - distances
+
+    return rulerPositions[owners] + offsets
+def calculateGraphLevels (nodeCount, firstNodes, secondNodes, weights):
+    '''
+    calculates the level of each node of the graph, the lowest elevation
+    at which the water flows from it to the root node 0 (the highest
+    weight of the edges of its path to the root), and the node of this
+    path next to the root, as a priority-flood from the root with array
+    operations in O(n log n): the levels are the highest weights up the
+    paths to the root in the minimum spanning tree, rooted by its Euler
+    tour, taken by pointer jumping; the nodes not connected to the root
+    have an infinite level and no node next to the root (-1)
+    '''
+    order = weights.argsort()
+    firstNodes, secondNodes, weights = firstNodes[order], secondNodes[order], weights[order]
+    treeEdges, components = buildSpanningForest(nodeCount, firstNodes, secondNodes)
+
+    levels = full(nodeCount, float('inf'))
+    levels[0] = float('-inf')
+    sources = full(nodeCount, -1, dtype=firstNodes.dtype)
+    treeEdges = treeEdges[components[firstNodes[treeEdges]] == components[0]]
+    if not len(treeEdges):
+        return levels, sources
+
+    firstNodes, secondNodes, weights = firstNodes[treeEdges], secondNodes[treeEdges], weights[treeEdges]
+    positions = rankEulerTour(firstNodes, secondNodes)
+    downwards = positions[:len(treeEdges)] < positions[len(treeEdges):]
+    children = where(downwards, secondNodes, firstNodes)
+    parents = arange(nodeCount, dtype=firstNodes.dtype)
+    parents[children] = where(downwards, firstNodes, secondNodes)
+    pathLevels = full(nodeCount, float('-inf'))
+    pathLevels[children] = weights
+
+    topNodes = children[parents[children] == 0]
+    rootLevels = full(nodeCount, float('-inf'))
+    rootLevels[topNodes] = pathLevels[topNodes]
+    pathLevels[topNodes] = float('-inf')
+    parents[topNodes] = topNodes
+
+    climbing = (parents[parents] != parents).nonzero()[0]
+    while len(climbing):
+        climbingParents = parents[climbing]
+        pathLevels[climbing] = maximum(pathLevels[climbing], pathLevels[climbingParents])
+        parents[climbing] = parents[climbingParents]
+        climbing = climbing[parents[parents[climbing]] != parents[climbing]]
+
+    reached = components == components[0]
+    reached[0] = False
+    levels[reached] = maximum(pathLevels[reached], rootLevels[parents[reached]])
+    sources[reached] = parents[reached]
+
+    return levels, sources
+def reduceSpills (firstLabels, secondLabels, spills):
+    '''
+    returns the pairs of different labels (the lower label first) with
+    the lowest spill elevation between them
+    '''
+    lowLabels, highLabels = minimum(firstLabels, secondLabels), maximum(firstLabels, secondLabels)
+    apart = lowLabels != highLabels
+    lowLabels, highLabels, spills = lowLabels[apart], highLabels[apart], spills[apart]
+
+    order = lexsort((spills, highLabels, lowLabels))
+    lowLabels, highLabels, spills = lowLabels[order], highLabels[order], spills[order]
+    lowest = ones(len(spills), dtype=bool)
+    lowest[1:] = (lowLabels[1:] != lowLabels[:-1]) | (highLabels[1:] != highLabels[:-1])
+
+    return lowLabels[lowest], highLabels[lowest], spills[lowest]
+def calculateLabelSpills (filled, labels):
+    '''
+    returns the lowest spill elevation between each pair of adjacent
+    labels, the highest filled elevation of two adjacent cells of
+    different labels, as arrays of the lower labels, the higher labels
+    and the spill elevations
+    '''
+    firstLabels, secondLabels, spills = [], [], []
+    for first, second in NEIGHBOUR_PAIRS:
+        adjacent = (labels[first] != labels[second]) & (labels[first] > 0) & (labels[second] > 0)
+        firstLabels.append(labels[first][adjacent])
+        secondLabels.append(labels[second][adjacent])
+        spills.append(maximum(filled[first][adjacent], filled[second][adjacent]))
+
+    return reduceSpills(concatenate(firstLabels), concatenate(secondLabels), concatenate(spills))
+def floodPendingCells (elevations, filled, labels, settled, pending):
+    '''
+    floods the pending cells of the tile, the valid cells not settled by
+    the sweeps, on the graph of the pending cells joined to their
+    neighbours by edges weighing the highest of their elevations, and of
+    the settled cells next to them joined to the root by edges weighing
+    just below their elevation (so that each is flooded from itself and
+    passes on its label); sets the filled elevations and the labels of
+    the pending cells, the cells never reached without label
+    '''
+    frontier = zeros(pending.shape, dtype=bool)
+    for first, second in NEIGHBOUR_PAIRS:
+        frontier[first] |= settled[first] & pending[second]
+        frontier[second] |= settled[second] & pending[first]
+    graphCells = pending | frontier
+    cellCount = int(graphCells.sum())
+    cells = zeros(pending.shape, dtype=calculateIndexType(cellCount + 1))
+    cells[graphCells] = arange(1, cellCount + 1)
+
+    firstNodes = [zeros(int(frontier.sum()), dtype=cells.dtype)]
+    secondNodes = [cells[frontier]]
+    weights = [nextafter(elevations[frontier], float('-inf'))]
+    for first, second in NEIGHBOUR_PAIRS:
+        joined = (pending[first] & graphCells[second]) | (graphCells[first] & pending[second])
+        firstNodes.append(cells[first][joined])
+        secondNodes.append(cells[second][joined])
+        weights.append(maximum(elevations[first][joined], elevations[second][joined]))
+    levels, sources = calculateGraphLevels(cellCount + 1,
+                                           concatenate(firstNodes),
+                                           concatenate(secondNodes),
+                                           concatenate(weights))
+
+    sourceLabels = zeros(cellCount + 1, dtype=int32)
+    sourceLabels[cells[frontier]] = labels[frontier]
+    pendingSources = sources[cells[pending]]
+    filled[pending] = levels[cells[pending]]
+    labels[pending] = where(pendingSources > 0, sourceLabels[pendingSources], 0)
+def floodTile (elevations, valid, outlets, edgeRows):
+    '''
+    fills the sinks of the tile with a priority-flood from its outlets
+    (with the ocean label) and from the other cells of the edge rows
+    shared with neighbour tiles (each with its own label), in O(n log n):
+    a sweep of the rows and the columns of the tile in both directions
+    (Planchon and Darboux) settles the cells the water leaves at their
+    own elevation, and the cells left are flooded on the graph of their
+    neighbours; returns the filled elevations (the elevations of the cells
+    never reached), the labels of the cells (the label of the outlet or
+    edge cell they are flooded from) and the lowest spill elevation
+    between each pair of adjacent labels
+    '''
+    height, width = elevations.shape
+    paddedElevations = full((height + 2, width + 2), float('inf'))
+    paddedElevations[1:-1, 1:-1][valid] = elevations[valid]
+    filled = full((height + 2, width + 2), float('inf'))
+    labels = zeros((height + 2, width + 2), dtype=int32)
+
+    tileElevations, tileFilled, tileLabels = (paddedElevations[1:-1, 1:-1],
+                                              filled[1:-1, 1:-1],
+                                              labels[1:-1, 1:-1])
+    tileFilled[outlets] = tileElevations[outlets]
+    tileLabels[outlets] = OCEAN_LABEL
+    nextLabel = OCEAN_LABEL + 1
+    for row in edgeRows:
+        edgeCells = valid[row] & (tileLabels[row] == 0)
+        edgeCount = int(edgeCells.sum())
+        tileFilled[row, edgeCells] = tileElevations[row, edgeCells]
+        tileLabels[row, edgeCells] = arange(nextLabel, nextLabel + edgeCount)
+        nextLabel += edgeCount
+
+    sweepRows(paddedElevations, filled, labels)
+    sweepRows(paddedElevations.T, filled.T, labels.T)
+    settled = (tileLabels > 0) & (tileFilled == tileElevations)
+    pending = valid & ~settled
+    if pending.any():
+        floodPendingCells(tileElevations, tileFilled, tileLabels, settled, pending)
+
+    spills = calculateLabelSpills(tileFilled, tileLabels)
+
+    return where(tileLabels > 0, tileFilled, elevations), tileLabels, spills
+def readHaloTile (rasterDS, demSource, plan, tile):
+    '''
+    reads the tile with the rows above and below it that are inside
+    the DEM window, returning the tile, the number of halo rows above
+    it and if there is a halo row below it
+    '''
+    column, row, width, height = tile
+    windowEnd = plan.window[1] + plan.window[3]
+    haloTop = 1 if row > plan.window[1] else 0
+    haloBottom = 1 if row + height < windowEnd else 0
+
+    demWindow = readDEMWindow(rasterDS,
+                              demSource,
+                              (column, row - haloTop, width, height + haloTop + haloBottom))
+
+    return demWindow, haloTop, haloBottom
+def calculateSeedOutlets (valid, tileRow, seedCell):
+    '''
+    returns the seed cell as the only outlet of the tile,
+    if it is in the tile
+    '''
+    outlets = zeros(valid.shape, dtype=bool)
+    column, row = seedCell
+    if 0 <= row - tileRow < valid.shape[0] and 0 <= column < valid.shape[1]:
+        outlets[row - tileRow, column] = valid[row - tileRow, column]
+
+    return outlets
+def floodHaloTile (rasterDS, demSource, plan, tile, seedCell=None):
+    '''
+    reads the tile and floods it from its outlets, the cells where the
+    water leaves the area or the seed cell (column and row in the DEM
+    window) when given, with the edges shared with the neighbour tiles
+    as outlets of their own labels
+    '''
+    demWindow, haloTop, haloBottom = readHaloTile(rasterDS, demSource, plan, tile)
+    valid = ~demWindow.data.mask
+    elevations = demWindow.data.data[haloTop:demWindow.data.shape[0] - haloBottom]
+    if seedCell is None:
+        outlets = calculateOutlets(valid, haloTop, haloBottom)[haloTop:valid.shape[0] - haloBottom]
+        valid = valid[haloTop:valid.shape[0] - haloBottom]
+    else:
+        valid = valid[haloTop:valid.shape[0] - haloBottom]
+        outlets = calculateSeedOutlets(valid, tile[1] - plan.window[1], seedCell)
+
+    edgeRows = []
+    if haloTop:
+        edgeRows.append(0)
+    if haloBottom:
+        edgeRows.append(valid.shape[0] - 1)
+
+    filled, labels, spills = floodTile(elevations, valid, outlets, edgeRows)
+
+    return elevations, valid, filled, labels, spills
+def calculateLabelNodes (labels, offset):
+    '''
+    returns the nodes of the labels of a tile in the graph of the DEM
+    window: the root for the ocean label, the other labels counted from
+    the offset of the tile, and -1 for the cells not reached
+    '''
+    labels = labels.astype(int64)
+
+    return where(labels > OCEAN_LABEL,
+                 offset + labels - (OCEAN_LABEL + 1),
+                 where(labels == OCEAN_LABEL, 0, -1))
+def calculateEdgeSpills (upperFilled, upperNodes, lowerFilled, lowerNodes):
+    '''
+    returns the lowest spill elevation between the nodes of the last row
+    of a tile and the nodes of their neighbours in the first row of the
+    next tile
+    '''
+    width = len(upperNodes)
+    firstNodes, secondNodes, spills = [], [], []
+    for columnShift in (-1, 0, 1):
+        upper = slice(max(columnShift, 0), width + min(columnShift, 0))
+        lower = slice(max(-columnShift, 0), width + min(-columnShift, 0))
+        joined = (upperNodes[upper] >= 0) & (lowerNodes[lower] >= 0)
+        firstNodes.append(upperNodes[upper][joined])
+        secondNodes.append(lowerNodes[lower][joined])
+        spills.append(maximum(upperFilled[upper][joined], lowerFilled[lower][joined]))
+
+    return reduceSpills(concatenate(firstNodes), concatenate(secondNodes), concatenate(spills))
+def calculateSpillLevels (nodeCount, graphEdges):
+    '''
+    calculates the level of each node of the graph of the labels of the
+    tiles, the lowest elevation at which the water flows from it to an
+    outlet of the DEM window, from the spill elevations inside each tile
+    and across the rows shared by adjacent tiles
+    '''
+    firstNodes, secondNodes, spills = (concatenate(values) for values in zip(*graphEdges))
+    levels, _ = calculateGraphLevels(nodeCount, firstNodes, secondNodes, spills)
+
+    return levels
+def applySpillLevels (filled, nodes, levels):
+    '''
+    raises the flooded cells of the tile to the level of their nodes,
+    returning them and the cells reached from the outlets of the window
+    '''
+    nodeLevels = where(nodes >= 0, levels[nodes], float('inf'))
+    reached = nodeLevels < float('inf')
+
+    return where(reached, maximum(filled, nodeLevels), filled), reached
+def floodWindow (demSource, plan, seedCell=None, feedback=None):
+    '''
+    floods the DEM window from its outlets (the cells
+    where the water leaves the area, or the seed cell when given), tile by
+    tile when the flood does not fit it in the memory budget (its working
+    arrays take up to FLOOD_BYTES_PER_CELL bytes per cell: the padded and
+    filled elevations, the labels, the masks and the graph of the cells
+    left by the sweeps; the edges between the labels of the tiles and
+    their solution take FLOOD_GRAPH_BYTES_PER_COLUMN bytes per column of
+    each tile): the tiles are flooded once with their shared edges as
+    outlets and kept in temporary rasters, the levels of these outlets
+    are solved on the graph of the spill elevations between them and the
+    tiles are raised to them; yields each tile with its elevations, valid
+    cells, flooded elevations and cells reached from the outlets
+    '''
+    floodPlan = planExecution(demSource,
+                              plan.maxMemoryMB,
+                              None,
+                              FLOOD_BYTES_PER_CELL,
+                              FLOOD_GRAPH_BYTES_PER_COLUMN)
+    rasterDS = openDEM(demSource.rasterPath)
+    tiles = calculateTiles(floodPlan.window, floodPlan.tileRows)
+
+    if len(tiles) == 1:
+        elevations, valid, filled, labels, _ = floodHaloTile(rasterDS, demSource, floodPlan, tiles[0], seedCell)
+        filled, reached = applySpillLevels(filled,
+                                           calculateLabelNodes(labels, 1),
+                                           full(1, float('-inf')))
+        yield tiles[0], elevations, valid, filled, reached
+        return
+
+    filledPath = createIntermediatePath(floodPlan, 'floodedTiles')
+    labelPath = createIntermediatePath(floodPlan, 'floodLabels')
+    filledDS = labelDS = None
+    try:
+        filledDS = createWindowRaster(filledPath,
+                                      floodPlan,
+                                      gdal.GDT_Float64,
+                                      None,
+                                      ['COMPRESS=DEFLATE',
+                                       'TILED=YES',
+                                       'BIGTIFF=IF_SAFER'])
+        labelDS = createWindowRaster(labelPath,
+                                     floodPlan,
+                                     gdal.GDT_Int32,
+                                     None,
+                                     ['COMPRESS=DEFLATE',
+                                      'TILED=YES',
+                                      'BIGTIFF=IF_SAFER'])
+        filledBand, labelBand = filledDS.GetRasterBand(1), labelDS.GetRasterBand(1)
+
+        offsets, graphEdges = [], []
+        nodeCount = 1
+        previousRow = None
+        for tileIndex, tile in enumerate(tiles):
+            if feedback is not None:
+                feedback.setProgress(int(50 * tileIndex / len(tiles)))
+            _, _, filled, labels, spills = floodHaloTile(rasterDS, demSource, floodPlan, tile, seedCell)
+            offsets.append(nodeCount)
+            nodeCount += max(int(labels.max(initial=0)) - OCEAN_LABEL, 0)
+            spillLabels, spillNeighbours, spillElevations = spills
+            graphEdges.append((calculateLabelNodes(spillLabels, offsets[-1]),
+                               calculateLabelNodes(spillNeighbours, offsets[-1]),
+                               spillElevations))
+            if previousRow is not None:
+                graphEdges.append(calculateEdgeSpills(previousRow[0],
+                                                      previousRow[1],
+                                                      filled[0],
+                                                      calculateLabelNodes(labels[0], offsets[-1])))
+            previousRow = filled[-1].copy(), calculateLabelNodes(labels[-1], offsets[-1])
+            filledBand.WriteArray(filled, 0, tile[1] - floodPlan.window[1])
+            labelBand.WriteArray(labels, 0, tile[1] - floodPlan.window[1])
+        levels = calculateSpillLevels(nodeCount, graphEdges)
+
+        for tileIndex, tile in enumerate(tiles):
+            if feedback is not None:
+                feedback.setProgress(int(50 + 50 * tileIndex / len(tiles)))
+            demWindow = readDEMWindow(rasterDS, demSource, tile)
+            filled = filledBand.ReadAsArray(0, tile[1] - floodPlan.window[1], tile[2], tile[3])
+            labels = labelBand.ReadAsArray(0, tile[1] - floodPlan.window[1], tile[2], tile[3])
+            filled, reached = applySpillLevels(filled,
+                                               calculateLabelNodes(labels, offsets[tileIndex]),
+                                               levels)
+            yield tile, demWindow.data.data, ~ma.getmaskarray(demWindow.data), filled, reached
+    finally:
+        filledBand = labelBand = None
+        filledDS = labelDS = None
+        gdal.Unlink(filledPath)
+        gdal.Unlink(labelPath)
+def getFloodedWindow (name):
+    '''
+    returns the path and the value of a flooded window already
+    computed, or None
+    '''
+    with _filledWindowsLock:
+        entry = _filledWindows.get(name)
+        if entry is not None and gdal.VSIStatL(entry[0]) is not None:
+            _filledWindows.move_to_end(name)
+            return entry
+
+    return None
+def registerFloodedWindow (name, path, value):
+    '''
+    keeps the flooded window of the last computations,
+    removing the least recently used ones
+    '''
+    with _filledWindowsLock:
+        _filledWindows[name] = (path, value)
+        while len(_filledWindows) > MAX_FILLED_WINDOWS:
+            _, evicted = _filledWindows.popitem(last=False)
+            gdal.Unlink(evicted[0])
+def fillSinks (demSource, plan, feedback=None):
+    '''
+    fills the sinks of the DEM window with a flood from the cells
+    where the water leaves the area, writing the filled window in a raster
+    with the same grid and returning its DEM source and the filled volume
+    '''
+    key = calculateDEMWindowKey(demSource, plan)
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    entry = getFloodedWindow(name)
+    if entry is not None:
+        if feedback is not None:
+            feedback.pushInfo('Filled DEM window reused, filled volume of '
+                              '{0:.2f} m³'.format(entry[1]))
+        return _filledSource(demSource, entry[0]), entry[1]
+
+    band = openDEM(demSource.rasterPath).GetRasterBand(demSource.band)
+    path = createIntermediatePath(plan, 'filledDEM')
+    filledDS = createWindowRaster(path,
+                                  plan,
+                                  band.DataType,
+                                  band.GetNoDataValue(),
+                                  ['COMPRESS=DEFLATE',
+                                   'TILED=YES',
+                                   'BIGTIFF=IF_SAFER'])
+    filledBand = filledDS.GetRasterBand(1)
+
+    filledVolume = 0.0
+    for tile, elevations, valid, filled, _ in floodWindow(demSource, plan, None, feedback):
+        filledVolume += float((filled - elevations)[valid].sum())
+        filledBand.WriteArray(filled.astype(elevations.dtype), 0, tile[1] - plan.window[1])
+    filledBand = None
+    filledDS = None
+
+    filledVolume *= plan.cellWidth * plan.cellHeight
+    if feedback is not None:
+        feedback.pushInfo('Sinks filled, filled volume of '
+                          '{0:.2f} m³'.format(filledVolume))
+    registerFloodedWindow(name, path, filledVolume)
+
+    return _filledSource(demSource, path), filledVolume
+def _filledSource (demSource, path):
+    '''
+    returns the DEM source of the filled window, with the same area
+    '''
+    return DEMSource(path,
+                     1,
+                     demSource.geometryWkt,
+                     demSource.zonePath,
+                     demSource.zoneValue)
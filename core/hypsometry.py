@@ -0,0 +1,187 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from collections import OrderedDict, namedtuple
+from math import ceil
+from threading import Lock
+from numpy import arange, bincount, column_stack, cumsum, empty, floor, int64, minimum, zeros
+from .demWindow import calculateDEMWindowKey, mapDEMWindows
+
+BASE_SUBDIVISIONS = 10
+MAX_BASE_BINS = 1000000
+MAX_CACHED_WINDOWS = 64
+MAX_HISTOGRAMS_PER_WINDOW = 4
+
+BaseHistogram = namedtuple('BaseHistogram', ['minValue',
+                                             'maxValue',
+                                             'step',
+                                             'counts'])
+
+_baseHistograms = OrderedDict()
+_baseHistogramsLock = Lock()
+
+def clearBaseHistograms ():
+    '''
+    removes all the base histograms from the cache
+    '''
+    with _baseHistogramsLock:
+        _baseHistograms.clear()
+def calculateElevationRange (demWindow):
+    '''
+    returns the minimum and maximum elevations of the DEM window,
+    or None if all its cells are masked
+    '''
+    if demWindow.data.count() == 0:
+        return None
+
+    return float(demWindow.data.min()), float(demWindow.data.max())
+def countElevations (demWindow, minValue, step, numberOfBins):
+    '''
+    counts the cells of the DEM window in each elevation bin, the cells
+    at the top of the last bin (the maximum elevation) being counted in it
+    '''
+    elevations = demWindow.data.compressed()
+    binIndexes = floor((elevations - minValue) / step).astype(int64)
+
+    return bincount(minimum(binIndexes, numberOfBins - 1),
+                    minlength=numberOfBins)
+def calculateNumberOfBins (minValue, maxValue, step):
+    '''
+    returns the number of bins of the step from the minimum to the maximum
+    elevation, at least one when they are equal
+    '''
+    return max(int(ceil((maxValue - minValue) / step)), 1)
+def calculateBaseStep (minValue, maxValue, step):
+    '''
+    returns a fraction of the step for the base histogram, as fine as
+    possible up to BASE_SUBDIVISIONS without exceeding MAX_BASE_BINS bins
+    '''
+    elevationRange = maxValue - minValue
+    if elevationRange <= 0:
+        return step
+
+    subdivisions = int(min(BASE_SUBDIVISIONS, step * MAX_BASE_BINS // elevationRange))
+
+    return step / max(subdivisions, 1)
+def computeBaseHistogram (demSource, plan, step, feedback=None):
+    '''
+    reads the DEM window and counts its cells in bins finer than the step,
+    so that coarser aligned steps can be derived without reading it again
+    '''
+    ranges = [elevationRange for elevationRange in mapDEMWindows(calculateElevationRange,
+                                                                 demSource,
+                                                                 plan,
+                                                                 feedback)
+              if elevationRange is not None]
+    if not ranges:
+        return None
+
+    minValue = min(elevationRange[0] for elevationRange in ranges)
+    maxValue = max(elevationRange[1] for elevationRange in ranges)
+    baseStep = calculateBaseStep(minValue, maxValue, step)
+    numberOfBins = calculateNumberOfBins(minValue, maxValue, baseStep)
+
+    counts = sum(mapDEMWindows(lambda demWindow: countElevations(demWindow,
+                                                                 minValue,
+                                                                 baseStep,
+                                                                 numberOfBins),
+                               demSource,
+                               plan))
+
+    return BaseHistogram(minValue, maxValue, baseStep, counts)
+def calculateSubdivisions (baseHistogram, step):
+    '''
+    returns how many bins of the base histogram form a bin of the step,
+    or None if the step is finer than or not aligned with the base step
+    '''
+    ratio = step / baseHistogram.step
+    subdivisions = int(round(ratio))
+    if subdivisions < 1 or abs(ratio - subdivisions) > 1e-6 * subdivisions:
+        return None
+
+    return subdivisions
+def rebinHistogram (baseHistogram, step, subdivisions):
+    '''
+    sums the bins of the base histogram into the bins of the step
+    '''
+    numberOfBins = calculateNumberOfBins(baseHistogram.minValue, baseHistogram.maxValue, step)
+    counts = zeros(numberOfBins * subdivisions, dtype=int64)
+    numberOfBaseBins = min(len(baseHistogram.counts), len(counts))
+    counts[:numberOfBaseBins] = baseHistogram.counts[:numberOfBaseBins]
+
+    return counts.reshape(numberOfBins, subdivisions).sum(axis=1)
+def getBaseHistogram (demSource, plan, step, feedback=None):
+    '''
+    returns a cached base histogram of the DEM window aligned with the step,
+    reading the DEM only when there is none (e.g. when a finer step is
+    requested), and how many of its bins form a bin of the step
+    '''
+    key = calculateDEMWindowKey(demSource, plan)
+
+    with _baseHistogramsLock:
+        for baseHistogram in _baseHistograms.get(key, []):
+            subdivisions = calculateSubdivisions(baseHistogram, step)
+            if subdivisions is not None:
+                _baseHistograms.move_to_end(key)
+                if feedback is not None:
+                    feedback.pushInfo('Hypsometric curve derived from the cached '
+                                      'histogram of step ' + str(baseHistogram.step))
+                return baseHistogram, subdivisions
+
+    baseHistogram = computeBaseHistogram(demSource, plan, step, feedback)
+    if baseHistogram is None:
+        return None, None
+
+    with _baseHistogramsLock:
+        histograms = [histogram for histogram in _baseHistograms.pop(key, [])
+                      if histogram.step != baseHistogram.step]
+        histograms.insert(0, baseHistogram)
+        _baseHistograms[key] = histograms[:MAX_HISTOGRAMS_PER_WINDOW]
+        while len(_baseHistograms) > MAX_CACHED_WINDOWS:
+            _baseHistograms.popitem(last=False)
+
+    return baseHistogram, calculateSubdivisions(baseHistogram, step)
+def computeHypsometricCurve (demSource, plan, step, feedback=None):
+    '''
+    calculates the area below each elevation of the DEM window,
+    with the same columns (area, elevation) of the qgis:hypsometriccurves
+    output
+    '''
+    baseHistogram, subdivisions = getBaseHistogram(demSource, plan, step, feedback)
+    if baseHistogram is None:
+        return empty((0, 2))
+
+    counts = rebinHistogram(baseHistogram, step, subdivisions)
+
+    areas = cumsum(counts) * plan.cellWidth * plan.cellHeight
+    elevationsCurve = baseHistogram.minValue + step * arange(1, len(counts) + 1)
+
+    return column_stack((areas, elevationsCurve))
@@ -0,0 +1,313 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import uuid
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from numpy import float32, maximum, uint8, where
+from osgeo import gdal, ogr, osr
+from .curve import computeAreaHeightVolume, findParameter
+from .demWindow import getDEMWindow, mapDEMWindows
+from .plan import MAX_WORKERS
+
+InundationArea = namedtuple('InundationArea', ['geometryWkb',
+                                               'elevation',
+                                               'height',
+                                               'area',
+                                               'volume'])
+
+DEPTH_NODATA = -9999
+OVERVIEW_BLOCK_SIZE = 256
+
+ATTRIBUTE_FIELDS = ['Elevation (m)',
+                    'Height (m)',
+                    'Area (m2)',
+                    'Volume (m3)']
+
+def computeInundationArea (demSource,plan,selectedParameter,parameterValue,spacing,feedback=None,depthPath=None):
+    '''
+    calculates the inundation area of the parameter value and the
+    elevation, height, area and volume of the water, and writes the water
+    depth raster in the same pass when a path is given
+    '''
+    AHV = computeAreaHeightVolume(demSource,plan,spacing,feedback)
+    waterParameters = findParameter(AHV,
+                                    selectedParameter,
+                                    parameterValue,
+                                    spacing)
+
+    return computeWaterInundationArea(demSource,plan,waterParameters,depthPath)
+def computeInundationScenarios (demSource,plan,selectedParameter,parameterValues,spacing,feedback=None):
+    '''
+    calculates the inundation area of each parameter value, computing the
+    curve once and thresholding and vectorizing the DEM window shared by
+    the scenarios in parallel workers (read once and passed to each of
+    them, so it is not read again when it exceeds the cache budget)
+    '''
+    AHV = computeAreaHeightVolume(demSource,plan,spacing,feedback)
+    scenariosWaterParameters = [findParameter(AHV,
+                                              selectedParameter,
+                                              parameterValue,
+                                              spacing)
+                                for parameterValue in parameterValues]
+
+    workers = 1
+    demWindow = None
+    if plan.inMemory:
+        demWindow = getDEMWindow(demSource,feedback)
+        workers = max(1, min(os.cpu_count() or 1, MAX_WORKERS, len(parameterValues)))
+
+    inundationAreas = []
+    with ThreadPoolExecutor(workers) as executor:
+        for inundationArea in executor.map(lambda waterParameters: computeWaterInundationArea(demSource,
+                                                                                              plan,
+                                                                                              waterParameters,
+                                                                                              None,
+                                                                                              demWindow),
+                                           scenariosWaterParameters):
+            inundationAreas.append(inundationArea)
+            if feedback is not None:
+                feedback.setProgress(int(100 * len(inundationAreas) / len(parameterValues)))
+
+    return inundationAreas
+def computeWaterInundationArea (demSource,plan,waterParameters,depthPath=None,demWindow=None):
+    '''
+    thresholds the DEM window (the one given, already read) at the water
+    elevation and vectorizes it, returning the inundation area with the
+    water parameters
+    '''
+    waterElevation, waterHeight, waterArea, waterVolume = waterParameters
+    reclassifiedPath = reclassifyInundationArea(demSource,plan,waterElevation,depthPath,demWindow=demWindow)
+    try:
+        geometryWkb = vectorizeInundationArea(reclassifiedPath)
+    finally:
+        gdal.Unlink(reclassifiedPath)
+
+    return InundationArea(geometryWkb,
+                          waterElevation,
+                          waterHeight,
+                          waterArea,
+                          waterVolume)
+def computeInundationMask (demSource,plan,selectedParameter,parameterValue,spacing,maskPath,maskBits=1,feedback=None,depthPath=None):
+    '''
+    calculates the elevation, height, area and volume of the water of the
+    parameter value and writes only the mask raster of the inundated
+    cells, with them as metadata, skipping the vectorization
+    '''
+    AHV = computeAreaHeightVolume(demSource,plan,spacing,feedback)
+    waterParameters = findParameter(AHV,
+                                    selectedParameter,
+                                    parameterValue,
+                                    spacing)
+    reclassifyInundationArea(demSource,plan,waterParameters[0],depthPath,maskPath,maskBits)
+
+    maskDS = gdal.Open(maskPath, gdal.GA_Update)
+    maskDS.SetMetadata({'PARAMETER': selectedParameter,
+                        'PARAMETER_VALUE': str(parameterValue),
+                        'VERTICAL_STEP': str(spacing),
+                        'WATER_ELEVATION': str(waterParameters[0]),
+                        'WATER_HEIGHT': str(waterParameters[1]),
+                        'WATER_AREA': str(waterParameters[2]),
+                        'WATER_VOLUME': str(waterParameters[3])})
+    maskDS.GetRasterBand(1).SetDescription('Inundated cells')
+    maskDS = None
+
+    return InundationArea(None, *waterParameters)
+def classifyInundatedCells (demWindow,waterElev):
+    '''
+    returns 1 for the cells of the DEM window below the water elevation
+    and 0 for the other cells
+    '''
+    return (demWindow.data <= waterElev).filled(False).astype(uint8)
+def calculateWaterDepth (demWindow,waterElev):
+    '''
+    returns the water depth of the cells of the DEM window below the
+    water elevation and DEPTH_NODATA for the other cells, measured
+    from the terrain when the window holds reach elevations
+    '''
+    if demWindow.terrain is not None:
+        inundated = (demWindow.data <= waterElev).filled(False)
+        depth = where(inundated, maximum(waterElev - demWindow.terrain.data, 0), DEPTH_NODATA)
+        return depth.astype(float32)
+
+    depth = (waterElev - demWindow.data).filled(DEPTH_NODATA)
+
+    return where(depth >= 0, depth, DEPTH_NODATA).astype(float32)
+def createIntermediatePath (plan,name):
+    '''
+    returns the path of an intermediate raster, in the GDAL memory
+    file system when the plan fits in memory or in the temporary folder
+    '''
+    fileName = name + '_' + uuid.uuid4().hex + '.tif'
+    if plan.inMemory:
+        return '/vsimem/' + fileName
+
+    return os.path.join(tempfile.gettempdir(), fileName)
+def createWindowRaster (path,plan,dataType,noData,options):
+    '''
+    creates a GeoTIFF with the grid of the DEM window,
+    without NODATA value if it is None
+    '''
+    width, height = plan.window[2], plan.window[3]
+
+    rasterDS = gdal.GetDriverByName('GTiff').Create(path,
+                                                    width,
+                                                    height,
+                                                    1,
+                                                    dataType,
+                                                    options)
+    rasterDS.SetGeoTransform(plan.geoTransform)
+    rasterDS.SetProjection(plan.projection)
+    if noData is not None:
+        rasterDS.GetRasterBand(1).SetNoDataValue(noData)
+
+    return rasterDS
+def buildRasterOverviews (path):
+    '''
+    builds the internal overviews of the raster, halving
+    its size until it fits in an overview block
+    '''
+    rasterDS = gdal.Open(path, gdal.GA_Update)
+    factors = []
+    factor = 2
+    while max(rasterDS.RasterXSize, rasterDS.RasterYSize) / factor >= OVERVIEW_BLOCK_SIZE:
+        factors.append(factor)
+        factor *= 2
+    if factors:
+        rasterDS.BuildOverviews('AVERAGE', factors)
+    rasterDS = None
+def reclassifyInundationArea (demSource,plan,waterElev,depthPath=None,maskPath=None,maskBits=8,demWindow=None):
+    '''
+    reclassifies the DEM window (the one given, already read, or read
+    tile by tile) based on the elevation obtained from the interpolation
+    of the given parameter and, in the same pass, writes the water depth
+    raster when a path is given; the reclassified raster is intermediate
+    (with the dry cells as NODATA, to be vectorized) unless the mask path
+    is given
+    '''
+    if maskPath:
+        path = maskPath
+        reclassifiedDS = createWindowRaster(path,
+                                            plan,
+                                            gdal.GDT_Byte,
+                                            None,
+                                            ['COMPRESS=DEFLATE',
+                                             'TILED=YES',
+                                             'NBITS=' + str(maskBits)])
+    else:
+        path = createIntermediatePath(plan,'inundationArea')
+        reclassifiedDS = createWindowRaster(path,
+                                            plan,
+                                            gdal.GDT_Byte,
+                                            0,
+                                            ['COMPRESS=DEFLATE',
+                                             'TILED=YES'])
+    reclassifiedBand = reclassifiedDS.GetRasterBand(1)
+
+    depthBand = None
+    if depthPath:
+        depthDS = createWindowRaster(depthPath,
+                                     plan,
+                                     gdal.GDT_Float32,
+                                     DEPTH_NODATA,
+                                     ['COMPRESS=DEFLATE',
+                                      'PREDICTOR=3',
+                                      'TILED=YES',
+                                      'BIGTIFF=IF_SAFER'])
+        depthBand = depthDS.GetRasterBand(1)
+
+    def classifyTile (demWindow):
+        inundated = classifyInundatedCells(demWindow,waterElev)
+        if depthBand is None:
+            return inundated, None
+        return inundated, calculateWaterDepth(demWindow,waterElev)
+
+    if demWindow is not None:
+        results = [classifyTile(demWindow)]
+    else:
+        results = mapDEMWindows(classifyTile,
+                                demSource,
+                                plan)
+
+    row = 0
+    for inundated, depth in results:
+        reclassifiedBand.WriteArray(inundated, 0, row)
+        if depth is not None:
+            depthBand.WriteArray(depth, 0, row)
+        row += inundated.shape[0]
+    reclassifiedDS = None
+
+    if depthBand is not None:
+        depthBand = None
+        depthDS = None
+        buildRasterOverviews(depthPath)
+
+    return path
+def vectorizeInundationArea (reclassifiedPath):
+    '''
+    vectorizes the reclassified raster, collecting the polygons of the
+    inundated cells in a single multipolygon, returned as WKB
+    '''
+    reclassifiedDS = gdal.Open(reclassifiedPath)
+    reclassifiedBand = reclassifiedDS.GetRasterBand(1)
+
+    memVectorDS = ogr.GetDriverByName('Memory').CreateDataSource('inundationArea')
+    memLayer = memVectorDS.CreateLayer('inundationArea', None, ogr.wkbPolygon)
+    memLayer.CreateField(ogr.FieldDefn('DN', ogr.OFTInteger))
+    gdal.Polygonize(reclassifiedBand, reclassifiedBand.GetMaskBand(), memLayer, 0)
+
+    inundationArea = ogr.Geometry(ogr.wkbMultiPolygon)
+    for feature in memLayer:
+        inundationArea.AddGeometry(feature.GetGeometryRef())
+
+    return inundationArea.ExportToWkb()
+def writeInundationArea (path,inundationArea,projection):
+    '''
+    writes the inundation area and its attributes in a GeoPackage
+    '''
+    spatialReference = osr.SpatialReference()
+    spatialReference.ImportFromWkt(projection)
+
+    inundationDS = ogr.GetDriverByName('GPKG').CreateDataSource(path)
+    inundationLayer = inundationDS.CreateLayer('inundation_area',
+                                               spatialReference,
+                                               ogr.wkbMultiPolygon)
+    for fieldName in ATTRIBUTE_FIELDS:
+        inundationLayer.CreateField(ogr.FieldDefn(fieldName, ogr.OFTReal))
+
+    feature = ogr.Feature(inundationLayer.GetLayerDefn())
+    feature.SetGeometry(ogr.CreateGeometryFromWkb(inundationArea.geometryWkb))
+    for fieldName, value in zip(ATTRIBUTE_FIELDS, inundationArea[1:]):
+        feature.SetField(fieldName, value)
+    inundationLayer.CreateFeature(feature)
+    inundationDS = None
@@ -0,0 +1,109 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+JOURNAL_FILE = 'journal.sqlite'
+
+def calculateFileSignature (path):
+    '''
+    returns the signature of the file, its path, size and modification
+    time, or only its path if it is not a file on disk
+    '''
+    try:
+        fileStat = os.stat(path)
+    except OSError:
+        return [path]
+
+    return [path, fileStat.st_size, fileStat.st_mtime_ns]
+def calculateJobFingerprint (job, geometryWkt, options):
+    '''
+    returns the fingerprint of the inputs of the job: the signature of
+    the DEM, the geometry of the area, the step and the stage query, and
+    the options that change its outputs
+    '''
+    inputs = [calculateFileSignature(job['dem']),
+              hashlib.sha1(geometryWkt.encode('utf-8')).hexdigest(),
+              job['step'],
+              job['parameter'],
+              job['value'],
+              options]
+
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+def openJournal (path):
+    '''
+    opens the journal of the completed jobs of a batch run, a SQLite file
+    with the fingerprint of the inputs and the summary of each job,
+    creating it if it does not exist
+    '''
+    journal = sqlite3.connect(path)
+    journal.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                    'job_id TEXT PRIMARY KEY, '
+                    'fingerprint TEXT NOT NULL, '
+                    'summary TEXT NOT NULL, '
+                    'completed REAL NOT NULL)')
+    journal.commit()
+
+    return journal
+def readJournalSummary (journal, jobId, fingerprint, outputFields):
+    '''
+    returns the summary of the completed job when its inputs did not
+    change and its outputs still exist, or None if it must be computed
+    '''
+    row = journal.execute('SELECT fingerprint, summary FROM jobs WHERE job_id = ?',
+                          (jobId,)).fetchone()
+    if row is None or row[0] != fingerprint:
+        return None
+    summary = json.loads(row[1])
+    if not all(os.path.exists(summary[field]) for field in outputFields if summary.get(field)):
+        return None
+
+    return summary
+def recordJob (journal, jobId, fingerprint, summary):
+    '''
+    records the completed job in the journal, committed at once so it
+    survives a crash of the run
+    '''
+    journal.execute('INSERT OR REPLACE INTO jobs (job_id, fingerprint, summary, completed) '
+                    'VALUES (?, ?, ?, ?)',
+                    (jobId, fingerprint, json.dumps(summary, default=float), time.time()))
+    journal.commit()
+def clearJournal (journal):
+    '''
+    removes all the jobs from the journal
+    '''
+    journal.execute('DELETE FROM jobs')
+    journal.commit()
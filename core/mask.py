@@ -0,0 +1,155 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from numpy import load, packbits, savez, unpackbits
+from osgeo import gdal, ogr
+
+DEFAULT_MASK_CACHE_BUDGET_MB = 64
+
+_maskCache = OrderedDict()
+_maskCacheLock = Lock()
+_maskCacheBudget = DEFAULT_MASK_CACHE_BUDGET_MB * 1024 * 1024
+_maskCacheFolder = None
+
+def setMaskCacheFolder (folder):
+    '''
+    sets the folder where the masks are also stored,
+    so they are reused between QGIS sessions
+    '''
+    global _maskCacheFolder
+    _maskCacheFolder = folder or None
+def clearMaskCache ():
+    '''
+    removes all the masks from the memory cache
+    '''
+    with _maskCacheLock:
+        _maskCache.clear()
+def calculateMaskKey (geometryHash, geoTransform, width, height):
+    '''
+    returns the key of the mask of a geometry burned in a grid
+    (packed by rows)
+    '''
+    return hashlib.sha1(repr(('rows',
+                              geometryHash,
+                              tuple(geoTransform),
+                              width,
+                              height)).encode('utf-8')).hexdigest()
+def packMask (mask):
+    '''
+    packs the boolean mask in bits, each row in its own bytes
+    '''
+    return packbits(mask, axis=1)
+def unpackMask (packedMask, width, rows=slice(None), columns=slice(None)):
+    '''
+    unpacks the bits of the rows and columns of the mask
+    into a boolean array
+    '''
+    return unpackbits(packedMask[rows], axis=1, count=width)[:, columns].astype(bool)
+def fitsMaskCache (width, height):
+    '''
+    returns whether the packed mask of a grid fits the memory cache
+    '''
+    return height * ((width + 7) // 8) <= _maskCacheBudget
+def rasterizeGeometry (geometry, geoTransform, width, height):
+    '''
+    burns the geometry in a grid, returning a boolean array
+    that is True for the cells inside the geometry
+    '''
+    memVectorDS = ogr.GetDriverByName('Memory').CreateDataSource('mask')
+    memLayer = memVectorDS.CreateLayer('mask', None, ogr.wkbUnknown)
+    feature = ogr.Feature(memLayer.GetLayerDefn())
+    feature.SetGeometry(geometry)
+    memLayer.CreateFeature(feature)
+
+    maskDS = gdal.GetDriverByName('MEM').Create('', width, height, 1, gdal.GDT_Byte)
+    maskDS.SetGeoTransform(geoTransform)
+    gdal.RasterizeLayer(maskDS, [1], memLayer, burn_values=[1])
+
+    return maskDS.ReadAsArray().astype(bool)
+def getGeometryMask (geometryWkt, geometryHash, geoTransform, width, height, feedback=None,
+                     rows=slice(None), columns=slice(None)):
+    '''
+    returns the rows and columns of the mask of the geometry burned in
+    the grid, reusing the masks already burned in memory or in the mask
+    cache folder, so the tiles of a window are sliced from the mask of
+    the window burned once
+    '''
+    key = calculateMaskKey(geometryHash, geoTransform, width, height)
+
+    with _maskCacheLock:
+        packedMask = _maskCache.get(key)
+        if packedMask is not None:
+            _maskCache.move_to_end(key)
+
+    if packedMask is None and _maskCacheFolder is not None:
+        maskPath = os.path.join(_maskCacheFolder, key + '.npz')
+        if os.path.exists(maskPath):
+            with load(maskPath) as maskFile:
+                packedMask = maskFile['mask']
+            _storeMask(key, packedMask)
+
+    if packedMask is not None:
+        if feedback is not None:
+            feedback.pushInfo('Area mask cache hit')
+        return unpackMask(packedMask, width, rows, columns)
+
+    if feedback is not None:
+        feedback.pushInfo('Area mask cache miss, burning the area in the DEM grid')
+    mask = rasterizeGeometry(ogr.CreateGeometryFromWkt(geometryWkt),
+                             geoTransform,
+                             width,
+                             height)
+    packedMask = packMask(mask)
+    _storeMask(key, packedMask)
+
+    if _maskCacheFolder is not None:
+        os.makedirs(_maskCacheFolder, exist_ok=True)
+        maskPath = os.path.join(_maskCacheFolder, key + '.npz')
+        with open(maskPath + '.tmp', 'wb') as maskFile:
+            savez(maskFile, mask=packedMask)
+        os.replace(maskPath + '.tmp', maskPath)
+
+    return mask[rows, columns]
+def _storeMask (key, packedMask):
+    '''
+    stores the packed mask in the memory cache, removing the least
+    recently used masks that no longer fit
+    '''
+    with _maskCacheLock:
+        _maskCache[key] = packedMask
+        cacheSize = sum(mask.nbytes for mask in _maskCache.values())
+        while _maskCache and cacheSize > _maskCacheBudget:
+            _, evictedMask = _maskCache.popitem(last=False)
+            cacheSize -= evictedMask.nbytes
@@ -0,0 +1,151 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import math
+import os
+from collections import namedtuple
+from osgeo import gdal
+from .demWindow import (calculateSourceWindow,
+                        calculateWindowGeoTransform,
+                        openDEM)
+
+MAX_WORKERS = 8
+MIN_TILE_ROWS = 16
+WORKING_BYTES_PER_CELL = 26
+
+ExecutionPlan = namedtuple('ExecutionPlan', ['window',
+                                             'geoTransform',
+                                             'projection',
+                                             'cellWidth',
+                                             'cellHeight',
+                                             'inMemory',
+                                             'tileRows',
+                                             'workers',
+                                             'maxMemoryMB'],
+                           defaults=(0,))
+
+def estimateBytesPerCell (dataTypeSize, workingBytesPerCell=WORKING_BYTES_PER_CELL):
+    '''
+    estimates the memory used to process each cell of the DEM window:
+    the cell and its copy of valid values, and the working arrays of the
+    processing (by default the mask and the temporary arrays of the
+    binning and reclassification)
+    '''
+    return 2 * dataTypeSize + workingBytesPerCell
+def calculateTileRows (width, height, rowBytes, workers, budget, graphBytesPerColumn=0):
+    '''
+    returns the most rows of the tiles of the workers that fit the memory
+    budget together with the data kept for each tile until the end
+    (graphBytesPerColumn bytes per column of each tile): the largest
+    root of workers * rowBytes * rows ** 2 - budget * rows +
+    height * width * graphBytesPerColumn, or the rows with the least
+    memory when none fits
+    '''
+    tileRows = budget // (workers * rowBytes)
+    if graphBytesPerColumn > 0:
+        quadratic = workers * rowBytes
+        constant = height * width * graphBytesPerColumn
+        discriminant = budget ** 2 - 4 * quadratic * constant
+        if discriminant >= 0:
+            tileRows = (budget + math.sqrt(discriminant)) / (2 * quadratic)
+        else:
+            tileRows = math.sqrt(constant / quadratic)
+
+    return int(min(max(1, tileRows), height))
+def planExecution (demSource, maxMemoryMB, feedback=None, workingBytesPerCell=WORKING_BYTES_PER_CELL,
+                   graphBytesPerColumn=0):
+    '''
+    chooses how the DEM window is processed within the memory budget:
+    entirely in memory (and cached), or streamed from the disk
+    in tiles of rows read by parallel workers, leaving room for the
+    graphBytesPerColumn bytes per column kept for each tile
+    '''
+    rasterDS = openDEM(demSource.rasterPath)
+    window = calculateSourceWindow(rasterDS, demSource)
+    geoTransform = rasterDS.GetGeoTransform()
+    dataType = rasterDS.GetRasterBand(demSource.band).DataType
+    bytesPerCell = estimateBytesPerCell(gdal.GetDataTypeSize(dataType) // 8, workingBytesPerCell)
+
+    width, height = window[2], window[3]
+    rowBytes = width * bytesPerCell
+    budget = maxMemoryMB * 1024 * 1024
+
+    if maxMemoryMB <= 0 or rowBytes * height <= budget:
+        inMemory, tileRows, workers = True, height, 1
+    else:
+        inMemory = False
+        workers = int(max(1, min(os.cpu_count() or 1,
+                                 MAX_WORKERS,
+                                 budget // (rowBytes * MIN_TILE_ROWS))))
+        tileRows = calculateTileRows(width, height, rowBytes, workers, budget, graphBytesPerColumn)
+
+    plan = ExecutionPlan(window,
+                         calculateWindowGeoTransform(geoTransform, window),
+                         rasterDS.GetProjection(),
+                         abs(geoTransform[1]),
+                         abs(geoTransform[5]),
+                         inMemory,
+                         tileRows,
+                         workers,
+                         maxMemoryMB)
+
+    if feedback is not None:
+        reportPlan(plan, rowBytes, budget, feedback)
+
+    return plan
+def reportPlan (plan, rowBytes, budget, feedback):
+    '''
+    logs the chosen execution plan
+    '''
+    width, height = plan.window[2], plan.window[3]
+    windowMB = rowBytes * height / (1024 * 1024)
+
+    if plan.inMemory:
+        feedback.pushInfo(
+            'Execution plan: DEM window of {0} x {1} cells ({2:.1f} MB) '
+            'processed in memory'.format(width, height, windowMB)
+        )
+        return
+
+    feedback.pushInfo(
+        'Execution plan: DEM window of {0} x {1} cells ({2:.1f} MB) exceeds '
+        'the memory budget of {3:.0f} MB, streamed from disk in tiles of '
+        '{4} rows by {5} workers'.format(width,
+                                        height,
+                                        windowMB,
+                                        budget / (1024 * 1024),
+                                        plan.tileRows,
+                                        plan.workers)
+    )
+    if rowBytes > budget:
+        feedback.pushWarning(
+            'A single row of the DEM window does not fit the memory budget'
+        )
@@ -0,0 +1,313 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict, namedtuple
+from math import ceil, sqrt
+from threading import Lock
+from numpy import ma
+from osgeo import gdal, ogr
+from .demWindow import (DEMSource,
+                        calculateDEMWindowKey,
+                        calculateWindowExtentWkt,
+                        getDEMWindow,
+                        openDEM)
+from .plan import planExecution
+from .zone import calculateZoneOffset, calculateZoneWindow, openZone
+
+PREVIEW_CELLS = 250000
+MAX_PREVIEW_WINDOWS = 8
+
+PreviewLevel = namedtuple('PreviewLevel', ['factor',
+                                           'demSource',
+                                           'plan'])
+
+_previewFiles = OrderedDict()
+_previewFilesLock = Lock()
+
+def clearPreviewFiles ():
+    '''
+    removes the preview rasters and temporary overviews from the
+    GDAL memory file system and the temporary folder
+    '''
+    with _previewFilesLock:
+        while _previewFiles:
+            _, paths = _previewFiles.popitem(last=False)
+            _unlinkFiles(paths)
+def calculatePreviewFactor (plan):
+    '''
+    returns the reduction of the resolution that keeps the preview
+    of the DEM window around PREVIEW_CELLS cells
+    '''
+    cells = plan.window[2] * plan.window[3]
+
+    return max(1, int(ceil(sqrt(cells / PREVIEW_CELLS))))
+def calculateRefinementFactors (factor, refine):
+    '''
+    returns the reductions of the resolution of each level, halving the
+    preview reduction down to the full resolution when refining
+    '''
+    factors = [factor]
+    while refine and factors[-1] > 1:
+        factors.append(factors[-1] // 2)
+
+    return factors
+def hasOverviews (rasterDS, band):
+    '''
+    checks whether the band of the DEM has an overview pyramid
+    '''
+    return rasterDS.GetRasterBand(band).GetOverviewCount() > 0
+def estimateOverviewsBytes (demSource, plan, factors):
+    '''
+    estimates the size of the overviews of the DEM window
+    '''
+    dataType = openDEM(demSource.rasterPath).GetRasterBand(demSource.band).DataType
+    cells = sum(int(ceil(plan.window[2] / factor)) * int(ceil(plan.window[3] / factor))
+                for factor in factors)
+
+    return cells * (gdal.GetDataTypeSize(dataType) // 8)
+def calculateOverviewsPath (demSource, plan, factors, name, maxMemoryMB=0):
+    '''
+    returns the path of the DEM window whose overviews are built, in the
+    GDAL memory file system when they fit the memory budget or in the
+    temporary folder
+    '''
+    fileName = 'swsWindow_' + name + '.vrt'
+    if maxMemoryMB <= 0 or estimateOverviewsBytes(demSource, plan, factors) <= maxMemoryMB * 1024 * 1024:
+        return '/vsimem/' + fileName
+
+    return os.path.join(tempfile.gettempdir(), fileName)
+def buildTemporaryOverviews (demSource, plan, factors, name, feedback=None, maxMemoryMB=0):
+    '''
+    builds the overviews of the DEM window, in the GDAL memory file system
+    or in the temporary folder when they exceed the memory budget, for DEMs
+    without an overview pyramid, returning the path of the window
+    '''
+    windowPath = calculateOverviewsPath(demSource, plan, factors, name, maxMemoryMB)
+    if gdal.VSIStatL(windowPath + '.ovr') is not None:
+        return windowPath
+
+    if feedback is not None:
+        feedback.pushInfo('The DEM has no overviews, building temporary '
+                          'overviews of the DEM window')
+    gdal.Translate(windowPath,
+                   openDEM(demSource.rasterPath),
+                   format='VRT',
+                   srcWin=list(plan.window),
+                   bandList=[demSource.band])
+    windowDS = gdal.Open(windowPath)
+    windowDS.BuildOverviews('AVERAGE', factors)
+    windowDS = None
+
+    return windowPath
+def createPreviewSource (demSource, plan, factor, sourcePath, sourceWindow, name):
+    '''
+    creates the virtual raster of the DEM window at the reduced resolution,
+    read from the overview of the source closest to it, and the virtual
+    raster of the zone on the same grid when the area is a zone raster
+    '''
+    previewPath = '/vsimem/swsPreview_' + name + '_' + str(factor) + '.vrt'
+    if gdal.VSIStatL(previewPath) is None:
+        gdal.Translate(previewPath,
+                       gdal.Open(sourcePath),
+                       format='VRT',
+                       srcWin=list(sourceWindow),
+                       bandList=[demSource.band if sourcePath == demSource.rasterPath else 1],
+                       width=int(ceil(plan.window[2] / factor)),
+                       height=int(ceil(plan.window[3] / factor)),
+                       resampleAlg='average')
+
+    if demSource.zonePath is None:
+        return DEMSource(previewPath, 1, demSource.geometryWkt), [previewPath]
+
+    zonePreviewPath = '/vsimem/swsZonePreview_' + name + '_' + str(factor) + '.vrt'
+    if gdal.VSIStatL(zonePreviewPath) is None:
+        zoneDS = openZone(demSource.zonePath)
+        columnOffset, rowOffset = calculateZoneOffset(openDEM(demSource.rasterPath), zoneDS)
+        gdal.Translate(zonePreviewPath,
+                       zoneDS,
+                       format='VRT',
+                       srcWin=[plan.window[0] - columnOffset,
+                               plan.window[1] - rowOffset,
+                               plan.window[2],
+                               plan.window[3]],
+                       bandList=[1],
+                       width=int(ceil(plan.window[2] / factor)),
+                       height=int(ceil(plan.window[3] / factor)),
+                       resampleAlg='mode')
+
+    return (DEMSource(previewPath, 1, None, zonePreviewPath, demSource.zoneValue),
+            [previewPath, zonePreviewPath])
+def createPreviewLevels (demSource, plan, refine=False, feedback=None, maxMemoryMB=0):
+    '''
+    returns the levels of the preview, from the coarsest computed from the
+    DEM overviews to the full resolution when refining
+    '''
+    factors = calculateRefinementFactors(calculatePreviewFactor(plan), refine)
+    previewFactors = [factor for factor in factors if factor > 1]
+    if not previewFactors:
+        if feedback is not None:
+            feedback.pushInfo('The DEM window is small enough to be '
+                              'processed at full resolution')
+        return [PreviewLevel(1, demSource, plan)]
+
+    key = calculateDEMWindowKey(demSource, plan)
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    paths = []
+
+    sourcePath, sourceWindow = demSource.rasterPath, plan.window
+    if not hasOverviews(openDEM(demSource.rasterPath), demSource.band):
+        sourcePath = buildTemporaryOverviews(demSource,
+                                             plan,
+                                             previewFactors,
+                                             name,
+                                             feedback,
+                                             maxMemoryMB)
+        sourceWindow = (0, 0, plan.window[2], plan.window[3])
+        paths += [sourcePath, sourcePath + '.ovr']
+
+    levels = []
+    for factor in factors:
+        if factor == 1:
+            levels.append(PreviewLevel(1, demSource, plan))
+            continue
+        previewSource, previewPaths = createPreviewSource(demSource,
+                                                         plan,
+                                                         factor,
+                                                         sourcePath,
+                                                         sourceWindow,
+                                                         name)
+        paths += previewPaths
+        levels.append(PreviewLevel(factor, previewSource, planExecution(previewSource, 0)))
+
+    _registerPreviewFiles(name, paths)
+
+    return levels
+def calculateAreaCells (demSource, plan):
+    '''
+    returns the number of full resolution cells of the zone or of the
+    part of the geometry inside the DEM window
+    '''
+    if demSource.zonePath is not None:
+        return calculateZoneWindow(openDEM(demSource.rasterPath), demSource).cells
+
+    windowExtent = ogr.CreateGeometryFromWkt(calculateWindowExtentWkt(plan.geoTransform,
+                                                                      plan.window[2],
+                                                                      plan.window[3]))
+    geometry = ogr.CreateGeometryFromWkt(demSource.geometryWkt)
+
+    return geometry.Intersection(windowExtent).GetArea() / (plan.cellWidth * plan.cellHeight)
+def countBoundaryCells (valid):
+    '''
+    counts the valid cells with an invalid or missing neighbour, whose
+    coverage by the area or by data is only partial at full resolution
+    '''
+    interior = valid.copy()
+    interior[1:, :] &= valid[:-1, :]
+    interior[:-1, :] &= valid[1:, :]
+    interior[:, 1:] &= valid[:, :-1]
+    interior[:, :-1] &= valid[:, 1:]
+    interior[[0, -1], :] = False
+    interior[:, [0, -1]] = False
+
+    return int((valid & ~interior).sum())
+def reportPreviewError (level, demSource, plan, feedback):
+    '''
+    logs the difference between the cells of the preview and the cells of
+    the area at full resolution, and the bound of the area error given by
+    the preview cells on the boundary of the area
+    '''
+    previewWindow = getDEMWindow(level.demSource)
+    valid = ~ma.getmaskarray(previewWindow.data)
+    previewCells = int(valid.sum())
+    boundaryCells = countBoundaryCells(valid)
+
+    previewCellArea = previewWindow.cellWidth * previewWindow.cellHeight
+    previewArea = previewCells * previewCellArea
+    areaBound = boundaryCells * previewCellArea
+    fullCells = calculateAreaCells(demSource, plan)
+    fullArea = fullCells * plan.cellWidth * plan.cellHeight
+
+    feedback.pushInfo(
+        'Preview at 1/{0} resolution: {1} cells standing for {2:.0f} cells of the '
+        'area at full resolution (total area difference of {3:.2f}%), area error '
+        'bound of ±{4:.0f} m² ({5:.2f}%) from {6} cells on the boundary'.format(
+            level.factor,
+            previewCells,
+            fullCells,
+            100 * (previewArea - fullArea) / fullArea if fullArea else 0,
+            areaBound,
+            100 * areaBound / previewArea if previewArea else 0,
+            boundaryCells)
+    )
+def mapPreviewLevels (function, demSource, plan, levels, feedback=None):
+    '''
+    applies the function to the DEM source and plan of each level, yielding
+    the level and its result, and stops refining when the user cancels
+    '''
+    for index, level in enumerate(levels):
+        if index > 0 and feedback is not None and feedback.isCanceled():
+            feedback.pushWarning('Refinement canceled, the results are from the '
+                                 'preview at 1/' + str(levels[index - 1].factor) +
+                                 ' resolution')
+            return
+
+        result = function(level.demSource, level.plan)
+
+        if feedback is not None:
+            if level.factor > 1:
+                reportPreviewError(level, demSource, plan, feedback)
+            if len(levels) > 1:
+                feedback.setProgress(int(100 * (index + 1) / len(levels)))
+
+        yield level, result
+def _registerPreviewFiles (name, paths):
+    '''
+    keeps the files of the previews of the last windows,
+    removing the files of the least recently used ones
+    '''
+    with _previewFilesLock:
+        previousPaths = _previewFiles.pop(name, [])
+        _previewFiles[name] = sorted(set(previousPaths + paths))
+        while len(_previewFiles) > MAX_PREVIEW_WINDOWS:
+            _, evictedPaths = _previewFiles.popitem(last=False)
+            _unlinkFiles(evictedPaths)
+def _unlinkFiles (paths):
+    '''
+    removes the files from the GDAL memory file system
+    or the temporary folder
+    '''
+    for path in paths:
+        if gdal.VSIStatL(path) is not None:
+            gdal.Unlink(path)
@@ -0,0 +1,182 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import hashlib
+from math import floor, ceil, hypot
+from osgeo import gdal, ogr, osr
+from .demWindow import (DEMSource,
+                        calculateSourceWindow,
+                        calculateWindowGeoTransform,
+                        openDEM,
+                        sourceModifiedTime)
+from .zone import openZone
+
+PROJECTED_NODATA = -9999
+SEGMENT_CELLS = 8
+BOUNDS_DENSITY = 21
+
+def createLocalProjection (geographicSRS, longitude, latitude):
+    '''
+    returns the Lambert azimuthal equal-area projection centered on the
+    point, on the datum of the geographic CRS, so the cells of the
+    projected DEM keep the true areas of the terrain
+    '''
+    localSRS = osr.SpatialReference()
+    localSRS.CopyGeogCSFrom(geographicSRS)
+    localSRS.SetLAEA(latitude, longitude, 0.0, 0.0)
+    localSRS.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    return localSRS
+def calculateProjectedCellSize (transform, longitude, latitude, cellWidth, cellHeight):
+    '''
+    calculates the width and the height on the ground of the cell of the
+    geographic grid at the point, the cell size of the projected DEM
+    '''
+    x, y, _ = transform.TransformPoint(longitude, latitude)
+    eastX, eastY, _ = transform.TransformPoint(longitude + cellWidth, latitude)
+    northX, northY, _ = transform.TransformPoint(longitude, latitude + cellHeight)
+
+    return hypot(eastX - x, eastY - y), hypot(northX - x, northY - y)
+def calculateProjectedBounds (transform, bounds, cellSize):
+    '''
+    calculates the bounds (xMin, yMin, xMax, yMax) in the local projection
+    of the geographic bounds, snapped to the projected cells
+    '''
+    xMin, yMin, xMax, yMax = transform.TransformBounds(*bounds, BOUNDS_DENSITY)
+    cellWidth, cellHeight = cellSize
+
+    return (floor(xMin / cellWidth) * cellWidth,
+            floor(yMin / cellHeight) * cellHeight,
+            ceil(xMax / cellWidth) * cellWidth,
+            ceil(yMax / cellHeight) * cellHeight)
+def warpToLocalProjection (sourceDS, sourcePath, localSRS, bounds, cellSize, resampleAlg, noData=None):
+    '''
+    returns the path of the virtual raster that warps the source on the
+    fly into the bounds and cells of the local projection, reusing the
+    virtual raster, and its transformer, while the source is not modified
+    '''
+    projection = localSRS.ExportToWkt()
+    key = (sourcePath, sourceModifiedTime(sourcePath), bounds, cellSize, projection, resampleAlg)
+    warpedPath = '/vsimem/swsProjected_' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.vrt'
+    if gdal.VSIStatL(warpedPath) is not None:
+        return warpedPath
+
+    options = {}
+    if resampleAlg != 'near':
+        if sourceDS.GetRasterBand(1).DataType != gdal.GDT_Float64:
+            options['outputType'] = gdal.GDT_Float32
+        options['dstNodata'] = noData
+    gdal.Warp(warpedPath,
+              sourceDS,
+              format='VRT',
+              outputBounds=bounds,
+              xRes=cellSize[0],
+              yRes=cellSize[1],
+              dstSRS=projection,
+              resampleAlg=resampleAlg,
+              **options)
+
+    return warpedPath
+def projectGeometryWkt (geometryWkt, transform, segmentLength):
+    '''
+    transforms the geometry to the local projection, densifying its
+    edges first so they follow the curved meridians and parallels
+    '''
+    geometry = ogr.CreateGeometryFromWkt(geometryWkt)
+    geometry.Segmentize(segmentLength)
+    geometry.Transform(transform)
+
+    return geometry.ExportToWkt()
+def projectDEMSource (demSource, feedback=None):
+    '''
+    returns the DEM source itself when the DEM is in a projected CRS;
+    for a DEM in a geographic CRS, returns the DEM source of the window
+    of the area warped on the fly (bilinear) into a local equal-area
+    projection, with its geometry or zone raster on the same grid
+    '''
+    rasterDS = openDEM(demSource.rasterPath)
+    demSRS = osr.SpatialReference()
+    if not rasterDS.GetProjection() or demSRS.ImportFromWkt(rasterDS.GetProjection()) != 0:
+        return demSource
+    if not demSRS.IsGeographic():
+        return demSource
+    demSRS.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    window = calculateSourceWindow(rasterDS, demSource)
+    geoTransform = calculateWindowGeoTransform(rasterDS.GetGeoTransform(), window)
+    xMin, yMax = geoTransform[0], geoTransform[3]
+    xMax = xMin + window[2] * geoTransform[1]
+    yMin = yMax + window[3] * geoTransform[5]
+    longitude, latitude = (xMin + xMax) / 2, (yMin + yMax) / 2
+
+    localSRS = createLocalProjection(demSRS, longitude, latitude)
+    transform = osr.CoordinateTransformation(demSRS, localSRS)
+    cellSize = calculateProjectedCellSize(transform,
+                                          longitude,
+                                          latitude,
+                                          geoTransform[1],
+                                          abs(geoTransform[5]))
+    bounds = calculateProjectedBounds(transform, (xMin, yMin, xMax, yMax), cellSize)
+
+    noData = rasterDS.GetRasterBand(demSource.band).GetNoDataValue()
+    demPath = warpToLocalProjection(rasterDS,
+                                    demSource.rasterPath,
+                                    localSRS,
+                                    bounds,
+                                    cellSize,
+                                    'bilinear',
+                                    PROJECTED_NODATA if noData is None else noData)
+    geometryWkt, zonePath = None, None
+    if demSource.zonePath is not None:
+        zonePath = warpToLocalProjection(openZone(demSource.zonePath),
+                                         demSource.zonePath,
+                                         localSRS,
+                                         bounds,
+                                         cellSize,
+                                         'near')
+    else:
+        geometryWkt = projectGeometryWkt(demSource.geometryWkt,
+                                         transform,
+                                         SEGMENT_CELLS * max(geoTransform[1], abs(geoTransform[5])))
+
+    if feedback is not None:
+        feedback.pushInfo(
+            'The DEM is in a geographic CRS, its window is projected on the fly '
+            'to a local equal-area projection with cells of {0:.2f} x {1:.2f} m'.format(*cellSize)
+        )
+
+    return DEMSource(demPath,
+                     demSource.band,
+                     geometryWkt,
+                     zonePath,
+                     demSource.zoneValue,
+                     demSource.reachPath)
@@ -0,0 +1,334 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import csv
+import html
+import json
+import os
+from collections import namedtuple
+from numpy import array, diff, int64, loadtxt, rint, union1d
+from osgeo import ogr
+from .coreExceptions import StorageError
+from .curveStore import readCurves
+from .decimation import decimateCurve
+
+REPORT_CURVE_POINTS = 64
+THUMBNAIL_SIZE = 96
+CURVE_SCALE = 10000
+SUMMARY_FILE = 'summary.csv'
+
+ReservoirSummary = namedtuple('ReservoirSummary', ['reservoirId',
+                                                   'minElevation',
+                                                   'maxElevation',
+                                                   'maxArea',
+                                                   'maxVolume',
+                                                   'curve',
+                                                   'thumbnail'])
+
+def encodeCurve (npAHVData, maxPoints=REPORT_CURVE_POINTS):
+    '''
+    encodes the curve in compact integers, its points decimated preserving
+    the shape of the area and volume curves: the differences between the
+    consecutive elevations in centimeters and between the consecutive
+    areas and volumes in ten-thousandths of the maximum ones
+    '''
+    areas, elevations, volumes = npAHVData[:, 0], npAHVData[:, 1], npAHVData[:, 2]
+    keptPoints = union1d(decimateCurve(volumes, elevations, maxPoints),
+                         decimateCurve(areas, elevations, maxPoints))
+    maxArea, maxVolume = areas.max(), volumes.max()
+
+    return {'e': encodeDifferences((elevations[keptPoints] - elevations[0]) * 100),
+            'a': encodeDifferences(areas[keptPoints] / (maxArea or 1) * CURVE_SCALE),
+            'v': encodeDifferences(volumes[keptPoints] / (maxVolume or 1) * CURVE_SCALE)}
+def encodeDifferences (values):
+    '''
+    rounds the values to integers and returns the first one followed by
+    the differences between the consecutive ones
+    '''
+    return diff(rint(values).astype(int64), prepend=0).tolist()
+def createThumbnailPath (geometry, size=THUMBNAIL_SIZE):
+    '''
+    returns the SVG path of the polygons of the geometry scaled to a
+    square of the size, simplified to its pixels
+    '''
+    if geometry is None or geometry.IsEmpty():
+        return ''
+    xMin, xMax, yMin, yMax = geometry.GetEnvelope()
+    scale = size / (max(xMax - xMin, yMax - yMin) or 1)
+    multiPolygon = ogr.ForceToMultiPolygon(geometry.SimplifyPreserveTopology(1 / scale))
+
+    commands = []
+    for polygonIndex in range(multiPolygon.GetGeometryCount()):
+        polygon = multiPolygon.GetGeometryRef(polygonIndex)
+        for ringIndex in range(polygon.GetGeometryCount()):
+            points = array(polygon.GetGeometryRef(ringIndex).GetPoints())[:, :2]
+            pixels = rint((points - (xMin, yMax)) * (scale, -scale)).astype(int)
+            commands.append('M' + ' '.join('{0},{1}'.format(x, y)
+                                           for x, y in dropRepeatedPixels(pixels.tolist())) + 'Z')
+
+    return ''.join(commands)
+def dropRepeatedPixels (pixels):
+    '''
+    yields the pixels of the ring without the consecutive repeated ones
+    '''
+    previous = None
+    for pixel in pixels:
+        if pixel != previous:
+            yield pixel
+        previous = pixel
+def summarizeReservoir (reservoirId, npAHVData, geometry=None):
+    '''
+    returns the summary of the reservoir in the report, with its compact
+    curve and the thumbnail of its polygon
+    '''
+    if len(npAHVData) == 0:
+        raise StorageError('The curve of the reservoir is empty: ' + str(reservoirId))
+
+    return ReservoirSummary(str(reservoirId),
+                            float(npAHVData[0, 1]),
+                            float(npAHVData[-1, 1]),
+                            float(npAHVData[:, 0].max()),
+                            float(npAHVData[:, 2].max()),
+                            encodeCurve(npAHVData),
+                            createThumbnailPath(geometry))
+def readCurveStoreReservoirs (curveStorePath):
+    '''
+    yields the summaries of the reservoirs of the curve store, read in
+    one pass, with the thumbnails of the reservoirs polygons
+    '''
+    for reservoirId, _, _, npAHVData, geometry in readCurves(curveStorePath):
+        yield summarizeReservoir(reservoirId, npAHVData, geometry)
+def readCurveData (dataPath):
+    '''
+    reads the area-height-volume data of a curve CSV file, ignoring the
+    columns of the uncertainty bands
+    '''
+    return loadtxt(dataPath, delimiter=',', skiprows=1, usecols=(0, 1, 2), ndmin=2)
+def readFirstGeometry (vectorPath):
+    '''
+    reads the union of the geometries of the first layer of the vector file
+    '''
+    vectorDS = ogr.Open(vectorPath)
+    if vectorDS is None:
+        return None
+    geometry = None
+    for feature in vectorDS.GetLayer(0):
+        featureGeometry = feature.GetGeometryRef()
+        if featureGeometry is None:
+            continue
+        geometry = featureGeometry.Clone() if geometry is None else geometry.Union(featureGeometry)
+
+    return geometry
+def readCurveFolderReservoirs (curveFolder):
+    '''
+    yields the summaries of the reservoirs of a folder of curve CSV files:
+    the reservoirs of the summary table of a batch run, with the
+    thumbnails of their inundation areas, or every CSV file of the folder,
+    named by its file name
+    '''
+    summaryPath = os.path.join(curveFolder, SUMMARY_FILE)
+    if not os.path.exists(summaryPath):
+        for fileName in sorted(os.listdir(curveFolder)):
+            if fileName.lower().endswith('.csv'):
+                yield summarizeReservoir(os.path.splitext(fileName)[0],
+                                         readCurveData(os.path.join(curveFolder, fileName)))
+        return
+
+    with open(summaryPath, newline='', encoding='utf-8') as summaryFile:
+        rows = [row for row in csv.DictReader(summaryFile)
+                if row.get('status') == 'ok' and row.get('data')]
+    for row in rows:
+        inundationPath = row.get('inundation_area')
+        yield summarizeReservoir(row['id'],
+                                 readCurveData(os.path.join(curveFolder, row['data'])),
+                                 readFirstGeometry(os.path.join(curveFolder, inundationPath))
+                                 if inundationPath else None)
+def encodeReservoirs (reservoirs):
+    '''
+    encodes the summaries of the reservoirs as the compact JSON embedded
+    in the report
+    '''
+    data = [{'id': reservoir.reservoirId,
+             'minElevation': round(reservoir.minElevation, 2),
+             'maxElevation': round(reservoir.maxElevation, 2),
+             'maxArea': round(reservoir.maxArea, 2),
+             'maxVolume': round(reservoir.maxVolume, 2),
+             'thumbnail': reservoir.thumbnail,
+             **reservoir.curve} for reservoir in reservoirs]
+
+    return json.dumps(data, separators=(',', ':')).replace('</', '<\\/')
+def renderReport (reportPath, reservoirs, bundleSource, title='Reservoirs report'):
+    '''
+    writes the report of the reservoirs in one HTML document, with their
+    compact data embedded and the shared plotly.js script loaded from the
+    bundle source, the curves being plotted lazily by the browser when
+    their rows are scrolled into view
+    '''
+    report = (REPORT_TEMPLATE.replace('$TITLE', html.escape(title))
+                             .replace('$THUMBNAIL_SIZE', str(THUMBNAIL_SIZE))
+                             .replace('$CURVE_SCALE', str(CURVE_SCALE))
+                             .replace('$BUNDLE', html.escape(bundleSource))
+                             .replace('$DATA', encodeReservoirs(reservoirs)))
+    with open(reportPath, 'w', encoding='utf-8') as reportFile:
+        reportFile.write(report)
+
+REPORT_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$TITLE</title>
+<style>
+body {font-family: sans-serif; margin: 1em 2em;}
+table {border-collapse: collapse; width: 100%;}
+th, td {border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: right; vertical-align: middle;}
+th:first-child, td:first-child {text-align: left;}
+th {position: sticky; top: 0; background: #fff; cursor: pointer;}
+.curve {width: 360px; height: 200px;}
+.thumbnail path {fill: #1e78dc; fill-opacity: 0.7; fill-rule: evenodd; stroke: #0b3d75; stroke-width: 0.5;}
+</style>
+<script src="$BUNDLE"></script>
+</head>
+<body>
+<h1>$TITLE</h1>
+<p id="totals"></p>
+<table>
+<thead><tr>
+<th data-key="id">Reservoir</th>
+<th data-key="minElevation">Minimum elevation (m)</th>
+<th data-key="maxElevation">Maximum elevation (m)</th>
+<th data-key="maxArea">Maximum area (m²)</th>
+<th data-key="maxVolume">Maximum capacity (m³)</th>
+<th>Area</th>
+<th>Area-Elevation-Volume curve</th>
+</tr></thead>
+<tbody id="reservoirs"></tbody>
+</table>
+<script id="data" type="application/json">$DATA</script>
+<script>
+(function () {
+  var reservoirs = JSON.parse(document.getElementById('data').textContent);
+  var body = document.getElementById('reservoirs');
+  var svgNamespace = 'http://www.w3.org/2000/svg';
+  var number = function (value) {
+    return value.toLocaleString(undefined, {maximumFractionDigits: 2});
+  };
+  var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) {
+        observer.unobserve(entry.target);
+        plotCurve(entry.target, reservoirs[entry.target.dataset.index]);
+      }
+    });
+  }, {rootMargin: '400px'});
+
+  function decode (differences, origin, scale) {
+    var value = 0;
+    return differences.map(function (difference) {
+      value += difference;
+      return origin + value * scale;
+    });
+  }
+  function plotCurve (element, reservoir) {
+    var elevations = decode(reservoir.e, reservoir.minElevation, 0.01);
+    var areas = decode(reservoir.a, 0, reservoir.maxArea / $CURVE_SCALE);
+    var volumes = decode(reservoir.v, 0, reservoir.maxVolume / $CURVE_SCALE);
+    Plotly.newPlot(element,
+                   [{x: volumes, y: elevations, mode: 'lines', name: 'Volume'},
+                    {x: areas, y: elevations, mode: 'lines', name: 'Area', xaxis: 'x2'}],
+                   {margin: {l: 50, r: 10, t: 30, b: 30},
+                    showlegend: false,
+                    xaxis: {title: {text: 'Volume (m³)'}},
+                    xaxis2: {overlaying: 'x', side: 'top', autorange: 'reversed'},
+                    yaxis: {title: {text: 'Elevation (m)'}}},
+                   {displayModeBar: false});
+  }
+  function createThumbnail (reservoir) {
+    var svg = document.createElementNS(svgNamespace, 'svg');
+    svg.setAttribute('class', 'thumbnail');
+    svg.setAttribute('width', '$THUMBNAIL_SIZE');
+    svg.setAttribute('height', '$THUMBNAIL_SIZE');
+    svg.setAttribute('viewBox', '0 0 $THUMBNAIL_SIZE $THUMBNAIL_SIZE');
+    if (reservoir.thumbnail) {
+      var path = document.createElementNS(svgNamespace, 'path');
+      path.setAttribute('d', reservoir.thumbnail);
+      svg.appendChild(path);
+    }
+    return svg;
+  }
+  function renderRows () {
+    observer.disconnect();
+    var fragment = document.createDocumentFragment();
+    reservoirs.forEach(function (reservoir, index) {
+      var row = document.createElement('tr');
+      [reservoir.id,
+       number(reservoir.minElevation),
+       number(reservoir.maxElevation),
+       number(reservoir.maxArea),
+       number(reservoir.maxVolume)].forEach(function (value) {
+        var cell = document.createElement('td');
+        cell.textContent = value;
+        row.appendChild(cell);
+      });
+      var thumbnailCell = document.createElement('td');
+      thumbnailCell.appendChild(createThumbnail(reservoir));
+      row.appendChild(thumbnailCell);
+      var curveCell = document.createElement('td');
+      var curve = document.createElement('div');
+      curve.className = 'curve';
+      curve.dataset.index = index;
+      curveCell.appendChild(curve);
+      row.appendChild(curveCell);
+      fragment.appendChild(row);
+      observer.observe(curve);
+    });
+    body.replaceChildren(fragment);
+  }
+
+  document.querySelectorAll('th[data-key]').forEach(function (header) {
+    header.addEventListener('click', function () {
+      var key = header.dataset.key;
+      var order = header.dataset.order === 'ascending' ? -1 : 1;
+      header.dataset.order = order === 1 ? 'ascending' : 'descending';
+      reservoirs.sort(function (first, second) {
+        return first[key] < second[key] ? -order : first[key] > second[key] ? order : 0;
+      });
+      renderRows();
+    });
+  });
+  document.getElementById('totals').textContent = reservoirs.length + ' reservoirs, total capacity of ' +
+    number(reservoirs.reduce(function (total, reservoir) { return total + reservoir.maxVolume; }, 0)) + ' m³';
+  renderRows();
+})();
+</script>
+</body>
+</html>
+'''
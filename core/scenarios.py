@@ -0,0 +1,76 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import re
+import csv
+from .coreExceptions import StorageError
+
+SCENARIO_ID_FIELD = 'id'
+
+def parseScenarioValues (text):
+    '''
+    parses the values separated by commas, semicolons or spaces,
+    returning the scenarios (id, value) numbered from 1
+    '''
+    values = [value for value in re.split(r'[,;\s]+', text.strip()) if value]
+    try:
+        return [(str(index), float(value)) for index, value in enumerate(values, 1)]
+    except ValueError as error:
+        raise StorageError('Invalid scenario value: ' + str(error))
+def readScenarioValues (path, field=None):
+    '''
+    reads the scenarios (id, value) from a column of the CSV file, the
+    first column other than the id if the field is not given, taking the
+    ids from the id column or numbering them from 1
+    '''
+    with open(path, newline='', encoding='utf-8-sig') as scenarioFile:
+        reader = csv.DictReader(scenarioFile)
+        fieldNames = reader.fieldnames or []
+        valueFields = [fieldName for fieldName in fieldNames
+                       if fieldName != SCENARIO_ID_FIELD]
+        field = field or (valueFields[0] if valueFields else None)
+        if field not in fieldNames:
+            raise StorageError('The column ' + str(field) +
+                               ' is not in the scenario file: ' + path)
+
+        scenarios = []
+        for index, row in enumerate(reader, 1):
+            value = (row.get(field) or '').strip()
+            if not value:
+                continue
+            try:
+                scenarios.append((row.get(SCENARIO_ID_FIELD) or str(index), float(value)))
+            except ValueError:
+                raise StorageError('Invalid scenario value in the row ' +
+                                   str(index) + ': ' + value)
+
+    return scenarios
@@ -0,0 +1,110 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import hashlib
+from math import floor
+from numpy import float32, nan, where
+from osgeo import gdal
+from .coreExceptions import StorageError
+from .demWindow import DEMSource, calculateDEMWindowKey, openDEM, readDEMWindow
+from .fill import floodWindow, getFloodedWindow, registerFloodedWindow
+from .inundation import createIntermediatePath, createWindowRaster
+
+def calculateSeedCell (plan, seedX, seedY):
+    '''
+    returns the column and row of the seed point in the DEM window
+    '''
+    geoTransform = plan.geoTransform
+    column = int(floor((seedX - geoTransform[0]) / geoTransform[1]))
+    row = int(floor((seedY - geoTransform[3]) / geoTransform[5]))
+    if not (0 <= column < plan.window[2] and 0 <= row < plan.window[3]):
+        raise StorageError('The seed point is outside the DEM window of the area')
+
+    return column, row
+def verifySeedCell (demSource, plan, seedCell):
+    '''
+    checks that the seed cell is inside the area and is not NODATA
+    '''
+    column, row = seedCell
+    seedWindow = readDEMWindow(openDEM(demSource.rasterPath),
+                               demSource,
+                               (plan.window[0] + column, plan.window[1] + row, 1, 1))
+    if seedWindow.data.mask.all():
+        raise StorageError('The seed point is outside the area or on a NODATA cell')
+def computeReachSource (demSource, plan, seedX, seedY, feedback=None):
+    '''
+    computes the reach elevations of the DEM window, the lowest water
+    elevation at which each cell is connected to the seed point (the
+    highest elevation of the lowest path between them), with a
+    priority-flood from the seed cell; the cells never connected are
+    NaN. Returns the DEM source with the reach elevations, where the
+    inundation at a water elevation is the cells at or below it
+    '''
+    seedCell = calculateSeedCell(plan, seedX, seedY)
+    verifySeedCell(demSource, plan, seedCell)
+
+    key = calculateDEMWindowKey(demSource, plan) + (seedCell,)
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    entry = getFloodedWindow(name)
+    if entry is None:
+        path = createIntermediatePath(plan, 'reachElevations')
+        reachDS = createWindowRaster(path,
+                                     plan,
+                                     gdal.GDT_Float32,
+                                     nan,
+                                     ['COMPRESS=DEFLATE',
+                                      'TILED=YES',
+                                      'BIGTIFF=IF_SAFER'])
+        reachBand = reachDS.GetRasterBand(1)
+
+        reachedCells = 0
+        for tile, _, _, filled, reached in floodWindow(demSource, plan, seedCell, feedback):
+            reachedCells += int(reached.sum())
+            reachBand.WriteArray(where(reached, filled, nan).astype(float32),
+                                 0,
+                                 tile[1] - plan.window[1])
+        reachBand = None
+        reachDS = None
+
+        registerFloodedWindow(name, path, reachedCells)
+        entry = (path, reachedCells)
+
+    if feedback is not None:
+        feedback.pushInfo('Seed point at cell {0}, connected to {1} cells'.format(seedCell,
+                                                                                 entry[1]))
+
+    return DEMSource(demSource.rasterPath,
+                     demSource.band,
+                     demSource.geometryWkt,
+                     demSource.zonePath,
+                     demSource.zoneValue,
+                     entry[0])
@@ -0,0 +1,108 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+from collections import namedtuple
+from math import ceil, sqrt
+from numpy import float32, nan, uint32, zeros
+from .curve import ELEVATION_PARAMETER, computeAreaHeightVolume, findParameter
+from .demWindow import getDEMWindow
+from .plan import planExecution
+
+DISPLAY_CELLS = 2000000
+SLIDER_STEPS = 1000
+INUNDATION_COLOR = 0xB41E78DC
+
+StageData = namedtuple('StageData', ['displayData',
+                                     'extent',
+                                     'projection',
+                                     'AHV',
+                                     'step'])
+
+StageValues = namedtuple('StageValues', ['elevation',
+                                         'height',
+                                         'area',
+                                         'volume'])
+
+def loadStageData (demSource, step, feedback=None):
+    '''
+    reads the DEM window and computes its elevation-area-volume curve once,
+    keeping the window at the display resolution to be thresholded
+    at each stage
+    '''
+    plan = planExecution(demSource, 0)
+    AHV = computeAreaHeightVolume(demSource, plan, step, feedback)
+    demWindow = getDEMWindow(demSource, feedback)
+
+    height, width = demWindow.data.shape
+    geoTransform = demWindow.geoTransform
+    extent = (geoTransform[0],
+              geoTransform[3] + height * geoTransform[5],
+              geoTransform[0] + width * geoTransform[1],
+              geoTransform[3])
+
+    return StageData(decimateWindow(demWindow.data, DISPLAY_CELLS),
+                     extent,
+                     demWindow.projection,
+                     AHV,
+                     step)
+def decimateWindow (data, maxCells):
+    '''
+    takes every n-th cell of the masked DEM window so it has at most
+    maxCells cells, filling the masked cells with NaN
+    '''
+    stride = max(1, int(ceil(sqrt(data.size / maxCells))))
+
+    return data[::stride, ::stride].astype(float32).filled(nan)
+def calculateStageElevation (AHV, position, steps=SLIDER_STEPS):
+    '''
+    converts the slider position in an elevation of the curve
+    '''
+    elevations = AHV[:, 1]
+
+    return float(elevations[0] + (elevations[-1] - elevations[0]) * position / steps)
+def calculateStageValues (stageData, elevation):
+    '''
+    interpolates the height, area and volume of the elevation in the curve
+    '''
+    return StageValues(*findParameter(stageData.AHV,
+                                      ELEVATION_PARAMETER,
+                                      elevation,
+                                      stageData.step))
+def renderInundation (displayData, elevation, color=INUNDATION_COLOR):
+    '''
+    returns the ARGB pixels of the cells below the elevation
+    in the inundation color, and transparent for the others
+    '''
+    pixels = zeros(displayData.shape, dtype=uint32)
+    pixels[displayData <= elevation] = color
+
+    return pixels
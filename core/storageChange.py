@@ -0,0 +1,229 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+from numpy import (arange, bincount, column_stack, cumsum, floor, float32, int64,
+                   savetxt, vstack, where, zeros)
+from osgeo import gdal
+from .coreExceptions import StorageError
+from .curve import calculateAreaHeightVolume
+from .demWindow import (DEMSource,
+                        calculateTiles,
+                        mapBounded,
+                        openDEM,
+                        readDEMWindow,
+                        sourceModifiedTime)
+from .inundation import buildRasterOverviews, createWindowRaster
+from .zone import calculateZoneOffset
+
+DIFFERENCE_NODATA = -9999
+
+def alignSecondDEM (demSource, plan, secondPath, secondBand=1):
+    '''
+    returns the DEM source of the second DEM on the grid of the DEM
+    window, a virtual raster that reads it directly when both grids
+    are aligned and resamples it on the fly (bilinear) when they differ
+    '''
+    secondDS = openDEM(secondPath)
+    try:
+        calculateZoneOffset(openDEM(demSource.rasterPath), secondDS)
+        resampleAlg = 'near'
+    except StorageError:
+        resampleAlg = 'bilinear'
+
+    key = (secondPath, secondBand, sourceModifiedTime(secondPath), tuple(plan.window),
+           plan.geoTransform, plan.projection)
+    alignedPath = '/vsimem/swsSecondDEM_' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.vrt'
+    if gdal.VSIStatL(alignedPath) is None:
+        xMin, yMax = plan.geoTransform[0], plan.geoTransform[3]
+        gdal.Warp(alignedPath,
+                  secondDS,
+                  format='VRT',
+                  outputBounds=(xMin,
+                                yMax + plan.window[3] * plan.geoTransform[5],
+                                xMin + plan.window[2] * plan.geoTransform[1],
+                                yMax),
+                  width=plan.window[2],
+                  height=plan.window[3],
+                  dstSRS=plan.projection or None,
+                  srcBands=[secondBand],
+                  outputType=gdal.GDT_Float32,
+                  dstNodata=DIFFERENCE_NODATA,
+                  resampleAlg=resampleAlg)
+
+    return DEMSource(alignedPath,
+                     1,
+                     demSource.geometryWkt,
+                     demSource.zonePath,
+                     demSource.zoneValue)
+def mapPairedWindows (function, demSource, secondSource, plan):
+    '''
+    applies the function to the DEM window and the window of the second
+    DEM on its grid, or to each of their tiles read by parallel workers
+    when the plan does not fit it in memory, yielding the tiles and the
+    results in the order of the rows
+    '''
+    workerData = local()
+
+    def processTile (tile):
+        if not hasattr(workerData, 'rasterDS'):
+            workerData.rasterDS = openDEM(demSource.rasterPath)
+            workerData.secondDS = openDEM(secondSource.rasterPath)
+        demWindow = readDEMWindow(workerData.rasterDS, demSource, tile)
+        secondWindow = readDEMWindow(workerData.secondDS,
+                                     secondSource,
+                                     (tile[0] - plan.window[0],
+                                      tile[1] - plan.window[1],
+                                      tile[2],
+                                      tile[3]))
+        return tile, function(demWindow, secondWindow)
+
+    with ThreadPoolExecutor(plan.workers) as executor:
+        yield from mapBounded(executor, processTile, calculateTiles(plan.window, plan.tileRows), plan.workers)
+def countPairedElevations (demWindow, secondWindow, step):
+    '''
+    counts the cells valid in both DEM windows in the elevation bins
+    of the step (anchored at 0, so the bins of every tile are common),
+    returning the first bin, the counts of both DEMs and the difference
+    of the second DEM to the first
+    '''
+    valid = ~(demWindow.data.mask | secondWindow.data.mask)
+    difference = where(valid,
+                       secondWindow.data.data.astype(float) - demWindow.data.data,
+                       DIFFERENCE_NODATA).astype(float32)
+    if not valid.any():
+        return 0, zeros((2, 0), dtype=int64), difference
+
+    binIndexes = floor(demWindow.data.data[valid] / step).astype(int64)
+    secondBinIndexes = floor(secondWindow.data.data[valid] / step).astype(int64)
+    firstBin = int(min(binIndexes.min(), secondBinIndexes.min()))
+    numberOfBins = int(max(binIndexes.max(), secondBinIndexes.max())) - firstBin + 1
+
+    counts = vstack((bincount(binIndexes - firstBin, minlength=numberOfBins),
+                     bincount(secondBinIndexes - firstBin, minlength=numberOfBins)))
+
+    return firstBin, counts, difference
+def addTileCounts (firstBin, counts, tileFirstBin, tileCounts):
+    '''
+    adds the counts of the bins of a tile (a row for each DEM), starting
+    at its first bin, to the counts starting at the first bin, extending
+    them as needed
+    '''
+    if not tileCounts.shape[1]:
+        return firstBin, counts
+    if not counts.shape[1]:
+        return tileFirstBin, tileCounts
+
+    newFirstBin = min(firstBin, tileFirstBin)
+    numberOfBins = max(firstBin + counts.shape[1], tileFirstBin + tileCounts.shape[1]) - newFirstBin
+    newCounts = zeros((counts.shape[0], numberOfBins), dtype=int64)
+    newCounts[:, firstBin - newFirstBin:firstBin - newFirstBin + counts.shape[1]] += counts
+    newCounts[:, tileFirstBin - newFirstBin:tileFirstBin - newFirstBin + tileCounts.shape[1]] += tileCounts
+
+    return newFirstBin, newCounts
+def computeStorageChange (demSource, secondSource, plan, step, differencePath=None, feedback=None):
+    '''
+    calculates the elevation-area-volume data of both DEMs on common bins
+    in a single pass over their windows (the cells valid in both), with
+    the capacity loss of each elevation from the first DEM to the second,
+    writing the difference of the second DEM to the first when a path
+    is given; returns None, without the difference raster, when the user
+    cancels
+    '''
+    differenceBand = None
+    if differencePath:
+        differenceDS = createWindowRaster(differencePath,
+                                          plan,
+                                          gdal.GDT_Float32,
+                                          DIFFERENCE_NODATA,
+                                          ['COMPRESS=DEFLATE',
+                                           'PREDICTOR=3',
+                                           'TILED=YES',
+                                           'BIGTIFF=IF_SAFER'])
+        differenceBand = differenceDS.GetRasterBand(1)
+
+    firstBin, counts = 0, zeros((2, 0), dtype=int64)
+    tiles = calculateTiles(plan.window, plan.tileRows)
+    for index, (tile, (tileFirstBin, tileCounts, difference)) in enumerate(
+            mapPairedWindows(lambda demWindow, secondWindow: countPairedElevations(demWindow,
+                                                                                  secondWindow,
+                                                                                  step),
+                             demSource,
+                             secondSource,
+                             plan)):
+        if feedback is not None:
+            if feedback.isCanceled():
+                break
+            feedback.setProgress(int(100 * (index + 1) / len(tiles)))
+        firstBin, counts = addTileCounts(firstBin, counts, tileFirstBin, tileCounts)
+        if differenceBand is not None:
+            differenceBand.WriteArray(difference, 0, tile[1] - plan.window[1])
+
+    if feedback is not None and feedback.isCanceled():
+        if differenceBand is not None:
+            differenceBand = None
+            differenceDS = None
+            gdal.Unlink(differencePath)
+        return None
+
+    if differenceBand is not None:
+        differenceBand = None
+        differenceDS = None
+        buildRasterOverviews(differencePath)
+
+    areas, secondAreas = cumsum(counts, axis=1) * plan.cellWidth * plan.cellHeight
+    elevations = step * (firstBin + arange(1, counts.shape[1] + 1))
+
+    AHV = calculateAreaHeightVolume(column_stack((areas, elevations)))
+    secondAHV = calculateAreaHeightVolume(column_stack((secondAreas, elevations)))
+
+    return column_stack((AHV[:, 1],
+                         AHV[:, 0],
+                         AHV[:, 2],
+                         secondAHV[:, 0],
+                         secondAHV[:, 2],
+                         AHV[:, 2] - secondAHV[:, 2]))
+def saveStorageChangeData (path, storageChange):
+    '''
+    saves the elevation-area-volume data of both DEMs and
+    the capacity loss in a CSV file
+    '''
+    savetxt(
+            path,
+            storageChange,
+            delimiter=',',
+            header='Elevation (m),Area (m²),Volume (m³),'
+                   'Second area (m²),Second volume (m³),Capacity loss (m³)',
+            comments='',
+            fmt='%s'
+            )
@@ -0,0 +1,196 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+import hashlib
+import tempfile
+from osgeo import gdal, ogr, osr
+from .coreExceptions import StorageError
+from .demWindow import calculateWindowExtentWkt, sourceModifiedTime
+
+TILE_EXTENSIONS = ('.tif', '.tiff', '.asc', '.img', '.bil', '.dem', '.flt', '.hgt', '.nc')
+LOCATION_FIELD = 'location'
+SIGNATURE_ITEM = 'SWS_SIGNATURE'
+
+def listTilePaths (tileDirectory):
+    '''
+    lists the raster files of the tile directory and its subdirectories
+    '''
+    tilePaths = []
+    for directory, _, fileNames in os.walk(tileDirectory):
+        tilePaths += [os.path.join(directory, fileName) for fileName in fileNames
+                      if fileName.lower().endswith(TILE_EXTENSIONS)]
+
+    return sorted(tilePaths)
+def calculateTileSize (tilePath):
+    '''
+    returns the size of the tile file, or None if the tile
+    is not a file on disk
+    '''
+    try:
+        return os.path.getsize(tilePath)
+    except OSError:
+        return None
+def calculateDirectorySignature (tilePaths):
+    '''
+    returns a hash of the tile paths, their sizes and modification times,
+    which changes when a tile is added, removed or rewritten
+    '''
+    signature = repr([(tilePath, calculateTileSize(tilePath), sourceModifiedTime(tilePath))
+                      for tilePath in tilePaths])
+
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+def calculateTileIndexPath (tileDirectory):
+    '''
+    returns the path of the cached tile index of the directory,
+    in the temporary folder
+    '''
+    name = hashlib.sha1(os.path.abspath(tileDirectory).encode('utf-8')).hexdigest()
+
+    return os.path.join(tempfile.gettempdir(), 'swsTileIndex_' + name + '.gpkg')
+def readIndexSignature (indexPath):
+    '''
+    returns the signature of the directory stored in the tile index,
+    or None if there is no valid index
+    '''
+    if not os.path.exists(indexPath):
+        return None
+    indexDS = ogr.Open(indexPath)
+    if indexDS is None:
+        return None
+
+    return indexDS.GetMetadataItem(SIGNATURE_ITEM)
+def scanTileDirectory (tileDirectory, feedback=None):
+    '''
+    returns the tile index of the directory, a GeoPackage with the
+    footprint of each tile (spatially indexed), scanning the directory
+    only when its tiles changed since the last scan
+    '''
+    tilePaths = listTilePaths(tileDirectory)
+    if not tilePaths:
+        raise StorageError('The tile directory has no raster files: ' + tileDirectory)
+    signature = calculateDirectorySignature(tilePaths)
+    indexPath = calculateTileIndexPath(tileDirectory)
+    if readIndexSignature(indexPath) == signature:
+        if feedback is not None:
+            feedback.pushInfo('Tile index of the directory reused: ' + indexPath)
+        return indexPath
+
+    if feedback is not None:
+        feedback.pushInfo('Scanning {0} tiles of the directory'.format(len(tilePaths)))
+    if os.path.exists(indexPath):
+        ogr.GetDriverByName('GPKG').DeleteDataSource(indexPath)
+    indexDS = ogr.GetDriverByName('GPKG').CreateDataSource(indexPath)
+    indexLayer = None
+
+    indexDS.StartTransaction()
+    for index, tilePath in enumerate(tilePaths):
+        if feedback is not None:
+            if feedback.isCanceled():
+                break
+            feedback.setProgress(int(100 * index / len(tilePaths)))
+        tileDS = gdal.Open(tilePath)
+        if tileDS is None:
+            continue
+        if indexLayer is None:
+            spatialReference = None
+            if tileDS.GetProjection():
+                spatialReference = osr.SpatialReference(wkt=tileDS.GetProjection())
+            indexLayer = indexDS.CreateLayer('tiles', spatialReference, ogr.wkbPolygon)
+            indexLayer.CreateField(ogr.FieldDefn(LOCATION_FIELD, ogr.OFTString))
+        feature = ogr.Feature(indexLayer.GetLayerDefn())
+        feature.SetField(LOCATION_FIELD, tilePath)
+        feature.SetGeometry(ogr.CreateGeometryFromWkt(calculateWindowExtentWkt(tileDS.GetGeoTransform(),
+                                                                               tileDS.RasterXSize,
+                                                                               tileDS.RasterYSize)))
+        indexLayer.CreateFeature(feature)
+    indexDS.CommitTransaction()
+    if feedback is None or not feedback.isCanceled():
+        indexDS.SetMetadataItem(SIGNATURE_ITEM, signature)
+    indexDS = None
+
+    return indexPath
+def findIntersectingTiles (indexPath, geometryWkt, locationField=LOCATION_FIELD, layerName=None):
+    '''
+    returns the paths of the tiles of the tile index (a footprint layer
+    with the path of each tile, relative to the index or absolute)
+    whose footprint intersects the geometry, in the CRS of the index
+    '''
+    indexDS = ogr.Open(indexPath)
+    if indexDS is None:
+        raise StorageError('The tile index could not be opened: ' + indexPath)
+    indexLayer = indexDS.GetLayerByName(layerName) if layerName else indexDS.GetLayer(0)
+    if indexLayer is None:
+        raise StorageError('The tile index has no layer ' + str(layerName))
+    if indexLayer.GetLayerDefn().GetFieldIndex(locationField) < 0:
+        raise StorageError('The tile index has no field ' + locationField)
+
+    geometry = ogr.CreateGeometryFromWkt(geometryWkt)
+    indexLayer.SetSpatialFilter(geometry)
+    indexDirectory = os.path.dirname(os.path.abspath(indexPath))
+    tilePaths = set()
+    for feature in indexLayer:
+        footprint = feature.GetGeometryRef()
+        location = feature.GetField(locationField)
+        if location and footprint is not None and footprint.Intersects(geometry):
+            tilePaths.add(location if os.path.isabs(location) or location.startswith('/vsi')
+                          else os.path.join(indexDirectory, location))
+
+    return sorted(tilePaths)
+def buildTileMosaic (tilePaths):
+    '''
+    builds the virtual mosaic of the tiles in the GDAL memory file system,
+    which opens each tile only when its cells are read; the path of the
+    mosaic carries the signature of the tiles, so the mosaic and the
+    windows cached from it are rebuilt when a tile is rewritten
+    '''
+    name = calculateDirectorySignature(tilePaths)
+    mosaicPath = '/vsimem/swsTiles_' + name + '.vrt'
+    if gdal.VSIStatL(mosaicPath) is None:
+        mosaicDS = gdal.BuildVRT(mosaicPath, tilePaths)
+        if mosaicDS is None:
+            raise StorageError('The DEM tiles could not be mosaicked')
+        mosaicDS = None
+
+    return mosaicPath
+def resolveTileMosaic (indexPath, geometryWkt, locationField=LOCATION_FIELD, layerName=None,
+                       feedback=None):
+    '''
+    returns the virtual mosaic of the tiles of the tile index
+    that intersect the geometry
+    '''
+    tilePaths = findIntersectingTiles(indexPath, geometryWkt, locationField, layerName)
+    if not tilePaths:
+        raise StorageError('No tile of the tile index intersects the area')
+    if feedback is not None:
+        feedback.pushInfo('{0} tiles of the tile index intersect the area'.format(len(tilePaths)))
+
+    return buildTileMosaic(tilePaths)
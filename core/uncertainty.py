@@ -0,0 +1,181 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from collections import namedtuple
+from math import ceil
+from numpy import (append, arange, bincount, column_stack, cumsum, diff, exp,
+                   int64, mean, percentile, pi, savetxt, searchsorted, sqrt)
+from numpy.fft import fftfreq, irfft2, rfft2
+from numpy.random import default_rng
+from .coreExceptions import StorageError
+from .demWindow import getDEMWindow
+
+PERCENTILES = (5, 50, 95)
+DEFAULT_ENSEMBLE_BATCH_BYTES = 256 * 1024 * 1024
+
+UncertaintyBands = namedtuple('UncertaintyBands', ['percentiles',
+                                                   'areas',
+                                                   'volumes',
+                                                   'realizations'])
+
+def calculateErrorFilter (shape, correlationCells):
+    '''
+    returns the Gaussian filter, in the frequency domain, that correlates
+    white noise over the correlation length (the standard deviation of
+    the Gaussian kernel, in cells), and the standard deviation of the
+    filtered unit white noise
+    '''
+    rowFrequencies = fftfreq(shape[0])[:, None] ** 2
+    columnFrequencies = fftfreq(shape[1])[None, :] ** 2
+    fullFilter = exp(-2 * (pi * correlationCells) ** 2 * (rowFrequencies + columnFrequencies))
+
+    return fullFilter[:, :shape[1] // 2 + 1], sqrt(mean(fullFilter ** 2))
+def generateErrorFields (shape, count, rmse, correlationCells, generator):
+    '''
+    generates spatially correlated Gaussian error fields of the RMSE,
+    filtering white noise over a window padded by three correlation
+    lengths, so the periodic filter does not wrap the edges
+    '''
+    if correlationCells <= 0:
+        return generator.standard_normal((count,) + shape) * rmse
+
+    padding = int(ceil(3 * correlationCells))
+    paddedShape = (shape[0] + 2 * padding, shape[1] + 2 * padding)
+    errorFilter, filterDeviation = calculateErrorFilter(paddedShape, correlationCells)
+
+    whiteNoise = generator.standard_normal((count,) + paddedShape)
+    fields = irfft2(rfft2(whiteNoise) * errorFilter, s=paddedShape)
+
+    return fields[:, padding:padding + shape[0], padding:padding + shape[1]] * (rmse / filterDeviation)
+def countEnsembleAreas (elevations, curveElevations):
+    '''
+    counts the cells below each elevation of the curve for each
+    realization (a row of the elevations)
+    '''
+    count, numberOfBins = elevations.shape[0], len(curveElevations) + 1
+    binIndexes = searchsorted(curveElevations, elevations, side='right').astype(int64)
+    binIndexes += arange(count, dtype=int64)[:, None] * numberOfBins
+    counts = bincount(binIndexes.ravel(), minlength=count * numberOfBins)
+
+    return cumsum(counts.reshape(count, numberOfBins)[:, :-1], axis=1)
+def integrateEnsembleVolumes (areas, curveElevations):
+    '''
+    integrates the area curve of each realization as the area-height-volume
+    data is integrated
+    '''
+    return cumsum(diff(curveElevations) * (areas[:, 1:] + areas[:, :-1]) / 2, axis=1)
+def calculateEnsembleBatchSize (demWindow, validCount, paddedCells, realizations, maxMemoryMB):
+    '''
+    returns the number of realizations generated at once, so the noise,
+    its spectrum, the error fields and the perturbed elevations of the
+    batch fit the memory budget left by the DEM window (or a default
+    budget when the memory is not limited)
+    '''
+    realizationBytes = paddedCells * 8 * 4 + validCount * 8 * 3
+    if maxMemoryMB > 0:
+        windowBytes = demWindow.data.data.nbytes + demWindow.data.mask.nbytes + validCount * 8
+        batchBytes = maxMemoryMB * 1024 * 1024 - windowBytes
+    else:
+        batchBytes = DEFAULT_ENSEMBLE_BATCH_BYTES
+
+    return int(max(1, min(realizations, batchBytes // realizationBytes)))
+def computeUncertaintyBands (demSource, plan, AHV, step, rmse, correlationLength,
+                             realizations, seed=None, feedback=None, maxMemoryMB=0):
+    '''
+    computes the curves of an ensemble of realizations of the DEM window
+    perturbed by spatially correlated errors of the vertical RMSE, in
+    batches of realizations generated in memory within the memory budget,
+    at the elevations of the area-height-volume data, returning the
+    percentile bands of their areas and volumes, or None when the user
+    cancels
+    '''
+    if not plan.inMemory:
+        raise StorageError(
+            'The DEM window does not fit in the memory budget, '
+            'which the uncertainty ensemble needs'
+        )
+
+    demWindow = getDEMWindow(demSource, feedback)
+    valid = ~demWindow.data.mask
+    validElevations = demWindow.data.data[valid].astype(float)
+    curveElevations = append(AHV[:, 1], AHV[-1, 1] + step)
+    cellArea = plan.cellWidth * plan.cellHeight
+    correlationCells = correlationLength / plan.cellWidth
+
+    padding = int(ceil(3 * correlationCells)) if correlationCells > 0 else 0
+    paddedCells = (valid.shape[0] + 2 * padding) * (valid.shape[1] + 2 * padding)
+    batchSize = calculateEnsembleBatchSize(demWindow,
+                                           len(validElevations),
+                                           paddedCells,
+                                           realizations,
+                                           maxMemoryMB)
+
+    generator = default_rng(seed)
+    areas, volumes = [], []
+    for start in range(0, realizations, batchSize):
+        if feedback is not None:
+            if feedback.isCanceled():
+                break
+            feedback.setProgress(int(100 * start / realizations))
+        count = min(batchSize, realizations - start)
+        errors = generateErrorFields(valid.shape, count, rmse, correlationCells, generator)
+        batchAreas = countEnsembleAreas(validElevations + errors[:, valid], curveElevations) * cellArea
+        areas.extend(batchAreas[:, :-1])
+        volumes.extend(integrateEnsembleVolumes(batchAreas, curveElevations))
+
+    if feedback is not None and feedback.isCanceled():
+        return None
+
+    if feedback is not None:
+        feedback.pushInfo('Uncertainty ensemble of {0} realizations, RMSE of {1} m and '
+                          'correlation length of {2} m'.format(len(areas), rmse, correlationLength))
+
+    return UncertaintyBands(PERCENTILES,
+                            percentile(areas, PERCENTILES, axis=0),
+                            percentile(volumes, PERCENTILES, axis=0),
+                            len(areas))
+def saveUncertaintyData (path, npAHVData, bands):
+    '''
+    saves the area-height-volume data in a CSV file,
+    with the percentile bands of the areas and volumes
+    '''
+    header = ['Area (m²)', 'Elevation (m)', 'Volume (m³)']
+    header += ['Area P{0} (m²)'.format(value) for value in bands.percentiles]
+    header += ['Volume P{0} (m³)'.format(value) for value in bands.percentiles]
+
+    savetxt(
+            path,
+            column_stack((npAHVData, bands.areas.T, bands.volumes.T)),
+            delimiter=',',
+            header=','.join(header),
+            comments='',
+            fmt='%s'
+            )
@@ -0,0 +1,219 @@
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the area flooded by water volume, height, elevation
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+
+import os
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from numpy import nonzero, zeros
+from osgeo import gdal, osr
+from .coreExceptions import StorageError
+
+ALIGNMENT_TOLERANCE = 1e-6
+ZONE_SCAN_ROWS = 256
+MAX_CACHED_ZONE_WINDOWS = 64
+
+ZoneWindow = namedtuple('ZoneWindow', ['window',
+                                       'cells'])
+
+_zoneWindows = OrderedDict()
+_zoneWindowsLock = Lock()
+
+def clearZoneWindows ():
+    '''
+    removes all the zone windows from the cache
+    '''
+    with _zoneWindowsLock:
+        _zoneWindows.clear()
+def openZone (zonePath):
+    '''
+    opens the zone raster with GDAL
+    '''
+    zoneDS = gdal.Open(zonePath, gdal.GA_ReadOnly)
+    if zoneDS is None:
+        raise StorageError('The zone raster could not be opened: ' + zonePath)
+
+    return zoneDS
+def calculateZoneOffset (rasterDS, zoneDS):
+    '''
+    returns the column and row of the origin of the zone raster in the
+    DEM grid, checking that both grids are aligned, so the zone
+    raster is used as the mask without resampling
+    '''
+    geoTransform = rasterDS.GetGeoTransform()
+    zoneGeoTransform = zoneDS.GetGeoTransform()
+
+    if geoTransform[2] or geoTransform[4] or zoneGeoTransform[2] or zoneGeoTransform[4]:
+        raise StorageError('Rotated grids are not supported for the zone raster')
+    if (abs(zoneGeoTransform[1] - geoTransform[1]) > ALIGNMENT_TOLERANCE * abs(geoTransform[1]) or
+            abs(zoneGeoTransform[5] - geoTransform[5]) > ALIGNMENT_TOLERANCE * abs(geoTransform[5])):
+        raise StorageError(
+            'The zone raster cell size is different from the DEM cell size, '
+            'it must be on the same grid as the DEM'
+        )
+
+    columnOffset = (zoneGeoTransform[0] - geoTransform[0]) / geoTransform[1]
+    rowOffset = (zoneGeoTransform[3] - geoTransform[3]) / geoTransform[5]
+    if (abs(columnOffset - round(columnOffset)) > ALIGNMENT_TOLERANCE or
+            abs(rowOffset - round(rowOffset)) > ALIGNMENT_TOLERANCE):
+        raise StorageError(
+            'The zone raster is not aligned with the DEM grid, '
+            'it must be on the same grid as the DEM'
+        )
+
+    projection, zoneProjection = rasterDS.GetProjection(), zoneDS.GetProjection()
+    if projection and zoneProjection:
+        spatialReference = osr.SpatialReference(wkt=projection)
+        zoneSpatialReference = osr.SpatialReference(wkt=zoneProjection)
+        if not spatialReference.IsSame(zoneSpatialReference):
+            raise StorageError('The zone raster CRS is different from the DEM CRS')
+
+    return int(round(columnOffset)), int(round(rowOffset))
+def classifyZoneCells (zoneData, zoneValue, noData):
+    '''
+    returns True for the cells of the zone, the cells equal to the zone
+    value or, if it is None, the cells of the mask other than 0 and NODATA
+    '''
+    if zoneValue is not None:
+        return zoneData == zoneValue
+
+    inside = zoneData != 0
+    if noData is not None:
+        inside &= zoneData != noData
+
+    return inside
+def scanZone (zoneDS, zoneValue):
+    '''
+    reads the zone raster in strips of rows, returning the pixel bounds
+    (column, row, end column, end row) of the zone and its number of
+    cells, or None if the zone has no cells
+    '''
+    zoneBand = zoneDS.GetRasterBand(1)
+    noData = zoneBand.GetNoDataValue()
+    width, height = zoneDS.RasterXSize, zoneDS.RasterYSize
+
+    columns = zeros(width, dtype=bool)
+    startRow, endRow, cells = None, None, 0
+    for row in range(0, height, ZONE_SCAN_ROWS):
+        rows = min(ZONE_SCAN_ROWS, height - row)
+        inside = classifyZoneCells(zoneBand.ReadAsArray(0, row, width, rows), zoneValue, noData)
+        insideRows = nonzero(inside.any(axis=1))[0]
+        if len(insideRows) == 0:
+            continue
+        if startRow is None:
+            startRow = row + int(insideRows[0])
+        endRow = row + int(insideRows[-1]) + 1
+        columns |= inside.any(axis=0)
+        cells += int(inside.sum())
+
+    if startRow is None:
+        return None
+
+    insideColumns = nonzero(columns)[0]
+
+    return int(insideColumns[0]), startRow, int(insideColumns[-1]) + 1, endRow, cells
+def calculateZoneWindow (rasterDS, demSource):
+    '''
+    calculates the pixel window (column, row, width, height) of the DEM
+    that covers the cells of the zone, reusing the scan of the zone
+    raster while it is not modified
+    '''
+    try:
+        modifiedTime = os.path.getmtime(demSource.zonePath)
+    except OSError:
+        modifiedTime = None
+    key = (demSource.zonePath,
+           demSource.zoneValue,
+           modifiedTime,
+           rasterDS.GetGeoTransform(),
+           rasterDS.RasterXSize,
+           rasterDS.RasterYSize)
+
+    with _zoneWindowsLock:
+        zoneWindow = _zoneWindows.get(key)
+        if zoneWindow is not None:
+            _zoneWindows.move_to_end(key)
+            return zoneWindow
+
+    zoneDS = openZone(demSource.zonePath)
+    columnOffset, rowOffset = calculateZoneOffset(rasterDS, zoneDS)
+    bounds = scanZone(zoneDS, demSource.zoneValue)
+    if bounds is None:
+        raise StorageError('The zone raster has no cells of the zone')
+
+    startColumn = max(bounds[0] + columnOffset, 0)
+    startRow = max(bounds[1] + rowOffset, 0)
+    endColumn = min(bounds[2] + columnOffset, rasterDS.RasterXSize)
+    endRow = min(bounds[3] + rowOffset, rasterDS.RasterYSize)
+    if endColumn <= startColumn or endRow <= startRow:
+        raise StorageError(
+            "The zone don't intersects the DEM extent"
+        )
+
+    zoneWindow = ZoneWindow((startColumn, startRow, endColumn - startColumn, endRow - startRow),
+                            bounds[4])
+
+    with _zoneWindowsLock:
+        _zoneWindows[key] = zoneWindow
+        while len(_zoneWindows) > MAX_CACHED_ZONE_WINDOWS:
+            _zoneWindows.popitem(last=False)
+
+    return zoneWindow
+def readZoneMask (rasterDS, demSource, window):
+    '''
+    reads the cells of the zone raster in the pixel window of the DEM,
+    returning a boolean array that is True for the cells of the zone
+    '''
+    zoneDS = openZone(demSource.zonePath)
+    zoneBand = zoneDS.GetRasterBand(1)
+    columnOffset, rowOffset = calculateZoneOffset(rasterDS, zoneDS)
+    column, row, width, height = window
+
+    inside = zeros((height, width), dtype=bool)
+    startColumn = max(column - columnOffset, 0)
+    startRow = max(row - rowOffset, 0)
+    endColumn = min(column + width - columnOffset, zoneDS.RasterXSize)
+    endRow = min(row + height - rowOffset, zoneDS.RasterYSize)
+    if endColumn <= startColumn or endRow <= startRow:
+        return inside
+
+    zoneData = zoneBand.ReadAsArray(startColumn,
+                                    startRow,
+                                    endColumn - startColumn,
+                                    endRow - startRow)
+    maskColumn = startColumn + columnOffset - column
+    maskRow = startRow + rowOffset - row
+    inside[maskRow:maskRow + zoneData.shape[0],
+           maskColumn:maskColumn + zoneData.shape[1]] = classifyZoneCells(zoneData,
+                                                                          demSource.zoneValue,
+                                                                          zoneBand.GetNoDataValue())
+
+    return inside
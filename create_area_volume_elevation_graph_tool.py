@@ -38,14 +38,43 @@ from qgis.core import (QgsProcessingAlgorithm,
                        QgsProcessingParameterRasterLayer,
                        QgsProcessingParameterVectorLayer,
                        QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterMultipleLayers,
+                       QgsProcessingParameterRasterDestination,
                        QgsProcessingParameterNumber,
+                       QgsProcessingParameterBoolean,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingParameterFile,
+                       QgsProcessingParameterString,
+                       QgsProcessingParameterDefinition,
+                       QgsProcessingParameterEnum,
                        QgsProcessing)
-from numpy import savetxt
-from .algorithms.algorithmGraph import executePlugin
+from .algorithms.algorithmGraph import (GRAPH_FORMATS,
+                                        MAX_GRAPH_POINTS,
+                                        executeEpochs,
+                                        executePlugin,
+                                        executeStorageChange,
+                                        executeUncertainty,
+                                        writeGraph)
+from .core.curve import saveAreaHeightVolumeData
+from .core.curveStore import calculateDEMKey, upsertCurve
+from .core.demWindow import calculateWindowExtentWkt
+from .core.epochs import createEpochSources, saveEpochCurves
+from .algorithms.algorithmConfig import applyProcessingSettings
+from .algorithms.algorithmDEMWindow import (getLayersDEMSource,
+                                            getTileIndexDEMLayer,
+                                            getZoneDEMSource)
+from .core.fill import fillSinks
+from .core.plan import planExecution
+from .core.preview import PreviewLevel, createPreviewLevels
+from .core.storageChange import alignSecondDEM, saveStorageChangeData
+from .core.tileIndex import LOCATION_FIELD
+from .core.uncertainty import saveUncertaintyData
 from .exceptions.libsExceptions import (verifyNumpyLib,
-                                        verifyPlotlyLib,
-                                        verifyScipyLib)
-from .exceptions.inputExceptions import (verifyDEMInputDataValues,
+                                        verifyPlotlyLib)
+from .exceptions.inputExceptions import (verifyAreaInputExtent,
+                                         verifyAreaInputs,
+                                         verifyDEMInputs,
+                                         verifyDEMInputDataValues,
                                          verifyNumberOfFeaturesAreaInput,
                                          verifyVerticalSpacingInput)
 
@@ -68,10 +97,32 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
     # calling from the QGIS console.
 
     INPUT_DEM = 'INPUT_DEM'
+    TILE_INDEX = 'TILE_INDEX'
+    TILE_DIRECTORY = 'TILE_DIRECTORY'
+    TILE_FIELD = 'TILE_FIELD'
     AREA = 'AREA'
     VERTICAL_SPACING = 'VERTICAL_SPACING (m)'
     DATA = 'DATA'
     GRAPH = 'GRAPH'
+    GRAPH_FORMAT = 'GRAPH_FORMAT'
+    MAX_GRAPH_POINTS = 'MAX_GRAPH_POINTS'
+    MAX_MEMORY = 'MAX_MEMORY_MB'
+    AREA_RASTER = 'AREA_RASTER'
+    ZONE = 'ZONE'
+    PREVIEW = 'PREVIEW'
+    REFINE = 'REFINE'
+    FILL_SINKS = 'FILL_SINKS'
+    FILLED_VOLUME = 'FILLED_VOLUME'
+    CURVE_STORE = 'CURVE_STORE'
+    RESERVOIR_ID = 'RESERVOIR_ID'
+    UNCERTAINTY_RMSE = 'UNCERTAINTY_RMSE'
+    CORRELATION_LENGTH = 'CORRELATION_LENGTH'
+    REALIZATIONS = 'REALIZATIONS'
+    RANDOM_SEED = 'RANDOM_SEED'
+    SECOND_DEM = 'SECOND_DEM'
+    DIFFERENCE = 'DIFFERENCE'
+    EPOCH_DEMS = 'EPOCH_DEMS'
+    EPOCH_BANDS = 'EPOCH_BANDS'
 
 
     def initAlgorithm(self, config):
@@ -86,6 +137,59 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
             QgsProcessingParameterRasterLayer(
                 self.INPUT_DEM,
                 self.tr('DEM'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.TILE_INDEX,
+                self.tr('DEM tile index (footprints of the tiles, replaces the DEM)'),
+                types = [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.TILE_DIRECTORY,
+                self.tr('DEM tile directory (indexed once, replaces the DEM)'),
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True
+            )
+        )
+
+        tileFieldParameter = QgsProcessingParameterString(
+                self.TILE_FIELD,
+                self.tr('Tile index path field'),
+                defaultValue=LOCATION_FIELD
+            )
+        tileFieldParameter.setFlags(tileFieldParameter.flags() |
+                                    QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tileFieldParameter)
+
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.SECOND_DEM,
+                self.tr('Second DEM (storage change from the DEM to it)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.EPOCH_DEMS,
+                self.tr('Epoch DEMs (curves of the DEM and of each one)'),
+                layerType=QgsProcessing.TypeRaster,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.EPOCH_BANDS,
+                self.tr('Every band of the DEM is an epoch'),
+                defaultValue=False
             )
         )
 
@@ -94,7 +198,25 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
                 self.AREA,
                 self.tr('Area'),
                 defaultValue=None,
-                types = [QgsProcessing.TypeVectorPolygon]
+                types = [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.AREA_RASTER,
+                self.tr('Area raster (mask or zone raster on the DEM grid, replaces the area)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.ZONE,
+                self.tr('Zone value (the cells other than 0 and NODATA if empty)'),
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True
             )
         )
 
@@ -107,6 +229,78 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        maxMemoryParameter = QgsProcessingParameterNumber(
+                self.MAX_MEMORY,
+                'Maximum memory (in MB, 0 for no limit)',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        maxMemoryParameter.setFlags(maxMemoryParameter.flags() |
+                                    QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(maxMemoryParameter)
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.FILL_SINKS,
+                self.tr('Fill the sinks of the DEM in the area'),
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.UNCERTAINTY_RMSE,
+                'DEM vertical RMSE for the uncertainty bands (in meters, 0 for no bands)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0,
+                minValue=0
+            )
+        )
+
+        correlationLengthParameter = QgsProcessingParameterNumber(
+                self.CORRELATION_LENGTH,
+                'Correlation length of the DEM error (in meters, 0 for uncorrelated)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0,
+                minValue=0
+            )
+        realizationsParameter = QgsProcessingParameterNumber(
+                self.REALIZATIONS,
+                'Number of realizations of the DEM error',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=100,
+                minValue=2
+            )
+        randomSeedParameter = QgsProcessingParameterNumber(
+                self.RANDOM_SEED,
+                'Random seed of the DEM error (random if empty)',
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True,
+                minValue=0
+            )
+        for parameter in (correlationLengthParameter,
+                          realizationsParameter,
+                          randomSeedParameter):
+            parameter.setFlags(parameter.flags() |
+                               QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(parameter)
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PREVIEW,
+                self.tr('Fast preview from the DEM overviews'),
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.REFINE,
+                self.tr('Refine the preview progressively to full resolution'),
+                defaultValue=False
+            )
+        )
 
         # We add a feature sink in which to store our processed features (this
         # usually takes the form of a newly created vector layer when the
@@ -124,7 +318,62 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
             QgsProcessingParameterFileDestination(
                 self.GRAPH,
                 self.tr('Graph'),
-                fileFilter='HTML files (*.html)'
+                fileFilter='HTML files (*.html);;JSON files (*.json)'
+            )
+        )
+
+        graphFormatParameter = QgsProcessingParameterEnum(
+                self.GRAPH_FORMAT,
+                self.tr('Graph format'),
+                options=['HTML with plotly.js embedded',
+                         'HTML sharing plotly.js with the graphs of its folder',
+                         'JSON figure'],
+                defaultValue=0
+            )
+        maxGraphPointsParameter = QgsProcessingParameterNumber(
+                self.MAX_GRAPH_POINTS,
+                self.tr('Maximum points of each curve of the graph (0 for all)'),
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=MAX_GRAPH_POINTS,
+                minValue=0
+            )
+        for parameter in (graphFormatParameter,
+                          maxGraphPointsParameter):
+            parameter.setFlags(parameter.flags() |
+                               QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(parameter)
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.RESERVOIR_ID,
+                self.tr('Reservoir id in the curve store (the area layer name if empty)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.CURVE_STORE,
+                self.tr('Curve store'),
+                fileFilter='GeoPackage files (*.gpkg)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterDestination(
+                self.DIFFERENCE,
+                self.tr('DEM difference (second DEM minus DEM)'),
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addOutput(
+            QgsProcessingOutputNumber(
+                self.FILLED_VOLUME,
+                self.tr('Filled volume (m3)')
             )
         )
 
@@ -151,44 +400,341 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
                                                         self.VERTICAL_SPACING,
                                                         context
                                                         )
+        zoneInput = self.parameterAsRasterLayer(
+                                                parameters,
+                                                self.AREA_RASTER,
+                                                context
+                                                )
+        zoneValue = None
+        if parameters.get(self.ZONE) not in (None, ''):
+            zoneValue = self.parameterAsInt(
+                                            parameters,
+                                            self.ZONE,
+                                            context
+                                            )
+        maxMemoryInput = self.parameterAsInt(
+                                             parameters,
+                                             self.MAX_MEMORY,
+                                             context
+                                             )
+        previewInput = self.parameterAsBool(
+                                            parameters,
+                                            self.PREVIEW,
+                                            context
+                                            )
+        refineInput = self.parameterAsBool(
+                                           parameters,
+                                           self.REFINE,
+                                           context
+                                           )
+        fillSinksInput = self.parameterAsBool(
+                                              parameters,
+                                              self.FILL_SINKS,
+                                              context
+                                              )
+        uncertaintyRmseInput = self.parameterAsDouble(
+                                                      parameters,
+                                                      self.UNCERTAINTY_RMSE,
+                                                      context
+                                                      )
+        correlationLengthInput = self.parameterAsDouble(
+                                                        parameters,
+                                                        self.CORRELATION_LENGTH,
+                                                        context
+                                                        )
+        realizationsInput = self.parameterAsInt(
+                                                parameters,
+                                                self.REALIZATIONS,
+                                                context
+                                                )
+        randomSeedInput = None
+        if parameters.get(self.RANDOM_SEED) not in (None, ''):
+            randomSeedInput = self.parameterAsInt(
+                                                  parameters,
+                                                  self.RANDOM_SEED,
+                                                  context
+                                                  )
+        secondDemLayer = self.parameterAsRasterLayer(
+                                                     parameters,
+                                                     self.SECOND_DEM,
+                                                     context
+                                                     )
+        differencePath = self.parameterAsOutputLayer(
+                                                     parameters,
+                                                     self.DIFFERENCE,
+                                                     context
+                                                     )
+        epochLayers = self.parameterAsLayerList(
+                                                parameters,
+                                                self.EPOCH_DEMS,
+                                                context
+                                                )
+        epochBandsInput = self.parameterAsBool(
+                                               parameters,
+                                               self.EPOCH_BANDS,
+                                               context
+                                               )
+        graphFormatInput = GRAPH_FORMATS[self.parameterAsEnum(
+                                                              parameters,
+                                                              self.GRAPH_FORMAT,
+                                                              context
+                                                              )]
+        maxGraphPointsInput = self.parameterAsInt(
+                                                  parameters,
+                                                  self.MAX_GRAPH_POINTS,
+                                                  context
+                                                  )
         # Compute the number of steps to display within the progress bar and
         # get features from source
 
+        tileIndexInput = self.parameterAsVectorLayer(
+                                                     parameters,
+                                                     self.TILE_INDEX,
+                                                     context
+                                                     )
+        tileDirectoryInput = self.parameterAsFile(
+                                                  parameters,
+                                                  self.TILE_DIRECTORY,
+                                                  context
+                                                  )
+        tileFieldInput = self.parameterAsString(
+                                                parameters,
+                                                self.TILE_FIELD,
+                                                context
+                                                ) or LOCATION_FIELD
+
         verifyNumpyLib()
-        verifyScipyLib()
         verifyPlotlyLib()
 
-        verifyVerticalSpacingInput(verticalSpacingInput)
-        verifyDEMInputDataValues(demLayer, areaInput)
-        verifyNumberOfFeaturesAreaInput(areaInput)
+        applyProcessingSettings(maxMemoryInput)
 
-        AHV, graph = executePlugin(demLayer,
-                                    areaInput,
-                                    verticalSpacingInput)
+        verifyVerticalSpacingInput(verticalSpacingInput)
+        verifyAreaInputs(areaInput, zoneInput)
+        verifyDEMInputs(demLayer, tileIndexInput, tileDirectoryInput)
+        if areaInput is not None:
+            verifyNumberOfFeaturesAreaInput(areaInput)
+        if demLayer is None:
+            demLayer = getTileIndexDEMLayer(tileIndexInput,
+                                            tileDirectoryInput,
+                                            tileFieldInput,
+                                            areaInput,
+                                            zoneInput,
+                                            feedback)
+        if areaInput is not None:
+            verifyAreaInputExtent(demLayer, areaInput)
+        if zoneInput is not None:
+            demSource = getZoneDEMSource(demLayer, zoneInput, zoneValue, feedback)
+        else:
+            demSource = getLayersDEMSource(demLayer, areaInput, feedback)
+        plan = planExecution(demSource, maxMemoryInput, feedback)
+        if epochLayers or epochBandsInput:
+            return self.processEpochs(parameters,
+                                      context,
+                                      feedback,
+                                      demLayer,
+                                      areaInput,
+                                      demSource,
+                                      plan,
+                                      epochLayers,
+                                      epochBandsInput,
+                                      verticalSpacingInput,
+                                      graphFormatInput,
+                                      maxGraphPointsInput)
+        if secondDemLayer is not None:
+            return self.processStorageChange(parameters,
+                                             context,
+                                             feedback,
+                                             demLayer,
+                                             areaInput,
+                                             demSource,
+                                             plan,
+                                             secondDemLayer,
+                                             verticalSpacingInput,
+                                             differencePath,
+                                             graphFormatInput,
+                                             maxGraphPointsInput)
+        # the NODATA check reads the DEM window, so the fast preview
+        # checks its coarsest level instead when the sinks are not filled
+        if fillSinksInput or not previewInput:
+            verifyDEMInputDataValues(demSource, plan, feedback)
+        filledVolume = 0
+        if fillSinksInput:
+            demSource, filledVolume = fillSinks(demSource, plan, feedback)
+            plan = planExecution(demSource, maxMemoryInput)
+        levels = [PreviewLevel(1, demSource, plan)]
+        if previewInput:
+            levels = createPreviewLevels(demSource,
+                                         plan,
+                                         refineInput,
+                                         feedback,
+                                         maxMemoryInput)
+            if not fillSinksInput:
+                verifyDEMInputDataValues(levels[0].demSource, levels[0].plan, feedback)
+
+        AHV, graph = executePlugin(demSource,
+                                    plan,
+                                    levels,
+                                    verticalSpacingInput,
+                                    feedback,
+                                    maxGraphPointsInput)
 
         areaHeightVolumeDataPath = self.parameterAsFileOutput(parameters,
                                                                 self.DATA,
                                                                 context)
 
-        savetxt(
-                areaHeightVolumeDataPath,
-                AHV,
-                delimiter=',',
-                header='Area (m²),Elevation (m),Volume (m³)',
-                comments='',
-                fmt='%s'
-                )
+        if uncertaintyRmseInput > 0:
+            bands, graph = executeUncertainty(levels,
+                                              AHV,
+                                              verticalSpacingInput,
+                                              uncertaintyRmseInput,
+                                              correlationLengthInput,
+                                              realizationsInput,
+                                              randomSeedInput,
+                                              feedback,
+                                              maxGraphPointsInput,
+                                              maxMemoryInput)
+            if bands is None:
+                return {}
+            saveUncertaintyData(areaHeightVolumeDataPath, AHV, bands)
+        else:
+            saveAreaHeightVolumeData(areaHeightVolumeDataPath, AHV)
 
         graphPath = self.parameterAsFileOutput(parameters,
                                                 self.GRAPH,
                                                 context)
 
-        graph.write_html(graphPath)
+        writeGraph(graph, graphPath, graphFormatInput)
+
+        curveStorePath = self.parameterAsFileOutput(parameters,
+                                                    self.CURVE_STORE,
+                                                    context)
+        if curveStorePath and levels[-1].factor > 1:
+            feedback.pushWarning('The curve of the preview is not stored in the '
+                                 'curve store, refine it to full resolution')
+        elif curveStorePath:
+            reservoirId = self.parameterAsString(parameters,
+                                                 self.RESERVOIR_ID,
+                                                 context) or (areaInput or zoneInput).name()
+            if areaInput is not None:
+                geometryWkt, projection = demSource.geometryWkt, plan.projection
+            else:
+                geometryWkt = calculateWindowExtentWkt(plan.geoTransform,
+                                                       plan.window[2],
+                                                       plan.window[3])
+                projection = plan.projection
+                feedback.pushInfo('The extent of the zone is stored as the reservoir polygon')
+            upsertCurve(curveStorePath,
+                        reservoirId,
+                        calculateDEMKey(demLayer.source(), fillSinksInput),
+                        verticalSpacingInput,
+                        geometryWkt,
+                        projection,
+                        AHV)
+            feedback.pushInfo('Curve of the reservoir ' + reservoirId +
+                              ' stored in ' + curveStorePath)
+
+        return {self.FILLED_VOLUME:filledVolume,
+                self.DATA:areaHeightVolumeDataPath,
+                self.GRAPH:graphPath,
+                self.CURVE_STORE:curveStorePath}
+
+
+
+    def processEpochs(self, parameters, context, feedback, demLayer, areaInput,
+                      demSource, plan, epochLayers, epochBandsInput,
+                      verticalSpacingInput, graphFormatInput, maxGraphPointsInput):
+        """
+        Computes the curves of the epochs, the bands of the DEM or the DEM
+        and the epoch DEMs, on common bins with the mask of the area read
+        once, instead of the curve of the DEM.
+        """
+        for parameterName, option in ((self.FILL_SINKS, 'Fill sinks'),
+                                      (self.PREVIEW, 'Fast preview'),
+                                      (self.UNCERTAINTY_RMSE, 'DEM vertical RMSE'),
+                                      (self.SECOND_DEM, 'Second DEM'),
+                                      (self.CURVE_STORE, 'Curve store')):
+            if parameters.get(parameterName) not in (None, '', False, 0):
+                feedback.pushWarning('The ' + option + ' option is not used '
+                                     'in the epochs mode')
+
+        verifyDEMInputDataValues(demSource, plan, feedback)
+
+        if epochBandsInput:
+            bands = list(range(1, demLayer.bandCount() + 1))
+            epochSources = createEpochSources(demSource, plan, bands=bands)
+            epochNames = [demLayer.bandName(band) or 'Band ' + str(band) for band in bands]
+        else:
+            epochLayers = [layer for layer in epochLayers if layer.source() != demLayer.source()]
+            epochSources = createEpochSources(demSource,
+                                              plan,
+                                              [layer.source() for layer in epochLayers])
+            epochNames = [demLayer.name()] + [layer.name() for layer in epochLayers]
+        feedback.pushInfo(str(len(epochSources)) + ' epochs')
+
+        epochCurves, graph = executeEpochs(demSource,
+                                           plan,
+                                           epochSources,
+                                           epochNames,
+                                           verticalSpacingInput,
+                                           feedback,
+                                           maxGraphPointsInput)
+        if epochCurves is None:
+            return {}
+
+        epochDataPath = self.parameterAsFileOutput(parameters,
+                                                   self.DATA,
+                                                   context)
+        saveEpochCurves(epochDataPath, epochNames, epochCurves)
 
-        return {self.DATA:areaHeightVolumeDataPath,
+        graphPath = self.parameterAsFileOutput(parameters,
+                                               self.GRAPH,
+                                               context)
+        writeGraph(graph, graphPath, graphFormatInput)
+
+        return {self.DATA:epochDataPath,
                 self.GRAPH:graphPath}
 
+    def processStorageChange(self, parameters, context, feedback, demLayer, areaInput,
+                             demSource, plan, secondDemLayer, verticalSpacingInput,
+                             differencePath, graphFormatInput, maxGraphPointsInput):
+        """
+        Computes the curves of both DEMs on common bins and the capacity
+        loss between them, instead of the curve of the DEM.
+        """
+        for parameterName, option in ((self.FILL_SINKS, 'Fill sinks'),
+                                      (self.PREVIEW, 'Fast preview'),
+                                      (self.UNCERTAINTY_RMSE, 'DEM vertical RMSE'),
+                                      (self.CURVE_STORE, 'Curve store')):
+            if parameters.get(parameterName) not in (None, '', False, 0):
+                feedback.pushWarning('The ' + option + ' option is not used '
+                                     'in the storage change mode')
+
+        verifyDEMInputDataValues(demSource, plan, feedback)
+        secondSource = alignSecondDEM(demSource, plan, secondDemLayer.source())
+
+        storageChange, graph = executeStorageChange(demSource,
+                                                    secondSource,
+                                                    plan,
+                                                    verticalSpacingInput,
+                                                    differencePath,
+                                                    feedback,
+                                                    maxGraphPointsInput)
+        if storageChange is None:
+            return {}
+
+        storageChangeDataPath = self.parameterAsFileOutput(parameters,
+                                                           self.DATA,
+                                                           context)
+        saveStorageChangeData(storageChangeDataPath, storageChange)
+
+        graphPath = self.parameterAsFileOutput(parameters,
+                                               self.GRAPH,
+                                               context)
+        writeGraph(graph, graphPath, graphFormatInput)
 
+        return {self.DATA:storageChangeDataPath,
+                self.GRAPH:graphPath,
+                self.DIFFERENCE:differencePath}
 
     def name(self):
         """
@@ -246,12 +792,32 @@ class createAreaVolumeElevationGraphAlgorithm(QgsProcessingAlgorithm):
                 </p>
                 <p>
         <strong>DEM: </strong>The raster containing the band with the altimetry of the area. 
+        <strong>DEM tile index: </strong>Optional footprint layer of the DEM tiles, with the path of each tile in the tile index path field (location by default), used instead of the DEM: only the tiles that intersect the area are mosaicked and read.
+        <strong>DEM tile directory: </strong>Optional directory of DEM tiles, used instead of the DEM: it is scanned once into a cached tile index (scanned again only when its tiles change), and only the tiles that intersect the area are read.
         <strong>Area: </strong>The polygon containing the area that the Area-Elevation-Volume curves will be calculated.
+        <strong>Area raster: </strong>Optional mask (cells other than 0 and NODATA) or integer zone raster on the same grid as the DEM, used instead of the area polygon directly as the mask, without rasterization or resampling.
+        <strong>Zone value: </strong>The value of the cells of the zone in the area raster (all the cells other than 0 and NODATA if empty).
         <strong>Vertical step: </strong>The elevation differential for calculating Area-Elevation-Volume curves.
+        <strong>Fill sinks: </strong>Fills the sinks of the DEM in the area with a priority-flood before computing (tile by tile when the area does not fit in the memory budget), reporting the filled volume.
+        <strong>Maximum memory: </strong>The memory budget used to choose between processing the DEM window in memory or streaming it from the disk in tiles (0 for no limit).
+        <strong>Fast preview: </strong>Computes from the overview pyramid of the DEM (temporary overviews are built when it has none) at around 250000 cells, reporting the error bound of the area against the full resolution.
+        <strong>Refine: </strong>After the preview, computes again halving the cell size up to the full resolution, reporting the results of each level.
+        <strong>Epoch DEMs: </strong>Optional list of DEMs of other epochs (e.g. annual bathymetric surveys). The curves of the DEM and of each epoch are computed on common bins, reading the mask of the area once and the epochs in parallel (the DEMs on other grids are resampled on the fly), into a long format data table (with the epoch of each row) and a single graph with the curves overlaid.
+        <strong>Every band of the DEM is an epoch: </strong>Computes the curves of every band of the DEM as epochs, as the epoch DEMs.
+        <strong>Second DEM: </strong>Optional second survey of the area (e.g. a recent bathymetry over the pre-impoundment DEM). Both DEMs are read window by window on the grid of the DEM (the second one is resampled on the fly only if the grids differ), and the data has the curves of both on common bins and the capacity loss of each elevation, from the cells valid in both.
+        <strong>DEM difference: </strong>Optional raster of the second DEM minus the DEM, written in the same pass in the storage change mode.
+        <strong>DEM vertical RMSE: </strong>When greater than 0, computes an ensemble of curves of the DEM perturbed by spatially correlated Gaussian errors of this RMSE (generated in memory, without writing rasters), adding their 5th, 50th and 95th percentile bands to the data and the graph.
+        <strong>Correlation length: </strong>The standard deviation, in meters, of the Gaussian filter that correlates the DEM errors (advanced, 0 for uncorrelated errors).
+        <strong>Number of realizations: </strong>The number of curves of the ensemble (advanced).
+        <strong>Random seed: </strong>The seed of the DEM errors, for reproducible bands (advanced, random if empty).
         <strong>Data: </strong>The path with the data from each point used to generate the Area-Elevation-Volume curves.
         <strong>Graph: </strong>The path to Area-Elevation-Volume graph.
-        The raster and the area needs be in projected CRS.
-        The DEM needs to be hydrologically consistent (no sinks).
+        <strong>Graph format: </strong>An HTML file with plotly.js embedded (about 3.5 MB), an HTML file that loads the plotly.js file written once in its folder and shared by all the graphs of the folder, or only the JSON of the figure.
+        <strong>Maximum points of each curve of the graph: </strong>Curves with more points are decimated preserving their shape (largest-triangle-three-buckets) and long curves are drawn with WebGL. The data is not decimated.
+        <strong>Reservoir id: </strong>The id of the reservoir in the curve store (the area layer name if empty).
+        <strong>Curve store: </strong>Optional GeoPackage where the area polygon and the curve are inserted or replaced, keyed by reservoir id, DEM and step, to be queried by the Query curve store tool.
+        The raster can be in a projected CRS or in a geographic CRS, whose window is projected on the fly to a local equal-area projection, in which the outputs are written. The area is transformed to the CRS of the raster.
+        The DEM needs to be hydrologically consistent (no sinks), or the sinks must be filled with the Fill sinks option.
         Its recommended that the vertical step be 1.
                 </p>
             </body>
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation Area by water volume, height, elevation 
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (QgsCoordinateReferenceSystem,
+                       QgsProcessing,
+                       QgsProcessingAlgorithm,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingParameterDefinition,
+                       QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterNumber,
+                       QgsProcessingParameterRasterLayer,
+                       QgsProcessingParameterVectorDestination,
+                       QgsProcessingParameterVectorLayer,
+                       QgsWkbTypes)
+from .algorithms.algorithmConfig import applyProcessingSettings
+from .algorithms.algorithmDEMWindow import (getExtentDEMSource,
+                                            getLayersDEMSource,
+                                            getZoneDEMSource)
+from .algorithms.algorithmDepressions import createFields, executePlugin
+from .core.plan import planExecution
+from .exceptions.libsExceptions import verifyNumpyLib
+from .exceptions.inputExceptions import (verifyAreaInputExtent,
+                                         verifyDEMInputDataValues,
+                                         verifyNumberOfFeaturesAreaInput,
+                                         verifyVerticalSpacingInput)
+
+class createDepressionInventoryAlgorithm(QgsProcessingAlgorithm):
+    """
+    Finds every closed depression of the DEM, in the area or in the
+    whole DEM, with a single priority-flood pass, returning the polygon
+    of each depression with its spill elevation and maximum storage
+    and, optionally, its Area-Elevation-Volume curve.
+    """
+
+    INPUT_DEM = 'INPUT_DEM'
+    AREA = 'DRAINAGE_AREA'
+    AREA_RASTER = 'AREA_RASTER'
+    ZONE = 'ZONE'
+    VERTICAL_SPACING = 'VERTICAL SPACING (m)'
+    MIN_DEPTH = 'MIN_DEPTH'
+    MAX_MEMORY = 'MAX_MEMORY_MB'
+    CURVES = 'CURVES'
+    DEPRESSIONS = 'DEPRESSIONS'
+    NUMBER_OF_DEPRESSIONS = 'NUMBER_OF_DEPRESSIONS'
+    TOTAL_STORAGE = 'TOTAL_STORAGE'
+
+    def initAlgorithm(self, config):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.INPUT_DEM,
+                self.tr('DEM'),
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.AREA,
+                self.tr('Area (the whole DEM if empty)'),
+                defaultValue=None,
+                types = [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.AREA_RASTER,
+                self.tr('Area raster (mask or zone raster on the DEM grid, replaces the area)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.ZONE,
+                self.tr('Zone value (the cells other than 0 and NODATA if empty)'),
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.VERTICAL_SPACING,
+                'Vertical step (in meters)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue='1.00'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MIN_DEPTH,
+                'Minimum depth (in meters)',
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                defaultValue='0.50'
+            )
+        )
+
+        maxMemoryParameter = QgsProcessingParameterNumber(
+                self.MAX_MEMORY,
+                'Maximum memory (in MB, 0 for no limit)',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        maxMemoryParameter.setFlags(maxMemoryParameter.flags() |
+                                    QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(maxMemoryParameter)
+
+        self.addParameter(
+            QgsProcessingParameterVectorDestination(
+                self.DEPRESSIONS,
+                self.tr('Depressions')
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.CURVES,
+                self.tr('Depression curves'),
+                fileFilter='CSV files (*.csv)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addOutput(
+            QgsProcessingOutputNumber(
+                self.NUMBER_OF_DEPRESSIONS,
+                self.tr('Number of depressions')
+            )
+        )
+
+        self.addOutput(
+            QgsProcessingOutputNumber(
+                self.TOTAL_STORAGE,
+                self.tr('Total storage (m3)')
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+        demLayer = self.parameterAsRasterLayer(
+                                             parameters,
+                                             self.INPUT_DEM,
+                                             context
+                                             )
+        areaInput = self.parameterAsVectorLayer(
+                                                parameters,
+                                                self.AREA,
+                                                context
+                                                )
+        zoneInput = self.parameterAsRasterLayer(
+                                                parameters,
+                                                self.AREA_RASTER,
+                                                context
+                                                )
+        zoneValue = None
+        if parameters.get(self.ZONE) not in (None, ''):
+            zoneValue = self.parameterAsInt(
+                                            parameters,
+                                            self.ZONE,
+                                            context
+                                            )
+        verticalSpacingInput = self.parameterAsDouble(
+                                                      parameters,
+                                                      self.VERTICAL_SPACING,
+                                                      context
+                                                      )
+        minDepthInput = self.parameterAsDouble(
+                                               parameters,
+                                               self.MIN_DEPTH,
+                                               context
+                                               )
+        maxMemoryInput = self.parameterAsInt(
+                                             parameters,
+                                             self.MAX_MEMORY,
+                                             context
+                                             )
+        curvesPath = self.parameterAsFileOutput(
+                                                parameters,
+                                                self.CURVES,
+                                                context
+                                                )
+
+        verifyNumpyLib()
+
+        applyProcessingSettings(maxMemoryInput)
+
+        verifyVerticalSpacingInput(verticalSpacingInput)
+        if zoneInput is not None:
+            demSource = getZoneDEMSource(demLayer, zoneInput, zoneValue, feedback)
+        elif areaInput is not None:
+            verifyNumberOfFeaturesAreaInput(areaInput)
+            verifyAreaInputExtent(demLayer, areaInput)
+            demSource = getLayersDEMSource(demLayer, areaInput, feedback)
+        else:
+            demSource = getExtentDEMSource(demLayer, feedback)
+        plan = planExecution(demSource, maxMemoryInput, feedback)
+        if zoneInput is not None or areaInput is not None:
+            verifyDEMInputDataValues(demSource, plan, feedback)
+
+        (sink, dest_id) = self.parameterAsSink(parameters,
+                                               self.DEPRESSIONS,
+                                               context,
+                                               createFields(),
+                                               QgsWkbTypes.MultiPolygon,
+                                               QgsCoordinateReferenceSystem.fromWkt(plan.projection),
+                                               layerOptions=["ENCODING=UTF-8"])
+
+        depressions, featureCount = executePlugin(demSource,
+                                                  plan,
+                                                  verticalSpacingInput,
+                                                  minDepthInput,
+                                                  sink,
+                                                  curvesPath,
+                                                  feedback)
+        if depressions is None:
+            return {}
+
+        return {self.DEPRESSIONS:dest_id,
+                self.CURVES:curvesPath,
+                self.NUMBER_OF_DEPRESSIONS:featureCount,
+                self.TOTAL_STORAGE:sum(depression.volume for depression in depressions)}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Depression inventory'
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return ''
+
+    def icon(self):
+        """
+        Should return a QIcon which is used for your provider inside
+        the Processing toolbox.
+        """
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def shortHelpString(self):
+        """
+        Returns a localised short help string for the algorithm.
+        """
+        return self.tr("""
+        <html>
+            <body>
+                <p>
+        This tool finds every closed depression of the DEM (the potential storage sites of a basin) with a single priority-flood pass, returning the polygon of each depression with its spill elevation, maximum depth, area and maximum storage, and optionally the Area-Elevation-Volume curve of each one. The DEM is processed tile by tile when it does not fit in the memory budget.
+                </p>
+                <p>
+        <strong>DEM: </strong>The raster containing the band with the altimetry of the area.
+        <strong>Area: </strong>Optional polygon of the area to be screened (the whole DEM if empty). The water leaves the area at its boundary.
+        <strong>Area raster: </strong>Optional mask (cells other than 0 and NODATA) or integer zone raster on the same grid as the DEM, used instead of the area polygon.
+        <strong>Zone value: </strong>The value of the cells of the zone in the area raster (all the cells other than 0 and NODATA if empty).
+        <strong>Vertical step: </strong>The elevation differential of the curves of the depressions.
+        <strong>Minimum depth: </strong>The depressions shallower than it (e.g. the noise of the DEM) are not returned.
+        <strong>Maximum memory: </strong>The memory budget used to choose between processing the DEM window in memory or streaming it from the disk in tiles (0 for no limit).
+        <strong>Depressions: </strong>The polygons of the depressions, filled up to their spill elevation.
+        <strong>Depression curves: </strong>Optional CSV file with the Area-Elevation-Volume curve of each depression, with its id in the first column.
+        Nested depressions are returned as the depression that contains them, filled up to its spill elevation.
+        The raster can be in a projected CRS or in a geographic CRS, whose window is projected on the fly to a local equal-area projection, in which the outputs are written. The area is transformed to the CRS of the raster.
+                </p>
+            </body>
+        </html>
+                    """)
+
+    def createInstance(self):
+        return createDepressionInventoryAlgorithm()
@@ -34,18 +34,42 @@ __revision__ = '$Format:%H$'
 import os
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.PyQt.QtGui import QIcon
-from qgis.core import (QgsFeatureSink,
+from qgis.core import (QgsCoordinateReferenceSystem,
                        QgsProcessingAlgorithm,
                        QgsProcessingParameterRasterLayer,
                        QgsProcessingParameterVectorDestination,
+                       QgsProcessingParameterRasterDestination,
                        QgsProcessingParameterNumber,
+                       QgsProcessingParameterBoolean,
+                       QgsProcessingParameterPoint,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingParameterFile,
+                       QgsProcessingParameterString,
+                       QgsProcessingParameterDefinition,
                        QgsProcessingParameterEnum,
                        QgsProcessingParameterVectorLayer,
-                       QgsProcessing)
-from .algorithms.algorithmInundationArea import executePlugin
-from .exceptions.libsExceptions import (verifyNumpyLib,
-                                        verifyScipyLib)
-from .exceptions.inputExceptions import (verifyDEMInputDataValues,
+                       QgsProcessingException,
+                       QgsProcessing,
+                       QgsWkbTypes)
+from .algorithms.algorithmInundationArea import (executeMask,
+                                                 executePlugin,
+                                                 executeScenarios)
+from .algorithms.algorithmConfig import applyProcessingSettings
+from .algorithms.algorithmSink import writeFeatures
+from .algorithms.algorithmDEMWindow import (getLayersDEMSource,
+                                            getTileIndexDEMLayer,
+                                            getZoneDEMSource)
+from .core.fill import fillSinks
+from .core.plan import planExecution
+from .core.preview import PreviewLevel, createPreviewLevels
+from .core.scenarios import parseScenarioValues, readScenarioValues
+from .core.seed import computeReachSource
+from .core.tileIndex import LOCATION_FIELD
+from .exceptions.libsExceptions import verifyNumpyLib
+from .exceptions.inputExceptions import (verifyAreaInputExtent,
+                                         verifyAreaInputs,
+                                         verifyDEMInputs,
+                                         verifyDEMInputDataValues,
                                          verifyNumberOfFeaturesAreaInput,
                                          verifyVerticalSpacingInput)
 
@@ -68,6 +92,9 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
     # calling from the QGIS console.
 
     INPUT_DEM = 'INPUT_DEM'
+    TILE_INDEX = 'TILE_INDEX'
+    TILE_DIRECTORY = 'TILE_DIRECTORY'
+    TILE_FIELD = 'TILE_FIELD'
     AREA = 'DRAINAGE_AREA'
     INPUT_PARAMETER = 'INPUT_PARAMETER'
     HEIGHT_PARAMETER = 'HEIGHT (m)'
@@ -76,6 +103,23 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
     VOLUME_PARAMETER = 'VOLUME (m3)'
     VERTICAL_SPACING = 'VERTICAL SPACING (m)'
     INUNDATION_AREA = 'INUNDATION AREA'
+    MAX_MEMORY = 'MAX_MEMORY_MB'
+    AREA_RASTER = 'AREA_RASTER'
+    ZONE = 'ZONE'
+    PREVIEW = 'PREVIEW'
+    REFINE = 'REFINE'
+    FILL_SINKS = 'FILL_SINKS'
+    SEED_POINT = 'SEED_POINT'
+    FILLED_VOLUME = 'FILLED_VOLUME'
+    SCENARIO_VALUES = 'SCENARIO_VALUES'
+    SCENARIO_FILE = 'SCENARIO_FILE'
+    SCENARIO_FIELD = 'SCENARIO_FIELD'
+    DEPTH = 'DEPTH'
+    OUTPUT_MODE = 'OUTPUT_MODE'
+    MASK = 'MASK'
+    POLYGON_MODE = 'Polygon'
+    MASK_1BIT_MODE = 'Mask raster (1 bit)'
+    MASK_BYTE_MODE = 'Mask raster (byte)'
 
     def initAlgorithm(self, config):
         """
@@ -89,15 +133,69 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
             QgsProcessingParameterRasterLayer(
                 self.INPUT_DEM,
                 self.tr('DEM'),
+                optional=True
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.TILE_INDEX,
+                self.tr('DEM tile index (footprints of the tiles, replaces the DEM)'),
+                types = [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.TILE_DIRECTORY,
+                self.tr('DEM tile directory (indexed once, replaces the DEM)'),
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True
+            )
+        )
+
+        tileFieldParameter = QgsProcessingParameterString(
+                self.TILE_FIELD,
+                self.tr('Tile index path field'),
+                defaultValue=LOCATION_FIELD
+            )
+        tileFieldParameter.setFlags(tileFieldParameter.flags() |
+                                    QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tileFieldParameter)
+
         self.addParameter(
             QgsProcessingParameterVectorLayer(
                 self.AREA,
                 self.tr('Area'),
                 defaultValue=None,
-                types = [QgsProcessing.TypeVectorPolygon]
+                types = [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.AREA_RASTER,
+                self.tr('Area raster (mask or zone raster on the DEM grid, replaces the area)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.ZONE,
+                self.tr('Zone value (the cells other than 0 and NODATA if empty)'),
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterPoint(
+                self.SEED_POINT,
+                self.tr('Seed point (floods only the cells connected to it, e.g. the dam or outlet)'),
+                optional=True
             )
         )
 
@@ -125,6 +223,31 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.SCENARIO_VALUES,
+                self.tr('Scenario values (separated by commas, replaces the parameter value)'),
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.SCENARIO_FILE,
+                self.tr('Scenario values CSV file (replaces the parameter value)'),
+                extension='csv',
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.SCENARIO_FIELD,
+                self.tr('Scenario values column (the first column if empty)'),
+                optional=True
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterNumber(
                 self.VERTICAL_SPACING,
@@ -134,14 +257,89 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        maxMemoryParameter = QgsProcessingParameterNumber(
+                self.MAX_MEMORY,
+                'Maximum memory (in MB, 0 for no limit)',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        maxMemoryParameter.setFlags(maxMemoryParameter.flags() |
+                                    QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(maxMemoryParameter)
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.FILL_SINKS,
+                self.tr('Fill the sinks of the DEM in the area'),
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PREVIEW,
+                self.tr('Fast preview from the DEM overviews'),
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.REFINE,
+                self.tr('Refine the preview progressively to full resolution'),
+                defaultValue=False
+            )
+        )
+
         # We add a feature sink in which to store our processed features (this
         # usually takes the form of a newly created vector layer when the
         # algorithm is run in QGIS).
 
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.OUTPUT_MODE,
+                self.tr('Output mode'),
+                options=[
+                        self.POLYGON_MODE,
+                        self.MASK_1BIT_MODE,
+                        self.MASK_BYTE_MODE
+                        ],
+                defaultValue=0
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterVectorDestination(
                 self.INUNDATION_AREA,
-                self.tr('Inundation area')
+                self.tr('Inundation area'),
+                optional=True,
+                createByDefault=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterDestination(
+                self.MASK,
+                self.tr('Inundation mask'),
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterRasterDestination(
+                self.DEPTH,
+                self.tr('Water depth'),
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addOutput(
+            QgsProcessingOutputNumber(
+                self.FILLED_VOLUME,
+                self.tr('Filled volume (m3)')
             )
         )
 
@@ -183,47 +381,211 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
                                                         self.VERTICAL_SPACING,
                                                         context
                                                         )
+        zoneInput = self.parameterAsRasterLayer(
+                                                parameters,
+                                                self.AREA_RASTER,
+                                                context
+                                                )
+        zoneValue = None
+        if parameters.get(self.ZONE) not in (None, ''):
+            zoneValue = self.parameterAsInt(
+                                            parameters,
+                                            self.ZONE,
+                                            context
+                                            )
+        maxMemoryInput = self.parameterAsInt(
+                                             parameters,
+                                             self.MAX_MEMORY,
+                                             context
+                                             )
+        previewInput = self.parameterAsBool(
+                                            parameters,
+                                            self.PREVIEW,
+                                            context
+                                            )
+        refineInput = self.parameterAsBool(
+                                           parameters,
+                                           self.REFINE,
+                                           context
+                                           )
+        fillSinksInput = self.parameterAsBool(
+                                              parameters,
+                                              self.FILL_SINKS,
+                                              context
+                                              )
+        scenarioValuesInput = self.parameterAsString(
+                                                     parameters,
+                                                     self.SCENARIO_VALUES,
+                                                     context
+                                                     )
+        scenarioFileInput = self.parameterAsFile(
+                                                 parameters,
+                                                 self.SCENARIO_FILE,
+                                                 context
+                                                 )
+        scenarioFieldInput = self.parameterAsString(
+                                                    parameters,
+                                                    self.SCENARIO_FIELD,
+                                                    context
+                                                    )
+
+        depthPath = self.parameterAsOutputLayer(
+                                                parameters,
+                                                self.DEPTH,
+                                                context
+                                                )
+        outputMode = self.parameterAsEnum(
+                                          parameters,
+                                          self.OUTPUT_MODE,
+                                          context
+                                          )
+        maskPath = self.parameterAsOutputLayer(
+                                               parameters,
+                                               self.MASK,
+                                               context
+                                               )
+
+        tileIndexInput = self.parameterAsVectorLayer(
+                                                     parameters,
+                                                     self.TILE_INDEX,
+                                                     context
+                                                     )
+        tileDirectoryInput = self.parameterAsFile(
+                                                  parameters,
+                                                  self.TILE_DIRECTORY,
+                                                  context
+                                                  )
+        tileFieldInput = self.parameterAsString(
+                                                parameters,
+                                                self.TILE_FIELD,
+                                                context
+                                                ) or LOCATION_FIELD
 
         verifyNumpyLib()
-        verifyScipyLib()
 
-        verifyVerticalSpacingInput(verticalSpacingInput)
-        verifyDEMInputDataValues(demLayer, areaInput)
-        verifyNumberOfFeaturesAreaInput(areaInput)
+        applyProcessingSettings(maxMemoryInput)
 
-        inundationArea = executePlugin(demLayer,
-                                    areaInput,
-                                    selectedParameter,
-                                    parameterValue,
-                                    verticalSpacingInput)
+        verifyVerticalSpacingInput(verticalSpacingInput)
+        scenarios = []
+        if scenarioFileInput:
+            scenarios = readScenarioValues(scenarioFileInput, scenarioFieldInput or None)
+        elif scenarioValuesInput.strip():
+            scenarios = parseScenarioValues(scenarioValuesInput)
+        verifyAreaInputs(areaInput, zoneInput)
+        verifyDEMInputs(demLayer, tileIndexInput, tileDirectoryInput)
+        if areaInput is not None:
+            verifyNumberOfFeaturesAreaInput(areaInput)
+        if outputMode != 0:
+            if scenarios:
+                raise QgsProcessingException(
+                    'Scenario values are only available in the Polygon output mode'
+                )
+            if not maskPath:
+                raise QgsProcessingException(
+                    'The inundation mask output is required in the mask raster output modes'
+                )
+        if demLayer is None:
+            demLayer = getTileIndexDEMLayer(tileIndexInput,
+                                            tileDirectoryInput,
+                                            tileFieldInput,
+                                            areaInput,
+                                            zoneInput,
+                                            feedback)
+        if areaInput is not None:
+            verifyAreaInputExtent(demLayer, areaInput)
+        if zoneInput is not None:
+            demSource = getZoneDEMSource(demLayer, zoneInput, zoneValue, feedback)
+        else:
+            demSource = getLayersDEMSource(demLayer, areaInput, feedback)
+        plan = planExecution(demSource, maxMemoryInput, feedback)
+        seedPoint = None
+        if parameters.get(self.SEED_POINT) not in (None, ''):
+            seedPoint = self.parameterAsPoint(
+                                              parameters,
+                                              self.SEED_POINT,
+                                              context,
+                                              QgsCoordinateReferenceSystem.fromWkt(plan.projection)
+                                              )
+        # the NODATA check reads the DEM window, so the fast preview
+        # checks its coarsest level instead when the sinks are not filled
+        if fillSinksInput or not previewInput:
+            verifyDEMInputDataValues(demSource, plan, feedback)
+        filledVolume = 0
+        if fillSinksInput:
+            demSource, filledVolume = fillSinks(demSource, plan, feedback)
+            plan = planExecution(demSource, maxMemoryInput)
+        levels = [PreviewLevel(1, demSource, plan)]
+        if previewInput:
+            levels = createPreviewLevels(demSource,
+                                         plan,
+                                         refineInput,
+                                         feedback,
+                                         maxMemoryInput)
+            if not fillSinksInput:
+                verifyDEMInputDataValues(levels[0].demSource, levels[0].plan, feedback)
+        if seedPoint is not None:
+            levels = [PreviewLevel(level.factor,
+                                   computeReachSource(level.demSource,
+                                                      level.plan,
+                                                      seedPoint.x(),
+                                                      seedPoint.y(),
+                                                      feedback),
+                                   level.plan)
+                      for level in levels]
+
+        if outputMode != 0:
+            executeMask(demSource,
+                        plan,
+                        levels,
+                        selectedParameter,
+                        parameterValue,
+                        verticalSpacingInput,
+                        maskPath,
+                        1 if outputMode == 1 else 8,
+                        feedback,
+                        depthPath)
+
+            return {self.FILLED_VOLUME:filledVolume,
+                    self.MASK:maskPath,
+                    self.DEPTH:depthPath}
+
+        if scenarios:
+            feedback.pushInfo(str(len(scenarios)) + ' scenarios')
+            if depthPath:
+                feedback.pushWarning('The water depth raster is not written '
+                                     'for scenario values')
+                depthPath = None
+            inundationArea = executeScenarios(demSource,
+                                              plan,
+                                              levels,
+                                              selectedParameter,
+                                              scenarios,
+                                              verticalSpacingInput,
+                                              feedback)
+        else:
+            inundationArea = executePlugin(demSource,
+                                        plan,
+                                        levels,
+                                        selectedParameter,
+                                        parameterValue,
+                                        verticalSpacingInput,
+                                        feedback,
+                                        depthPath)
 
         (InA, dest_idb) = self.parameterAsSink(parameters,
                                               self.INUNDATION_AREA,
                                               context,
-                                              inundationArea.fields(),
-                                              inundationArea.wkbType(),
-                                              areaInput.sourceCrs(),
+                                              inundationArea.fields,
+                                              QgsWkbTypes.MultiPolygon,
+                                              inundationArea.crs,
                                               layerOptions=["ENCODING=UTF-8"])
 
-        if inundationArea.featureCount():
-            total = 100.0 / inundationArea.featureCount()
-        else:
-            total = 0
-
-        featuresInA = inundationArea.getFeatures()
-
-        for current, feature in enumerate(featuresInA):
-            # Stop the algorithm if cancel button has been clicked
-            if feedback.isCanceled():
-                break
-
-            # Add a feature in the sink
-            InA.addFeature(feature, QgsFeatureSink.FastInsert)
-
-            # Update the progress bar
-            feedback.setProgress(int(current * total))
+        writeFeatures(InA, inundationArea.features, inundationArea.featureCount, feedback)
 
-        return {self.INUNDATION_AREA:dest_idb}
+        return {self.FILLED_VOLUME:filledVolume,
+                self.INUNDATION_AREA:dest_idb,
+                self.MASK:maskPath,
+                self.DEPTH:depthPath}
 
 
 
@@ -283,13 +645,26 @@ class createInundationAreaAlgorithm(QgsProcessingAlgorithm):
                 </p>
                 <p>
         <strong>DEM: </strong>The raster containing the band with the altimetry of the area. 
+        <strong>DEM tile index: </strong>Optional footprint layer of the DEM tiles, with the path of each tile in the tile index path field (location by default), used instead of the DEM: only the tiles that intersect the area are mosaicked and read.
+        <strong>DEM tile directory: </strong>Optional directory of DEM tiles, used instead of the DEM: it is scanned once into a cached tile index (scanned again only when its tiles change), and only the tiles that intersect the area are read.
         <strong>Area: </strong>The polygon containing the area that the area-elevation-volume curves will be calculated.
+        <strong>Area raster: </strong>Optional mask (cells other than 0 and NODATA) or integer zone raster on the same grid as the DEM, used instead of the area polygon directly as the mask, without rasterization or resampling.
+        <strong>Zone value: </strong>The value of the cells of the zone in the area raster (all the cells other than 0 and NODATA if empty).
+        <strong>Seed point: </strong>Optional point (e.g. the dam or the outlet) from which the water floods: only the cells hydraulically connected to it are inundated, and the area-elevation-volume curve is computed on the connected region, so the disconnected depressions of the area are not inundated.
         <strong>Parameter: </strong>The area-elevation-volume curve parameter used to calculate the inundation area.
         <strong>Parameter Value: </strong>The value of the parameter that will be used to calculate the inundation area.
+        <strong>Scenario values: </strong>Optional list of parameter values, or CSV file with a column of values (and optionally an id column), each one generating a feature of the output with its scenario id. The curve and the DEM window are computed once and the scenarios run in parallel.
         <strong>Vertical step: </strong>The elevation differential for calculating area-elevation-volume curves.
+        <strong>Fill sinks: </strong>Fills the sinks of the DEM in the area with a priority-flood before computing (tile by tile when the area does not fit in the memory budget), reporting the filled volume.
+        <strong>Maximum memory: </strong>The memory budget used to choose between processing the DEM window in memory or streaming it from the disk in tiles (0 for no limit).
+        <strong>Fast preview: </strong>Computes from the overview pyramid of the DEM (temporary overviews are built when it has none) at around 250000 cells, reporting the error bound of the area against the full resolution.
+        <strong>Refine: </strong>After the preview, computes again halving the cell size up to the full resolution, reporting the results of each level.
+        <strong>Output mode: </strong>Polygon vectorizes the inundation area; the mask raster modes write only the 1 bit or byte raster of the inundated cells, with the water elevation, height, area and volume as metadata, skipping the slow vectorization.
         <strong>Inundation area: </strong>The path to inundation area generation.
-        The raster and the area needs be in projected CRS.
-        The DEM needs to be hydrologically consistent (no sinks).
+        <strong>Inundation mask: </strong>The path to the mask raster, required in the mask raster output modes.
+        <strong>Water depth: </strong>Optional raster of the water depth (water elevation minus DEM) in the area window, written in the same pass as the inundation area as a tiled compressed GeoTIFF with overviews.
+        The raster can be in a projected CRS or in a geographic CRS, whose window is projected on the fly to a local equal-area projection, in which the outputs are written. The area is transformed to the CRS of the raster.
+        The DEM needs to be hydrologically consistent (no sinks), or the sinks must be filled with the Fill sinks option.
                 </p>
             </body>
         </html>
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation Area by water volume, height, elevation 
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (QgsProcessingAlgorithm,
+                       QgsProcessingException,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingParameterFile,
+                       QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterString)
+from .algorithms.algorithmReport import executePlugin
+from .exceptions.libsExceptions import verifyNumpyLib, verifyPlotlyLib
+
+class createReportAlgorithm(QgsProcessingAlgorithm):
+    """
+    Renders the report of many reservoirs in one HTML document, from the
+    curves of a curve store or of a folder of curve CSV files.
+    """
+
+    CURVE_STORE = 'CURVE_STORE'
+    CURVE_FOLDER = 'CURVE_FOLDER'
+    TITLE = 'TITLE'
+    REPORT = 'REPORT'
+    NUMBER_OF_RESERVOIRS = 'NUMBER_OF_RESERVOIRS'
+
+    def initAlgorithm(self, config):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.CURVE_STORE,
+                self.tr('Curve store'),
+                extension='gpkg',
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.CURVE_FOLDER,
+                self.tr('Folder of curve CSV files or of a batch run (replaces the curve store)'),
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.TITLE,
+                self.tr('Title'),
+                defaultValue='Reservoirs report'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.REPORT,
+                self.tr('Report'),
+                fileFilter='HTML files (*.html)'
+            )
+        )
+
+        self.addOutput(QgsProcessingOutputNumber(self.NUMBER_OF_RESERVOIRS, self.tr('Number of reservoirs')))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+        curveStorePath = self.parameterAsFile(
+                                              parameters,
+                                              self.CURVE_STORE,
+                                              context
+                                              )
+        curveFolder = self.parameterAsFile(
+                                           parameters,
+                                           self.CURVE_FOLDER,
+                                           context
+                                           )
+        titleInput = self.parameterAsString(
+                                            parameters,
+                                            self.TITLE,
+                                            context
+                                            )
+        reportPath = self.parameterAsFileOutput(
+                                                parameters,
+                                                self.REPORT,
+                                                context
+                                                )
+
+        verifyNumpyLib()
+        verifyPlotlyLib()
+
+        if bool(curveStorePath) == bool(curveFolder):
+            raise QgsProcessingException(
+                'Provide either the curve store or the folder of curve CSV files!'
+            )
+
+        numberOfReservoirs = executePlugin(curveStorePath,
+                                           curveFolder,
+                                           reportPath,
+                                           titleInput,
+                                           feedback)
+        feedback.pushInfo(str(numberOfReservoirs) + ' reservoirs in the report')
+
+        return {self.REPORT:reportPath,
+                self.NUMBER_OF_RESERVOIRS:numberOfReservoirs}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Reservoirs report'
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return ''
+
+    def icon(self):
+        """
+        Should return a QIcon which is used for your provider inside
+        the Processing toolbox.
+        """
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def shortHelpString(self):
+        """
+        Returns a localised short help string for the algorithm.
+        """
+        return self.tr("""
+        <html>
+            <body>
+                <p>
+        This tool renders a single HTML report of many reservoirs, listing the minimum and maximum elevations, the maximum area and the maximum capacity of each reservoir with a thumbnail of its polygon and its Area-Elevation-Volume curve.
+                </p>
+                <p>
+        <strong>Curve store: </strong>The GeoPackage filled by the Area-Volume-Elevation graph tool, the curve with the smallest vertical step of each reservoir and its polygon being used.
+        <strong>Folder of curve CSV files or of a batch run: </strong>A folder with the Data CSV files of the Area-Volume-Elevation graph tool, named by reservoir, or the output folder of the batch runner, whose summary table gives the curve and the inundation area of each reservoir.
+        <strong>Title: </strong>The title of the report.
+        <strong>Report: </strong>The path to the HTML report. The plotly.js library is written once next to it and shared by all the curves.
+        The curves are embedded in a compact form (decimated and in integers) and plotted by the browser only when their rows are scrolled into view, so the report of thousands of reservoirs stays small and opens quickly. The columns can be sorted by clicking their headers.
+                </p>
+            </body>
+        </html>
+                    """)
+
+    def createInstance(self):
+        return createReportAlgorithm()
@@ -31,16 +31,12 @@ __copyright__ = '(C) 2024 by João Vitor Pimenta'
 
 __revision__ = '$Format:%H$'
 
-from qgis.core import QgsProcessingException
+from qgis.core import (QgsCoordinateTransform,
+                       QgsProcessingException,
+                       QgsProject)
+from ..core.coreExceptions import verifyVerticalSpacingInput
+from ..core.demWindow import mapDEMWindows
 
-def verifyVerticalSpacingInput (verticalSpacingInput):
-    '''
-    Checks if the vertical spacing is less than 0
-    '''
-    if verticalSpacingInput <=0:
-        raise QgsProcessingException(
-            'Vertical spacing must be greather than 0'
-            )
 def verifyNumberOfFeaturesAreaInput (areaInput):
     '''
     Checks whether the number of features in the area layer is only one
@@ -50,32 +46,43 @@ def verifyNumberOfFeaturesAreaInput (areaInput):
         raise QgsProcessingException(
             'The layer has more than one feature!'
         )
-def verifyDEMInputDataValues (demLayer, areaInput):
+def verifyAreaInputs (areaInput, zoneInput):
     '''
-    Checks about the elevation data values in the area
+    Checks whether the area is given either as a polygon layer
+    or as a zone raster
+    '''
+    if (areaInput is None) == (zoneInput is None):
+        raise QgsProcessingException(
+            'Provide either the area polygon or the area raster!'
+        )
+def verifyDEMInputs (demLayer, tileIndexInput, tileDirectoryInput):
+    '''
+    Checks whether the DEM is given either as a raster layer,
+    as a tile index layer or as a tile directory
+    '''
+    givenInputs = sum(1 for demInput in (demLayer, tileIndexInput, tileDirectoryInput) if demInput)
+    if givenInputs != 1:
+        raise QgsProcessingException(
+            'Provide either the DEM, the tile index or the tile directory!'
+        )
+def verifyAreaInputExtent (demLayer, areaInput):
+    '''
+    Checks the feature of the area against the DEM extent and cell size,
+    before any DEM data is read
     '''
-    demPr = demLayer.dataProvider()
-    demArray = []
     feature = next(areaInput.getFeatures())
     fGeometry = feature.geometry()
-    fBBox = fGeometry.boundingBox()
-    demBlock = demPr.block(1,fBBox,demLayer.width(),demLayer.height())
-    demNoDataValue = demBlock.noDataValue()
-
-    for j in range(demLayer.height()):
-        for k in range(demLayer.width()):
-            demArray.append((demBlock).value(j,k))
-
-    if all(x == demNoDataValue for x in demArray):
-        raise QgsProcessingException(
-            'The feature is only in NODATA values'
-            )
+    if areaInput.crs() != demLayer.crs():
+        fGeometry.transform(QgsCoordinateTransform(areaInput.crs(),
+                                                   demLayer.crs(),
+                                                   QgsProject.instance()))
 
     if fGeometry.intersects(demLayer.extent()) is False:
         raise QgsProcessingException(
             "The feature don't intersects the DEM extent"
         )
 
+    fBBox = fGeometry.boundingBox()
     demCellX = demLayer.rasterUnitsPerPixelX()
     demCellY = demLayer.rasterUnitsPerPixelY()
 
@@ -83,3 +90,16 @@ def verifyDEMInputDataValues (demLayer, areaInput):
         raise QgsProcessingException(
             'The feature is smaller than raster pixel size'
         )
+def verifyDEMInputDataValues (demSource, plan, feedback=None):
+    '''
+    Checks about the elevation data values in the area
+    '''
+    validCells = sum(mapDEMWindows(lambda demWindow: demWindow.data.count(),
+                                   demSource,
+                                   plan,
+                                   feedback))
+
+    if validCells == 0:
+        raise QgsProcessingException(
+            'The feature is only in NODATA values'
+            )
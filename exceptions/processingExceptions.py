@@ -31,67 +31,8 @@ __copyright__ = '(C) 2024 by João Vitor Pimenta'
 
 __revision__ = '$Format:%H$'
 
-from qgis.core import QgsProcessingException
-
-def verifyIfHeightValueIsInTheCurve (parameterValue,elevations,verticalSpacing):
-    '''
-    Check if the height value is on the curve
-    '''
-
-    if parameterValue < verticalSpacing:
-        raise QgsProcessingException(
-            'This value is below the minimum value of the curve: ' + str(verticalSpacing)
-            )
-    if parameterValue > (elevations[-1]-elevations[0] + verticalSpacing):
-        raise QgsProcessingException(
-            'This value is above the maximum value of the curve: ' + str(elevations[-1]-elevations[0] + verticalSpacing)
-            )
-def verifyIfElevationValueIsInTheCurve (parameterValue,elevations):
-    '''
-    Check if the elevation value is on the curve
-    '''
-
-    if parameterValue < elevations[0]:
-        raise QgsProcessingException(
-            'This value is below the minimum value of the curve: ' + str(elevations[0])
-            )
-    if parameterValue > elevations[-1]:
-        raise QgsProcessingException(
-            'This value is above the maximum value of the curve: ' + str(elevations[-1])
-            )
-def verifyIfAreaValueIsInTheCurve (parameterValue,areas):
-    '''
-    Check if the area value is on the curve
-    '''
-
-    if parameterValue < areas[0]:
-        raise QgsProcessingException(
-            'This value is below the minimum value of the curve: ' + str(areas[0])
-            )
-    if parameterValue > areas[-1]:
-        raise QgsProcessingException(
-            'This value is above the maximum value of the curve: ' + str(areas[-1])
-            )
-def verifyIfVolumeValueIsInTheCurve (parameterValue,volumes):
-    '''
-    Check if the volume value is on the curve
-    '''
-
-    if parameterValue < volumes[0]:
-        raise QgsProcessingException(
-            'This value is below the minimum value of the curve: ' + str(volumes[0])
-            )
-    if parameterValue > volumes[-1]:
-        raise QgsProcessingException(
-            'This value is above the maximum value of the curve: ' + str(volumes[-1])
-            )
-def verifyNumberOfPointsInCurve (areaHeightCurve):
-    '''
-    Checks whether there are a sufficient number of points
-    on the generated curve for numerical integration
-    '''
-
-    if len(areaHeightCurve) <= 2:
-        raise QgsProcessingException(
-            'Insufficient number of points for the Area-Volume-Elevation curve!'
-        )
+from ..core.coreExceptions import (verifyIfAreaValueIsInTheCurve,
+                                   verifyIfElevationValueIsInTheCurve,
+                                   verifyIfHeightValueIsInTheCurve,
+                                   verifyIfVolumeValueIsInTheCurve,
+                                   verifyNumberOfPointsInCurve)
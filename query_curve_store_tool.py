@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation Area by water volume, height, elevation 
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import os
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (QgsCoordinateReferenceSystem,
+                       QgsProcessingAlgorithm,
+                       QgsProcessingException,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingOutputString,
+                       QgsProcessingParameterEnum,
+                       QgsProcessingParameterFile,
+                       QgsProcessingParameterNumber,
+                       QgsProcessingParameterPoint)
+from .core.curve import (AREA_PARAMETER,
+                         ELEVATION_PARAMETER,
+                         HEIGHT_PARAMETER,
+                         VOLUME_PARAMETER,
+                         findParameter)
+from .core.curveStore import (findReservoirsAtPoint,
+                              readCurve,
+                              readCurveStoreProjection)
+
+class queryCurveStoreAlgorithm(QgsProcessingAlgorithm):
+    """
+    Finds the reservoir of the curve store that contains a point and,
+    optionally, interpolates a parameter value in its stored curve,
+    without reading any raster.
+    """
+
+    CURVE_STORE = 'CURVE_STORE'
+    POINT = 'POINT'
+    INPUT_PARAMETER = 'INPUT_PARAMETER'
+    HEIGHT_PARAMETER = HEIGHT_PARAMETER
+    ELEVATION_PARAMETER = ELEVATION_PARAMETER
+    AREA_PARAMETER = AREA_PARAMETER
+    VOLUME_PARAMETER = VOLUME_PARAMETER
+    RESERVOIR_ID = 'RESERVOIR_ID'
+    MAX_AREA = 'MAX_AREA'
+    MAX_VOLUME = 'MAX_VOLUME'
+    WATER_ELEVATION = 'WATER_ELEVATION'
+    WATER_HEIGHT = 'WATER_HEIGHT'
+    WATER_AREA = 'WATER_AREA'
+    WATER_VOLUME = 'WATER_VOLUME'
+
+    def initAlgorithm(self, config):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.CURVE_STORE,
+                self.tr('Curve store'),
+                extension='gpkg'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterPoint(
+                self.POINT,
+                self.tr('Point in the reservoir')
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                'SELECT_OPTION',
+                'Parameter',
+                options=[
+                        self.HEIGHT_PARAMETER,
+                        self.ELEVATION_PARAMETER,
+                        self.AREA_PARAMETER,
+                        self.VOLUME_PARAMETER
+                        ],
+                defaultValue=0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.INPUT_PARAMETER,
+                'Parameter value',
+                type=QgsProcessingParameterNumber.Double,
+                optional=True,
+                maxValue=float('inf')
+            )
+        )
+
+        self.addOutput(QgsProcessingOutputString(self.RESERVOIR_ID, self.tr('Reservoir id')))
+        self.addOutput(QgsProcessingOutputNumber(self.MAX_AREA, self.tr('Maximum area (m2)')))
+        self.addOutput(QgsProcessingOutputNumber(self.MAX_VOLUME, self.tr('Maximum volume (m3)')))
+        self.addOutput(QgsProcessingOutputNumber(self.WATER_ELEVATION, self.tr('Elevation (m)')))
+        self.addOutput(QgsProcessingOutputNumber(self.WATER_HEIGHT, self.tr('Height (m)')))
+        self.addOutput(QgsProcessingOutputNumber(self.WATER_AREA, self.tr('Area (m2)')))
+        self.addOutput(QgsProcessingOutputNumber(self.WATER_VOLUME, self.tr('Volume (m3)')))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+        curveStorePath = self.parameterAsFile(
+                                              parameters,
+                                              self.CURVE_STORE,
+                                              context
+                                              )
+        storeCrs = QgsCoordinateReferenceSystem.fromWkt(
+                                            readCurveStoreProjection(curveStorePath)
+                                            )
+        point = self.parameterAsPoint(
+                                      parameters,
+                                      self.POINT,
+                                      context,
+                                      storeCrs
+                                      )
+        parameterNumber = self.parameterAsEnum(
+                                               parameters,
+                                               'SELECT_OPTION',
+                                               context
+                                               )
+        selectedParameter = [
+                             self.HEIGHT_PARAMETER,
+                             self.ELEVATION_PARAMETER,
+                             self.AREA_PARAMETER,
+                             self.VOLUME_PARAMETER,
+                             ][parameterNumber]
+
+        reservoirIds = findReservoirsAtPoint(curveStorePath, point.x(), point.y())
+        if not reservoirIds:
+            raise QgsProcessingException(
+                'The point is not inside any reservoir of the curve store'
+            )
+        if len(reservoirIds) > 1:
+            feedback.pushWarning('The point is inside the reservoirs ' +
+                                 ', '.join(reservoirIds) +
+                                 ', using the first one')
+        reservoirId = reservoirIds[0]
+        dem, step, AHV = readCurve(curveStorePath, reservoirId)
+        feedback.pushInfo('Reservoir ' + reservoirId + ', curve of the DEM ' +
+                          dem + ' with step ' + str(step))
+
+        results = {self.RESERVOIR_ID:reservoirId,
+                   self.MAX_AREA:float(AHV[-1, 0]),
+                   self.MAX_VOLUME:float(AHV[-1, 2])}
+
+        if parameters.get(self.INPUT_PARAMETER) is not None:
+            parameterValue = self.parameterAsDouble(
+                                                    parameters,
+                                                    self.INPUT_PARAMETER,
+                                                    context
+                                                    )
+            waterElevation, waterHeight, waterArea, waterVolume = findParameter(AHV,
+                                                                selectedParameter,
+                                                                parameterValue,
+                                                                step)
+            results.update({self.WATER_ELEVATION:waterElevation,
+                            self.WATER_HEIGHT:waterHeight,
+                            self.WATER_AREA:waterArea,
+                            self.WATER_VOLUME:waterVolume})
+
+        return results
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Query curve store'
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return ''
+
+    def icon(self):
+        """
+        Should return a QIcon which is used for your provider inside
+        the Processing toolbox.
+        """
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def shortHelpString(self):
+        """
+        Returns a localised short help string for the algorithm.
+        """
+        return self.tr("""
+        <html>
+            <body>
+                <p>
+        This tool finds the reservoir of a curve store that contains a point and returns its maximum area and volume. If a parameter value is given, all variables relating to that parameter are interpolated in the stored Area-Elevation-Volume curve, without reading any raster.
+                </p>
+                <p>
+        <strong>Curve store: </strong>The GeoPackage filled by the Area-Volume-Elevation graph tool.
+        <strong>Point in the reservoir: </strong>The point used to find the reservoir.
+        <strong>Parameter: </strong>The area-elevation-volume curve parameter of the query.
+        <strong>Parameter Value: </strong>Optional value of the parameter to be interpolated in the curve.
+        If there is more than one curve of the reservoir, the curve with the smallest vertical step is used.
+                </p>
+            </body>
+        </html>
+                    """)
+
+    def createInstance(self):
+        return queryCurveStoreAlgorithm()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ SurfaceWaterStorage
+                                 A QGIS plugin
+ This plugin calculates the inundation Area by water volume, height, elevation 
+ or area, and the Area-Elevation-Volume graph
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2024-11-13
+        copyright            : (C) 2024 by João Vitor Pimenta
+        email                : jvpjoaopimenta@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtGui import QImage
+from qgis.PyQt.QtWidgets import (QApplication,
+                                 QDockWidget,
+                                 QDoubleSpinBox,
+                                 QFormLayout,
+                                 QLabel,
+                                 QPushButton,
+                                 QSlider,
+                                 QWidget)
+from qgis.core import (QgsCoordinateReferenceSystem,
+                       QgsCoordinateTransform,
+                       QgsMapLayerProxyModel,
+                       QgsProcessingException,
+                       QgsProject,
+                       QgsRectangle)
+from qgis.gui import QgsMapCanvasItem, QgsMapLayerComboBox
+from .algorithms.algorithmDEMWindow import getLayersDEMSource
+from .core.stage import (SLIDER_STEPS,
+                         calculateStageElevation,
+                         calculateStageValues,
+                         loadStageData,
+                         renderInundation)
+from .exceptions.inputExceptions import (verifyNumberOfFeaturesAreaInput,
+                                         verifyVerticalSpacingInput)
+
+class InundationCanvasItem(QgsMapCanvasItem):
+    """
+    Map canvas item that paints the inundated cells of the DEM window
+    over the map
+    """
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.image = None
+        self.extent = None
+        self.crs = None
+
+    def setImage(self, image, extent, crs):
+        """
+        Sets the image of the inundated cells and the extent it covers,
+        in the CRS of the DEM
+        """
+        self.image = image
+        self.extent = extent
+        self.crs = crs
+        self.updatePosition()
+        self.update()
+
+    def updatePosition(self):
+        """
+        Places the image on the extent of the DEM window,
+        called by the canvas when its extent or CRS changes
+        """
+        if self.extent is None:
+            return
+        canvasCrs = self.canvas.mapSettings().destinationCrs()
+        extent = self.extent
+        if self.crs != canvasCrs:
+            transform = QgsCoordinateTransform(self.crs, canvasCrs, QgsProject.instance())
+            extent = transform.transformBoundingBox(extent)
+        self.setRect(extent)
+
+    def paint(self, painter, option=None, widget=None):
+        if self.image is not None:
+            painter.drawImage(self.boundingRect(), self.image)
+
+class StageSliderDockWidget(QDockWidget):
+    """
+    Dock widget with a stage slider that shows the inundation area and
+    the elevation, height, area and volume of the water of each stage,
+    thresholding the DEM window kept in memory instead of running the
+    Inundation area tool again
+    """
+
+    def __init__(self, iface, parent=None):
+        super().__init__('Stage slider', parent)
+        self.iface = iface
+        self.stageData = None
+        self.crs = None
+        self.canvasItem = InundationCanvasItem(iface.mapCanvas())
+
+        self.demComboBox = QgsMapLayerComboBox()
+        self.demComboBox.setFilters(QgsMapLayerProxyModel.RasterLayer)
+        self.areaComboBox = QgsMapLayerComboBox()
+        self.areaComboBox.setFilters(QgsMapLayerProxyModel.PolygonLayer)
+        self.stepSpinBox = QDoubleSpinBox()
+        self.stepSpinBox.setDecimals(3)
+        self.stepSpinBox.setRange(0.001, 1000000)
+        self.stepSpinBox.setValue(1)
+        self.loadButton = QPushButton('Load')
+        self.stageSlider = QSlider(Qt.Horizontal)
+        self.stageSlider.setRange(0, SLIDER_STEPS)
+        self.stageSlider.setEnabled(False)
+        self.elevationLabel = QLabel('-')
+        self.heightLabel = QLabel('-')
+        self.areaLabel = QLabel('-')
+        self.volumeLabel = QLabel('-')
+
+        widget = QWidget()
+        layout = QFormLayout(widget)
+        layout.addRow('DEM', self.demComboBox)
+        layout.addRow('Area', self.areaComboBox)
+        layout.addRow('Vertical step (in meters)', self.stepSpinBox)
+        layout.addRow(self.loadButton)
+        layout.addRow('Stage', self.stageSlider)
+        layout.addRow('Elevation (m)', self.elevationLabel)
+        layout.addRow('Height (m)', self.heightLabel)
+        layout.addRow('Area (m²)', self.areaLabel)
+        layout.addRow('Volume (m³)', self.volumeLabel)
+        self.setWidget(widget)
+
+        self.loadButton.clicked.connect(self.loadStage)
+        self.stageSlider.valueChanged.connect(self.updateStage)
+        self.visibilityChanged.connect(self.canvasItem.setVisible)
+
+    def loadStage(self):
+        """
+        Reads the DEM window and computes the curve of the selected layers
+        """
+        demLayer = self.demComboBox.currentLayer()
+        areaLayer = self.areaComboBox.currentLayer()
+        if demLayer is None or areaLayer is None:
+            self.iface.messageBar().pushWarning('Stage slider',
+                                                'Select the DEM and the area layers')
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            verifyVerticalSpacingInput(self.stepSpinBox.value())
+            verifyNumberOfFeaturesAreaInput(areaLayer)
+            self.stageData = loadStageData(getLayersDEMSource(demLayer, areaLayer),
+                                           self.stepSpinBox.value())
+        except QgsProcessingException as error:
+            self.stageData = None
+            self.stageSlider.setEnabled(False)
+            self.iface.messageBar().pushWarning('Stage slider', str(error))
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self.crs = QgsCoordinateReferenceSystem.fromWkt(self.stageData.projection)
+        self.stageSlider.setEnabled(True)
+        self.updateStage(self.stageSlider.value())
+
+    def updateStage(self, position):
+        """
+        Thresholds the DEM window at the elevation of the slider position,
+        repainting the inundation area and updating the curve values
+        """
+        if self.stageData is None:
+            return
+
+        elevation = calculateStageElevation(self.stageData.AHV, position)
+        stageValues = calculateStageValues(self.stageData, elevation)
+        self.elevationLabel.setText('{0:.2f}'.format(stageValues.elevation))
+        self.heightLabel.setText('{0:.2f}'.format(stageValues.height))
+        self.areaLabel.setText('{0:.2f}'.format(stageValues.area))
+        self.volumeLabel.setText('{0:.2f}'.format(stageValues.volume))
+
+        pixels = renderInundation(self.stageData.displayData, elevation)
+        height, width = pixels.shape
+        image = QImage(pixels.tobytes(), width, height, 4 * width, QImage.Format_ARGB32).copy()
+        self.canvasItem.setImage(image, QgsRectangle(*self.stageData.extent), self.crs)
+
+    def removeCanvasItem(self):
+        """
+        Removes the inundation area from the map canvas
+        """
+        self.iface.mapCanvas().scene().removeItem(self.canvasItem)
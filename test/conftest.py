@@ -0,0 +1,19 @@
+# coding=utf-8
+"""Pytest configuration of the plugin tests.
+
+The tests of the core import it as the top level ``core`` package, from
+the plugin folder, so they run without QGIS; the tests of the QGIS
+environment are skipped when QGIS is not installed.
+"""
+
+import importlib.util
+import os
+import sys
+
+PLUGIN_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PLUGIN_FOLDER not in sys.path:
+    sys.path.insert(0, PLUGIN_FOLDER)
+
+collect_ignore = []
+if importlib.util.find_spec('qgis') is None:
+    collect_ignore += ['test_qgis_environment.py', 'test_translations.py']
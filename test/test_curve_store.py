@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Curve Store Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import pytest
+from numpy import array
+
+osr = pytest.importorskip('osgeo.osr')
+
+from core.coreExceptions import StorageError
+from core.curve import ELEVATION_PARAMETER
+from core.curveStore import (calculateDEMKey,
+                             findReservoirsAtPoint,
+                             queryStage,
+                             readCurve,
+                             readCurves,
+                             upsertCurve)
+
+GEOMETRY_WKT = 'POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))'
+CURVE = array([[1.0, 101.0, 2.0], [3.0, 102.0, 6.0], [5.0, 103.0, 12.0]])
+
+
+@pytest.fixture
+def projection():
+    """The projection (WKT) of the reservoirs."""
+    spatialReference = osr.SpatialReference()
+    spatialReference.ImportFromEPSG(31983)
+    return spatialReference.ExportToWkt()
+
+
+@pytest.fixture
+def storePath(tmp_path):
+    """The path of a curve store that does not exist yet."""
+    return str(tmp_path / 'curves.gpkg')
+
+
+def test_upsert_read_round_trip(storePath, projection):
+    """The stored curve is read back with its DEM and step."""
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+
+    dem, step, data = readCurve(storePath, 'R1')
+    assert (dem, step) == ('dem.tif', 1.0)
+    assert data.tolist() == CURVE.tolist()
+    assert findReservoirsAtPoint(storePath, 5.0, 5.0) == ['R1']
+    assert findReservoirsAtPoint(storePath, 20.0, 5.0) == []
+
+
+def test_upsert_replaces_curve(storePath, projection):
+    """Storing the curve again for the DEM and step replaces it."""
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE[:2] * 2)
+
+    _, _, data = readCurve(storePath, 'R1', 'dem.tif', 1.0)
+    assert data.tolist() == (CURVE[:2] * 2).tolist()
+    assert len(list(readCurves(storePath))) == 1
+
+
+def test_curves_by_dem_and_step(storePath, projection):
+    """The curves of other DEMs and steps are kept, the finest is read by default."""
+    filledDEM = calculateDEMKey('dem.tif', filled=True)
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+    upsertCurve(storePath, 'R1', 'dem.tif', 0.5, GEOMETRY_WKT, projection, CURVE * 2)
+    upsertCurve(storePath, 'R1', filledDEM, 1.0, GEOMETRY_WKT, projection, CURVE * 3)
+
+    assert readCurve(storePath, 'R1')[1] == 0.5
+    assert readCurve(storePath, 'R1', 'dem.tif', 1.0)[2].tolist() == CURVE.tolist()
+    assert readCurve(storePath, 'R1', filledDEM)[2].tolist() == (CURVE * 3).tolist()
+
+
+def test_curve_of_dem_before_filled_dem(storePath, projection):
+    """The curve of the DEM is read by default, even with a finer filled curve."""
+    filledDEM = calculateDEMKey('dem.tif', filled=True)
+    upsertCurve(storePath, 'R1', filledDEM, 0.5, GEOMETRY_WKT, projection, CURVE * 3)
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+
+    assert readCurve(storePath, 'R1')[:2] == ('dem.tif', 1.0)
+    assert list(readCurves(storePath))[0][1:3] == ('dem.tif', 1.0)
+
+
+def test_read_curves(storePath, projection):
+    """All the reservoirs are read in one pass with their polygons."""
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+    upsertCurve(storePath, 'R2', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE * 2)
+
+    curves = list(readCurves(storePath))
+    assert [curve[0] for curve in curves] == ['R1', 'R2']
+    assert curves[1][3].tolist() == (CURVE * 2).tolist()
+    assert curves[0][4] is not None
+
+
+def test_query_stage(storePath, projection):
+    """The stage is interpolated in the stored curve."""
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+    assert queryStage(storePath, 'R1', ELEVATION_PARAMETER, 101.5) == (101.5, 1.5, 2.0, 4.0)
+
+
+def test_missing_curve(storePath, projection):
+    """Reading a reservoir that is not stored, or a missing store, is reported."""
+    with pytest.raises(StorageError):
+        readCurve(storePath, 'R1')
+    upsertCurve(storePath, 'R1', 'dem.tif', 1.0, GEOMETRY_WKT, projection, CURVE)
+    with pytest.raises(StorageError):
+        readCurve(storePath, 'R2')
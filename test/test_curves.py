@@ -0,0 +1,128 @@
+# coding=utf-8
+"""Hypsometric and Area-Elevation-Volume Curves Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+from collections import namedtuple
+
+import pytest
+from numpy import array, arange, ma
+
+pytest.importorskip('osgeo')
+
+from core.coreExceptions import StorageError
+from core.curve import (AREA_PARAMETER,
+                        ELEVATION_PARAMETER,
+                        VOLUME_PARAMETER,
+                        calculateAreaHeightVolume,
+                        findParameter)
+from core.hypsometry import (BaseHistogram,
+                             calculateBaseStep,
+                             calculateNumberOfBins,
+                             calculateSubdivisions,
+                             countElevations,
+                             rebinHistogram)
+
+DEMWindow = namedtuple('DEMWindow', ['data'])
+
+
+def createDEMWindow(elevations, mask=False):
+    """A DEM window with the masked elevations."""
+    return DEMWindow(ma.masked_array(array(elevations, dtype=float), mask=mask))
+
+
+def test_number_of_bins():
+    """The bins cover the elevations, at least one when they are equal."""
+    assert calculateNumberOfBins(100.0, 110.0, 1.0) == 10
+    assert calculateNumberOfBins(100.0, 110.5, 1.0) == 11
+    assert calculateNumberOfBins(100.0, 100.0, 1.0) == 1
+
+
+def test_count_elevations_max_elevation():
+    """The maximum elevation is counted in the last bin."""
+    demWindow = createDEMWindow([0, 1, 2, 3, 4])
+    numberOfBins = calculateNumberOfBins(0.0, 4.0, 1.0)
+    assert countElevations(demWindow, 0.0, 1.0, numberOfBins).tolist() == [1, 1, 1, 2]
+
+
+def test_count_elevations_min_equal_max():
+    """A flat DEM window is counted in a single bin."""
+    demWindow = createDEMWindow([7, 7, 7])
+    numberOfBins = calculateNumberOfBins(7.0, 7.0, 1.0)
+    assert countElevations(demWindow, 7.0, 1.0, numberOfBins).tolist() == [3]
+
+
+def test_count_elevations_masked():
+    """The masked cells are not counted."""
+    demWindow = createDEMWindow([0, 1, 2, 3], mask=[False, True, False, False])
+    assert countElevations(demWindow, 0.0, 1.0, 3).tolist() == [1, 0, 2]
+
+
+def test_base_step():
+    """The base step subdivides the step without exceeding the bins limit."""
+    assert calculateBaseStep(0.0, 100.0, 1.0) == pytest.approx(0.1)
+    assert calculateBaseStep(0.0, 1e7, 1.0) == 1.0
+    assert calculateBaseStep(5.0, 5.0, 1.0) == 1.0
+
+
+def test_subdivisions():
+    """Only the steps aligned with and coarser than the base step are derived."""
+    baseHistogram = BaseHistogram(0.0, 4.0, 0.5, arange(8))
+    assert calculateSubdivisions(baseHistogram, 1.0) == 2
+    assert calculateSubdivisions(baseHistogram, 0.5) == 1
+    assert calculateSubdivisions(baseHistogram, 0.25) is None
+    assert calculateSubdivisions(baseHistogram, 0.75) is None
+
+
+def test_rebin_histogram():
+    """The base bins are summed into the bins of the step."""
+    baseHistogram = BaseHistogram(0.0, 4.0, 0.5, array([1, 2, 3, 4, 5, 6, 7, 8]))
+    assert rebinHistogram(baseHistogram, 1.0, 2).tolist() == [3, 7, 11, 15]
+    assert rebinHistogram(baseHistogram, 2.0, 4).tolist() == [10, 26]
+
+
+def test_rebin_histogram_partial_last_bin():
+    """The last bin of the step is completed when the base bins do not fill it."""
+    baseHistogram = BaseHistogram(0.0, 3.5, 0.5, array([1, 1, 1, 1, 1, 1, 1]))
+    assert rebinHistogram(baseHistogram, 1.0, 2).tolist() == [2, 2, 2, 1]
+
+
+def test_rebin_histogram_equals_direct_count():
+    """Rebinning the base histogram counts as reading the DEM with the step."""
+    elevations = [0.0, 0.3, 0.9, 1.2, 2.5, 2.7, 3.1, 3.9, 4.0]
+    demWindow = createDEMWindow(elevations)
+    baseCounts = countElevations(demWindow, 0.0, 0.5, calculateNumberOfBins(0.0, 4.0, 0.5))
+    baseHistogram = BaseHistogram(0.0, 4.0, 0.5, baseCounts)
+    directCounts = countElevations(demWindow, 0.0, 1.0, calculateNumberOfBins(0.0, 4.0, 1.0))
+    assert rebinHistogram(baseHistogram, 1.0, 2).tolist() == directCounts.tolist()
+
+
+def test_area_height_volume_integration():
+    """The volume is the trapezoidal integration of the area over the elevation."""
+    data = array([[1.0, 101.0], [3.0, 102.0], [5.0, 103.0], [7.0, 104.0]])
+    assert calculateAreaHeightVolume(data).tolist() == [[1.0, 101.0, 2.0],
+                                                        [3.0, 102.0, 6.0],
+                                                        [5.0, 103.0, 12.0]]
+
+
+def test_area_height_volume_insufficient_points():
+    """The curve needs more than two points to be integrated."""
+    with pytest.raises(StorageError):
+        calculateAreaHeightVolume(array([[1.0, 101.0], [3.0, 102.0]]))
+
+
+def test_find_parameter():
+    """The parameters are interpolated in the curve."""
+    dataAHV = array([[1.0, 101.0, 2.0], [3.0, 102.0, 6.0], [5.0, 103.0, 12.0]])
+    assert findParameter(dataAHV, ELEVATION_PARAMETER, 101.5, 1.0) == (101.5, 1.5, 2.0, 4.0)
+    assert findParameter(dataAHV, VOLUME_PARAMETER, 9.0, 1.0) == (102.5, 2.5, 4.0, 9.0)
+    assert findParameter(dataAHV, AREA_PARAMETER, 3.0, 1.0) == (102.0, 2.0, 3.0, 6.0)
@@ -0,0 +1,48 @@
+# coding=utf-8
+"""Curve Decimation Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+from numpy import arange, array, diff, linspace, sin
+
+from core.decimation import decimateCurve
+
+
+def test_decimate_curve_small():
+    """A curve with at most maxPoints points is kept whole."""
+    values = linspace(0, 1, 10)
+    assert decimateCurve(values, values, 10).tolist() == list(range(10))
+    assert decimateCurve(values, values, 64).tolist() == list(range(10))
+
+
+def test_decimate_curve_too_few_points():
+    """Less than three points cannot be decimated, the curve is kept whole."""
+    values = linspace(0, 1, 10)
+    assert decimateCurve(values, values, 2).tolist() == list(range(10))
+
+
+def test_decimate_curve_keeps_endpoints():
+    """The decimated curve has maxPoints increasing indices, with both ends."""
+    xValues = linspace(0, 10, 1000)
+    indices = decimateCurve(xValues, sin(xValues), 50)
+    assert len(indices) == 50
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert (diff(indices) > 0).all()
+
+
+def test_decimate_curve_keeps_peak():
+    """The point far from the line of its neighbours is kept."""
+    xValues = arange(100, dtype=float)
+    yValues = array(xValues)
+    yValues[37] = 500
+    assert 37 in decimateCurve(xValues, yValues, 10).tolist()
@@ -0,0 +1,119 @@
+# coding=utf-8
+"""Sink Filling Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import heapq
+
+import pytest
+from numpy import array, full, inf, ones, zeros
+from numpy.random import default_rng
+
+pytest.importorskip('osgeo')
+
+from core.fill import (OCEAN_LABEL,
+                       calculateGraphLevels,
+                       calculateOutlets,
+                       floodTile)
+
+
+def priorityFlood(elevations, outlets):
+    """The filled elevations of a priority-flood with a heap."""
+    height, width = elevations.shape
+    filled = full(elevations.shape, inf)
+    queue = []
+    for row, column in zip(*outlets.nonzero()):
+        filled[row, column] = elevations[row, column]
+        heapq.heappush(queue, (elevations[row, column], row, column))
+    while queue:
+        level, row, column = heapq.heappop(queue)
+        for rowShift in (-1, 0, 1):
+            for columnShift in (-1, 0, 1):
+                neighbourRow, neighbourColumn = row + rowShift, column + columnShift
+                if (0 <= neighbourRow < height and 0 <= neighbourColumn < width and
+                        filled[neighbourRow, neighbourColumn] == inf):
+                    filled[neighbourRow, neighbourColumn] = max(level,
+                                                                elevations[neighbourRow, neighbourColumn])
+                    heapq.heappush(queue, (filled[neighbourRow, neighbourColumn],
+                                           neighbourRow,
+                                           neighbourColumn))
+
+    return filled
+
+
+def test_flood_tile_fills_pit():
+    """The pit is filled to the lowest point of its rim."""
+    elevations = array([[5., 5., 5., 5., 5.],
+                        [5., 1., 1., 1., 5.],
+                        [5., 1., 0., 1., 3.],
+                        [5., 1., 1., 1., 5.],
+                        [5., 5., 5., 5., 5.]])
+    valid = ones(elevations.shape, dtype=bool)
+    outlets = calculateOutlets(valid, 0, 0)
+
+    filled, labels, _ = floodTile(elevations, valid, outlets, [])
+
+    assert (filled[1:4, 1:4] == 3).all()
+    assert (labels == OCEAN_LABEL).all()
+    assert (filled[outlets] == elevations[outlets]).all()
+
+
+def test_flood_tile_matches_priority_flood():
+    """The flood of random terrain equals the priority-flood with a heap."""
+    generator = default_rng(7)
+    for _ in range(20):
+        elevations = generator.integers(0, 10, (23, 31)).astype(float)
+        valid = generator.random(elevations.shape) > 0.1
+        outlets = calculateOutlets(valid, 0, 0)
+
+        filled, labels, _ = floodTile(elevations, valid, outlets, [])
+
+        expected = priorityFlood(elevations, outlets)
+        reached = valid & (expected < inf)
+        assert (labels[reached] == OCEAN_LABEL).all()
+        assert (labels[~reached] == 0).all()
+        assert (filled[reached] == expected[reached]).all()
+        assert (filled[~reached] == elevations[~reached]).all()
+
+
+def test_flood_tile_edge_rows_spills():
+    """The edge rows get their own labels, with the spills between them."""
+    elevations = array([[4., 2., 4.],
+                        [4., 1., 4.],
+                        [4., 3., 4.]])
+    valid = ones(elevations.shape, dtype=bool)
+    outlets = zeros(elevations.shape, dtype=bool)
+    outlets[:, 0] = True
+
+    filled, labels, (lowLabels, highLabels, spills) = floodTile(elevations, valid, outlets, [0, 2])
+
+    assert labels[1, 1] == labels[0, 1]
+    assert labels[0, 1] > OCEAN_LABEL
+    assert filled[1, 1] == 2
+    assert (lowLabels < highLabels).all()
+    assert len(set(zip(lowLabels.tolist(), highLabels.tolist()))) == len(spills)
+
+
+def test_graph_levels():
+    """The level of a node is the lowest highest weight of its paths to the root."""
+    firstNodes = array([0, 1, 0, 2, 3])
+    secondNodes = array([1, 2, 2, 3, 4])
+    weights = array([5., 1., 7., 2., 9.])
+
+    levels, sources = calculateGraphLevels(6, firstNodes, secondNodes, weights)
+
+    assert levels[0] == -inf
+    assert levels[1:5].tolist() == [5., 5., 5., 9.]
+    assert levels[5] == inf
+    assert sources[1:5].tolist() == [1, 1, 1, 1]
+    assert sources[5] == -1
+
@@ -0,0 +1,135 @@
+# coding=utf-8
+"""Batch Journal Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import os
+
+import pytest
+
+from core.journal import (calculateFileSignature,
+                          calculateJobFingerprint,
+                          clearJournal,
+                          openJournal,
+                          readJournalSummary,
+                          recordJob)
+
+GEOMETRY_WKT = 'POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))'
+
+
+@pytest.fixture
+def job(tmp_path):
+    """A batch job on a DEM file."""
+    demPath = tmp_path / 'dem.tif'
+    demPath.write_bytes(b'dem')
+    return {'dem': str(demPath),
+            'step': 1.0,
+            'parameter': 'VOLUME (m3)',
+            'value': 100.0}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """An empty journal, closed at the end of the test."""
+    journal = openJournal(str(tmp_path / 'journal.sqlite'))
+    yield journal
+    journal.close()
+
+
+def test_file_signature_missing_file(tmp_path):
+    """A path that is not a file on disk is its own signature."""
+    path = str(tmp_path / 'missing.tif')
+    assert calculateFileSignature(path) == [path]
+
+
+def test_job_fingerprint_changes_with_inputs(job):
+    """The fingerprint changes with the geometry, the query and the options."""
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {'fill': False})
+    assert fingerprint == calculateJobFingerprint(dict(job), GEOMETRY_WKT, {'fill': False})
+    assert fingerprint != calculateJobFingerprint(job, GEOMETRY_WKT, {'fill': True})
+    assert fingerprint != calculateJobFingerprint(dict(job, value=200.0),
+                                                  GEOMETRY_WKT,
+                                                  {'fill': False})
+    assert fingerprint != calculateJobFingerprint(job,
+                                                  'POLYGON ((0 0, 2 0, 2 2, 0 2, 0 0))',
+                                                  {'fill': False})
+
+
+def test_job_fingerprint_changes_with_dem(job):
+    """The fingerprint changes when the DEM file is rewritten."""
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    with open(job['dem'], 'wb') as demFile:
+        demFile.write(b'another dem')
+    assert fingerprint != calculateJobFingerprint(job, GEOMETRY_WKT, {})
+
+
+def test_resume_completed_job(journal, job, tmp_path):
+    """A recorded job is resumed while its inputs and outputs are unchanged."""
+    outputPath = tmp_path / 'curve.csv'
+    outputPath.write_text('curve', encoding='utf-8')
+    summary = {'id': '1', 'volume': 100.0, 'curve': str(outputPath)}
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+
+    assert readJournalSummary(journal, '1', fingerprint, ['curve']) is None
+    recordJob(journal, '1', fingerprint, summary)
+    assert readJournalSummary(journal, '1', fingerprint, ['curve']) == summary
+
+
+def test_resume_changed_inputs(journal, job):
+    """A recorded job is computed again when its inputs changed."""
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    recordJob(journal, '1', fingerprint, {'id': '1'})
+    changedFingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {'fill': True})
+    assert readJournalSummary(journal, '1', changedFingerprint, []) is None
+
+
+def test_resume_missing_output(journal, job, tmp_path):
+    """A recorded job is computed again when its output was removed."""
+    outputPath = tmp_path / 'curve.csv'
+    outputPath.write_text('curve', encoding='utf-8')
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    recordJob(journal, '1', fingerprint, {'id': '1', 'curve': str(outputPath), 'graph': ''})
+
+    os.remove(str(outputPath))
+    assert readJournalSummary(journal, '1', fingerprint, ['curve', 'graph']) is None
+
+
+def test_journal_survives_reopening(job, tmp_path):
+    """The recorded jobs are read by the next run."""
+    path = str(tmp_path / 'journal.sqlite')
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    journal = openJournal(path)
+    recordJob(journal, '1', fingerprint, {'id': '1'})
+    journal.close()
+
+    journal = openJournal(path)
+    try:
+        assert readJournalSummary(journal, '1', fingerprint, []) == {'id': '1'}
+    finally:
+        journal.close()
+
+
+def test_record_job_replaces_summary(journal, job):
+    """Recording a job again replaces its fingerprint and summary."""
+    recordJob(journal, '1', 'old', {'id': '1', 'volume': 1.0})
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    recordJob(journal, '1', fingerprint, {'id': '1', 'volume': 2.0})
+    assert readJournalSummary(journal, '1', 'old', []) is None
+    assert readJournalSummary(journal, '1', fingerprint, []) == {'id': '1', 'volume': 2.0}
+
+
+def test_clear_journal(journal, job):
+    """Clearing the journal computes all the jobs again."""
+    fingerprint = calculateJobFingerprint(job, GEOMETRY_WKT, {})
+    recordJob(journal, '1', fingerprint, {'id': '1'})
+    clearJournal(journal)
+    assert readJournalSummary(journal, '1', fingerprint, []) is None
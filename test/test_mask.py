@@ -0,0 +1,30 @@
+# coding=utf-8
+"""Area Mask Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import pytest
+from numpy.random import default_rng
+
+pytest.importorskip('osgeo')
+
+from core.mask import packMask, unpackMask
+
+
+def test_pack_mask_rows():
+    """The rows and columns of the packed mask unpack to the slice of the mask."""
+    mask = default_rng(3).random((37, 53)) > 0.5
+    packedMask = packMask(mask)
+
+    assert packedMask.shape == (37, 7)
+    assert (unpackMask(packedMask, 53) == mask).all()
+    assert (unpackMask(packedMask, 53, slice(5, 20), slice(3, 40)) == mask[5:20, 3:40]).all()
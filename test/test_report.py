@@ -0,0 +1,78 @@
+# coding=utf-8
+"""Reservoirs Report Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import pytest
+from numpy import array, column_stack, cumsum, linspace
+
+pytest.importorskip('osgeo')
+
+from core.coreExceptions import StorageError
+from core.report import CURVE_SCALE, encodeCurve, encodeDifferences, summarizeReservoir
+
+
+def createCurve(numberOfPoints):
+    """An area-height-volume curve of a bowl."""
+    elevations = linspace(100.0, 110.0, numberOfPoints)
+    areas = (elevations - 99.0) ** 2
+    volumes = cumsum(areas)
+    return column_stack((areas, elevations, volumes))
+
+
+def test_encode_differences():
+    """The first rounded value is followed by the consecutive differences."""
+    assert encodeDifferences(array([1.4, 2.6, 2.4, 10.0])) == [1, 2, -1, 8]
+
+
+def test_encode_curve_round_trip():
+    """The encoded curve is decoded by summing the differences."""
+    npAHVData = createCurve(20)
+    encodedCurve = encodeCurve(npAHVData)
+
+    elevations = cumsum(encodedCurve['e']) / 100 + npAHVData[0, 1]
+    areas = cumsum(encodedCurve['a']) / CURVE_SCALE * npAHVData[:, 0].max()
+    volumes = cumsum(encodedCurve['v']) / CURVE_SCALE * npAHVData[:, 2].max()
+    assert elevations == pytest.approx(npAHVData[:, 1], abs=0.01)
+    assert areas == pytest.approx(npAHVData[:, 0], abs=npAHVData[:, 0].max() / CURVE_SCALE)
+    assert volumes == pytest.approx(npAHVData[:, 2], abs=npAHVData[:, 2].max() / CURVE_SCALE)
+
+
+def test_encode_curve_decimated():
+    """A long curve is decimated, keeping its ends."""
+    npAHVData = createCurve(1000)
+    encodedCurve = encodeCurve(npAHVData, 16)
+
+    assert len(encodedCurve['e']) <= 32
+    assert len(encodedCurve['e']) == len(encodedCurve['a']) == len(encodedCurve['v'])
+    assert sum(encodedCurve['e']) == 1000
+    assert sum(encodedCurve['a']) == CURVE_SCALE
+    assert sum(encodedCurve['v']) == CURVE_SCALE
+
+
+def test_summarize_reservoir():
+    """The summary has the ranges of the curve and no thumbnail without polygon."""
+    npAHVData = createCurve(20)
+    summary = summarizeReservoir(7, npAHVData)
+
+    assert summary.reservoirId == '7'
+    assert summary.minElevation == 100.0
+    assert summary.maxElevation == 110.0
+    assert summary.maxArea == npAHVData[:, 0].max()
+    assert summary.maxVolume == npAHVData[:, 2].max()
+    assert summary.thumbnail == ''
+
+
+def test_summarize_empty_reservoir():
+    """An empty curve is reported."""
+    with pytest.raises(StorageError):
+        summarizeReservoir('1', array([]).reshape(0, 3))
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""Scenarios Test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'João Vitor Pimenta'
+__date__ = '2024-07-13'
+__copyright__ = '(C) 2024 by João Vitor Pimenta'
+
+import pytest
+
+from core.coreExceptions import StorageError
+from core.scenarios import parseScenarioValues, readScenarioValues
+
+
+def writeScenarioFile(tmp_path, text):
+    """Writes the scenario CSV file and returns its path."""
+    path = tmp_path / 'scenarios.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_parse_scenario_values_separators():
+    """The values separated by commas, semicolons or spaces are numbered from 1."""
+    assert parseScenarioValues(' 1.5, 2;3  4.25 ') == [('1', 1.5),
+                                                        ('2', 2.0),
+                                                        ('3', 3.0),
+                                                        ('4', 4.25)]
+
+
+def test_parse_scenario_values_empty():
+    """An empty text has no scenarios."""
+    assert parseScenarioValues('  ') == []
+
+
+def test_parse_scenario_values_invalid():
+    """A value that is not a number is reported."""
+    with pytest.raises(StorageError):
+        parseScenarioValues('1, two, 3')
+
+
+def test_read_scenario_values_first_column(tmp_path):
+    """The first column other than the id is read, with the ids of the file."""
+    path = writeScenarioFile(tmp_path, 'id,volume,area\nlow,10,1\nhigh,20.5,2\n')
+    assert readScenarioValues(path) == [('low', 10.0), ('high', 20.5)]
+
+
+def test_read_scenario_values_field(tmp_path):
+    """The given column is read and the empty values are skipped."""
+    path = writeScenarioFile(tmp_path, 'volume,area\n10,1\n20,\n30,3\n')
+    assert readScenarioValues(path, 'area') == [('1', 1.0), ('3', 3.0)]
+
+
+def test_read_scenario_values_missing_field(tmp_path):
+    """A column that is not in the file is reported."""
+    path = writeScenarioFile(tmp_path, 'id,volume\n1,10\n')
+    with pytest.raises(StorageError):
+        readScenarioValues(path, 'area')
+
+
+def test_read_scenario_values_invalid(tmp_path):
+    """A value that is not a number is reported."""
+    path = writeScenarioFile(tmp_path, 'volume\n10\nten\n')
+    with pytest.raises(StorageError):
+        readScenarioValues(path)